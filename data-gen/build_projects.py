@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Generate the site's projects.json and its index from the project spreadsheet export.
+
+Reads `PersonalSite_data - Sheet1.csv`, checks every row against the
+expected columns, and writes:
+- src/routes/assets/projects.json, the one canonical project list, in the
+  same format the old pandas notebook produced (records, 4-space indent,
+  unicode left unescaped, no trailing newline)
+- projects.index.json next to it, with a lookup by slug, the newest-first
+  order the site renders, the card images missing from static/img and
+  each card image's size, dominant colour and blurred placeholder (see
+  image-pull/dataset.py and image_meta.py)
+
+Both the site and the screenshot tool read these files. Files are only
+written when their content changes, so running this before `vite dev` or
+`vite build` doesn't trigger a needless hot reload.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_CSV = os.path.join(ROOT, 'data-gen', 'PersonalSite_data - Sheet1.csv')
+PROJECTS_JSON = os.path.join(ROOT, 'src', 'routes', 'assets', 'projects.json')
+IMG_DIR = os.path.join(ROOT, 'static', 'img')
+
+# Slugs must match the screenshot tool's, so share its helpers
+sys.path.insert(0, os.path.join(ROOT, 'image-pull'))
+from dataset import extract_slug_from_url, index_path, source_hash  # noqa: E402
+from image_meta import read_images  # noqa: E402
+
+COLUMNS = ['order', 'name', 'img', 'type', 'date', 'new', 'url']
+INT_COLUMNS = {'order', 'new'}
+# img may be left empty for the screenshot tool to fill in (see image-pull/cards.py)
+REQUIRED_COLUMNS = {'order', 'name', 'type', 'date', 'new', 'url'}
+
+# Cells pandas.read_csv treated as missing; they are written as null
+NA_VALUES = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+}
+
+# Dates are 'Mar 2026' or 'April 2025'; only the first three letters of the month count
+MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+
+class SchemaError(ValueError):
+    """
+    The CSV doesn't match the expected columns; holds one message per problem.
+    """
+
+    def __init__(self, problems):
+        super().__init__('\n'.join(problems))
+        self.problems = problems
+
+
+def parse_int(value):
+    """
+    Parse a whole number cell, or return None if it isn't one.
+    """
+    digits = value[1:] if value.startswith('-') else value
+    return int(value) if digits.isdigit() else None
+
+
+def parse_date(value):
+    """
+    Parse a 'Mar 2026' or 'April 2025' date into (year, month), or None.
+    """
+    parts = value.split()
+    if len(parts) != 2 or not parts[1].isdigit() or parts[0][:3].lower() not in MONTHS:
+        return None
+    return int(parts[1]), MONTHS.index(parts[0][:3].lower()) + 1
+
+
+def read_projects(csv_path=DATA_CSV):
+    """
+    Read and validate the project CSV.
+
+    Args:
+        csv_path: Spreadsheet export with the COLUMNS header
+
+    Returns:
+        List of project dicts, in CSV order
+
+    Raises:
+        SchemaError: listing every invalid header, row or cell
+    """
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.reader(f))
+
+    if not rows or rows[0] != COLUMNS:
+        raise SchemaError([f"Header must be {','.join(COLUMNS)}, got {','.join(rows[0]) if rows else 'nothing'}"])
+
+    problems = []
+    projects = []
+    for line, row in enumerate(rows[1:], 2):
+        # Blank lines are skipped, as pandas did
+        if not any(row):
+            continue
+        if len(row) != len(COLUMNS):
+            problems.append(f"Line {line}: expected {len(COLUMNS)} fields, got {len(row)}")
+            continue
+
+        project = {}
+        for column, value in zip(COLUMNS, row):
+            if value in NA_VALUES:
+                if column in REQUIRED_COLUMNS:
+                    problems.append(f"Line {line}: {column} is empty")
+                project[column] = None
+            elif column in INT_COLUMNS:
+                project[column] = parse_int(value)
+                if project[column] is None:
+                    problems.append(f"Line {line}: {column} must be a whole number, got {value!r}")
+            else:
+                project[column] = value
+
+        if project['new'] not in (None, 0, 1):
+            problems.append(f"Line {line}: new must be 0 or 1, got {project['new']}")
+        if project['url'] and not project['url'].startswith(('http://', 'https://')):
+            problems.append(f"Line {line}: url must start with http:// or https://")
+        if project['date']:
+            project['date'] = project['date'].replace('-', ' ')
+            if parse_date(project['date']) is None:
+                problems.append(f"Line {line}: date must look like 'Mar 2026', got {project['date']!r}")
+
+        projects.append(project)
+
+    if problems:
+        raise SchemaError(problems)
+    return projects
+
+
+def load_previous_index(path):
+    """
+    The index a previous build wrote, or an empty dict if there's none to reuse.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return index if isinstance(index, dict) else {}
+
+
+def build_index(projects, text, img_dir=IMG_DIR, previous=None, workers=None, previous_mtime=None):
+    """
+    Precompute the lookups the site and the screenshot tool need.
+
+    Args:
+        projects: Validated projects from read_projects()
+        text: The rendered projects.json the index belongs to
+        img_dir: Folder the card images are served from
+        previous: The previous build's index; image metadata of unchanged files is reused from it
+        workers: Number of processes reading new or changed images (default: one per CPU)
+        previous_mtime: When the previous index was written, so images untouched since aren't hashed again
+
+    Returns:
+        Index dict (see image-pull/dataset.py for the fields)
+
+    Raises:
+        SchemaError: if two projects share a screenshot slug
+    """
+    problems = []
+    by_slug = {}
+    for position, project in enumerate(projects):
+        slug = extract_slug_from_url(project['url'])
+        if slug in by_slug:
+            other = projects[by_slug[slug]]['url']
+            problems.append(f"Slug '{slug}' is shared by {other} and {project['url']}")
+        by_slug[slug] = position
+
+    if problems:
+        raise SchemaError(problems)
+
+    def newest_first(position):
+        year, month = parse_date(projects[position]['date'])
+        return -year, -month, projects[position]['order'], position
+
+    images = sorted({project['img'] for project in projects if project['img']})
+    image_meta, unreadable = read_images(
+        images, img_dir, (previous or {}).get('imageMeta'), workers, previous_mtime,
+    )
+    return {
+        'source': source_hash(text),
+        'bySlug': by_slug,
+        'byDate': sorted(range(len(projects)), key=newest_first),
+        # Unreadable files would break in the browser too, so their cards get the cover image as well
+        'missingImages': [
+            img for img in images if img in unreadable or not os.path.exists(os.path.join(img_dir, img))
+        ],
+        'imageMeta': image_meta,
+    }
+
+
+def render(projects):
+    """
+    projects.json content, byte for byte what the pandas notebook wrote.
+    """
+    return json.dumps(projects, indent=4, ensure_ascii=False)
+
+
+def render_index(index):
+    """
+    projects.index.json content, formatted like the other generated assets.
+    """
+    return json.dumps(index, indent=4, ensure_ascii=False) + '\n'
+
+
+def write_if_changed(path, text):
+    """
+    Write the text to path unless the file already holds exactly that.
+
+    Returns:
+        True if the file was written
+    """
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            if f.read() == text:
+                return False
+    except FileNotFoundError:
+        pass
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate projects.json from the project spreadsheet export.')
+    parser.add_argument('--csv', default=DATA_CSV, help='Project CSV (default: the sheet export in data-gen/)')
+    parser.add_argument('--output', default=PROJECTS_JSON,
+                        help='projects.json to write (default: src/routes/assets/projects.json)')
+    parser.add_argument('--check', action='store_true',
+                        help="Don't write anything, exit with status 1 if projects.json or its index is out of date")
+    parser.add_argument('--strict-images', action='store_true',
+                        help='Exit with status 1 if a card image is missing from static/img or unreadable')
+    parser.add_argument('--workers', type=int,
+                        help='Number of processes reading new or changed card images (default: one per CPU)')
+    args = parser.parse_args(argv)
+
+    try:
+        projects = read_projects(args.csv)
+        text = render(projects)
+        previous_path = index_path(args.output)
+        previous_mtime = os.path.getmtime(previous_path) if os.path.exists(previous_path) else None
+        index = build_index(projects, text, previous=load_previous_index(previous_path),
+                            workers=args.workers, previous_mtime=previous_mtime)
+    except SchemaError as e:
+        for problem in e.problems:
+            print(f"✗ {problem}", file=sys.stderr)
+        return 1
+
+    outputs = [(args.output, text), (index_path(args.output), render_index(index))]
+
+    if args.check:
+        stale = []
+        for path, content in outputs:
+            try:
+                with open(path, 'r', encoding='utf-8', newline='') as f:
+                    if f.read() == content:
+                        continue
+            except FileNotFoundError:
+                pass
+            stale.append(os.path.relpath(path))
+        for path in stale:
+            print(f"✗ {path} is out of date")
+        if not stale:
+            print("✓ projects.json and its index are up to date")
+        return 1 if stale else 0
+
+    for path, content in outputs:
+        if write_if_changed(path, content):
+            print(f"✓ Wrote {os.path.relpath(path)}")
+        else:
+            print(f"✓ {os.path.relpath(path)} unchanged")
+
+    print(f"  {len(projects)} projects, {len(index['imageMeta'])} card images")
+    for img in index['missingImages']:
+        print(f"{'✗' if args.strict_images else '!'} Missing card image: static/img/{img}")
+    return 1 if args.strict_images and index['missingImages'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
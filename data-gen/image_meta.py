@@ -0,0 +1,200 @@
+"""
+Card image metadata baked into the projects index at build time.
+
+For every card image in static/img this records what the cards need before
+the image itself has arrived:
+- width and height, so the browser reserves the right box
+- the dominant colour, painted behind the card while it loads
+- a tiny blurred placeholder (a few hundred bytes of base64 WebP) shown
+  until the real image replaces it
+
+Images are read once each, in parallel across a process pool. Every entry
+stores the SHA-256 and size of its file, and the previous index is the
+cache: an image whose hash already has an entry isn't opened again, so a
+rebuild only reads new or changed images. An image that hasn't been
+modified since the previous index was written, and still has the size
+recorded for it, isn't even hashed.
+
+The build runs before every dev server start and production build, so
+Pillow and the process pool are only imported once there's an image to
+read. Without Pillow (e.g. on a build server that only has Python's
+standard library) the cached entries are still used, and images that have
+none are left without metadata.
+"""
+
+import base64
+import hashlib
+import io
+import os
+
+# Pillow, imported by load_pillow() once an image has to be read
+Image = ImageFilter = features = None
+
+
+# Bump to re-read every image after changing how entries are made
+META_VERSION = 1
+
+# Placeholder width in pixels; the height follows the image's aspect ratio
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_BLUR = 1
+PLACEHOLDER_QUALITY = 40
+
+# The dominant colour is the biggest cluster of this many colours in a small thumbnail
+PALETTE_SIZE = 5
+PALETTE_THUMBNAIL = 64
+
+
+def file_hash(path):
+    """
+    SHA-256 of a file's contents, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_pillow():
+    """
+    Import Pillow into this module the first time it's needed.
+
+    Returns:
+        False if Pillow isn't installed
+    """
+    global Image, ImageFilter, features
+    if Image is None:
+        try:
+            from PIL import Image, ImageFilter, features
+        except ImportError:
+            return False
+    return True
+
+
+def flatten(image):
+    """
+    First frame of an image as RGB, transparent areas on white as the cards show them.
+    """
+    image.seek(0)
+    rgba = image.convert('RGBA')
+    background = Image.new('RGB', rgba.size, (255, 255, 255))
+    background.paste(rgba, mask=rgba.getchannel('A'))
+    return background
+
+
+def dominant_colour(image):
+    """
+    The most common colour of an RGB image, as '#rrggbb'.
+    """
+    thumbnail = image.copy()
+    thumbnail.thumbnail((PALETTE_THUMBNAIL, PALETTE_THUMBNAIL))
+    quantized = thumbnail.quantize(colors=PALETTE_SIZE, method=Image.Quantize.MEDIANCUT)
+    _, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def placeholder(image):
+    """
+    A tiny blurred copy of an RGB image, as a data: URI.
+    """
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    small = image.resize((PLACEHOLDER_WIDTH, height), Image.LANCZOS).filter(ImageFilter.GaussianBlur(PLACEHOLDER_BLUR))
+    buffer = io.BytesIO()
+    if features.check('webp'):
+        small.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY)
+        mime = 'image/webp'
+    else:
+        small.save(buffer, 'PNG', optimize=True)
+        mime = 'image/png'
+    return f"data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+
+def read_image(path, source_hash):
+    """
+    Read one image's metadata. Runs in a worker process.
+
+    Returns:
+        Index entry for the image
+    """
+    load_pillow()
+    with Image.open(path) as image:
+        width, height = image.size
+        animated = getattr(image, 'is_animated', False)
+        frame = flatten(image)
+
+    return {
+        'hash': source_hash,
+        'bytes': os.path.getsize(path),
+        'version': META_VERSION,
+        'width': width,
+        'height': height,
+        'animated': animated,
+        'color': dominant_colour(frame),
+        'placeholder': placeholder(frame),
+    }
+
+
+def read_images(images, img_dir, previous=None, workers=None, previous_mtime=None):
+    """
+    Metadata for every card image that exists, reusing previous entries for unchanged files.
+
+    Args:
+        images: Card image filenames
+        img_dir: Folder the card images are served from
+        previous: The previous index's entries, img -> entry (the cache)
+        workers: Number of worker processes (default: one per CPU)
+        previous_mtime: When the previous index was written; older images with the size
+            their entry records are taken as unchanged without hashing them (None = hash all)
+
+    Returns:
+        (dict of img -> entry, list of images that exist but can't be read)
+    """
+    previous = {
+        img: entry for img, entry in (previous or {}).items()
+        if isinstance(entry, dict) and entry.get('version') == META_VERSION and 'hash' in entry
+    }
+    cache = {entry['hash']: entry for entry in previous.values()}
+
+    entries = {}
+    jobs = {}
+    for img in images:
+        path = os.path.join(img_dir, img)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entry = previous.get(img)
+        if (entry is not None and previous_mtime is not None and stat.st_mtime < previous_mtime
+                and entry.get('bytes') == stat.st_size):
+            entries[img] = entry
+            continue
+        source_hash = file_hash(path)
+        if source_hash in cache:
+            # Entries from before sizes were recorded get theirs now
+            entries[img] = dict(cache[source_hash], bytes=stat.st_size)
+        else:
+            jobs[img] = source_hash
+
+    if jobs and not load_pillow():
+        print(f"! Pillow isn't installed, {len(jobs)} new or changed card images have no size or placeholder")
+        jobs = {}
+
+    unreadable = []
+    if jobs:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                img: pool.submit(read_image, os.path.join(img_dir, img), source_hash)
+                for img, source_hash in jobs.items()
+            }
+            for img, future in futures.items():
+                try:
+                    entries[img] = future.result()
+                    print(f"✓ Read {img}")
+                except Exception as e:
+                    print(f"✗ Can't read card image static/img/{img}: {e}")
+                    unreadable.append(img)
+
+    return dict(sorted(entries.items())), unreadable
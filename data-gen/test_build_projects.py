@@ -0,0 +1,89 @@
+"""
+Tests for the schema and slug checks of the dataset build.
+"""
+
+import pytest
+
+from build_projects import COLUMNS, SchemaError, build_index, read_projects, render
+
+
+HEADER = ','.join(COLUMNS)
+ROW = '1,Mapping the storm,storm.png,interactive,Mar 2026,1,https://edition.cnn.com/2026/03/weather/storm-maps'
+
+
+def write_csv(tmp_path, *lines):
+    path = tmp_path / 'projects.csv'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def problems(tmp_path, *rows):
+    with pytest.raises(SchemaError) as error:
+        read_projects(write_csv(tmp_path, HEADER, *rows))
+    return error.value.problems
+
+
+def test_valid_rows_are_read(tmp_path):
+    projects = read_projects(write_csv(tmp_path, HEADER, ROW, '', ROW.replace('storm.png', 'NA')))
+    assert len(projects) == 2
+    assert projects[0]['order'] == 1
+    assert projects[0]['date'] == 'Mar 2026'
+    # Missing cells are null, like pandas wrote them
+    assert projects[1]['img'] is None
+
+
+def test_wrong_header_is_rejected(tmp_path):
+    with pytest.raises(SchemaError) as error:
+        read_projects(write_csv(tmp_path, 'order,name,img,type,date,url', ROW))
+    assert error.value.problems == [f"Header must be {HEADER}, got order,name,img,type,date,url"]
+
+
+def test_empty_file_is_rejected(tmp_path):
+    path = tmp_path / 'projects.csv'
+    path.write_text('', encoding='utf-8')
+    with pytest.raises(SchemaError, match='got nothing'):
+        read_projects(str(path))
+
+
+def test_every_bad_cell_is_reported(tmp_path):
+    assert problems(
+        tmp_path,
+        ROW.replace('Mapping the storm', ''),
+        ROW.replace('1,Mapping', 'first,Mapping'),
+        ROW.replace('Mar 2026,1', 'Mar 2026,2'),
+        ROW.replace('https://', 'ftp://'),
+        ROW.replace('Mar 2026', 'Spring 2026'),
+        ROW + ',extra',
+    ) == [
+        "Line 2: name is empty",
+        "Line 3: order must be a whole number, got 'first'",
+        "Line 4: new must be 0 or 1, got 2",
+        "Line 5: url must start with http:// or https://",
+        "Line 6: date must look like 'Mar 2026', got 'Spring 2026'",
+        "Line 7: expected 7 fields, got 8",
+    ]
+
+
+def test_shared_slug_is_rejected(tmp_path):
+    projects = read_projects(write_csv(
+        tmp_path, HEADER, ROW, ROW.replace('storm-maps', 'storm-maps/index.html'),
+    ))
+    with pytest.raises(SchemaError) as error:
+        build_index(projects, render(projects), img_dir=str(tmp_path))
+    assert error.value.problems == [
+        "Slug 'storm-maps' is shared by https://edition.cnn.com/2026/03/weather/storm-maps "
+        "and https://edition.cnn.com/2026/03/weather/storm-maps/index.html"
+    ]
+
+
+def test_index_orders_newest_first_and_lists_missing_images(tmp_path):
+    projects = read_projects(write_csv(
+        tmp_path, HEADER,
+        ROW.replace('Mar 2026', 'Jan 2025').replace('storm-maps', 'older'),
+        ROW.replace('1,Mapping', '2,Mapping').replace('storm-maps', 'second'),
+        ROW,
+    ))
+    index = build_index(projects, render(projects), img_dir=str(tmp_path))
+    assert index['byDate'] == [2, 1, 0]
+    assert index['bySlug'] == {'older': 0, 'second': 1, 'storm-maps': 2}
+    assert index['missingImages'] == ['storm.png']
@@ -0,0 +1,69 @@
+"""
+Tests for the card image metadata cache.
+"""
+
+import os
+import subprocess
+import sys
+
+from PIL import Image
+
+import image_meta
+from image_meta import META_VERSION, read_images
+
+
+def write_image(path, colour=(200, 30, 30)):
+    Image.new('RGB', (320, 180), colour).save(path)
+
+
+def test_nothing_heavy_is_imported_up_front():
+    # A fresh interpreter, since other tests have loaded Pillow already
+    code = 'import sys, image_meta; print(sorted(m for m in ("PIL", "concurrent.futures") if m in sys.modules))'
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=os.path.dirname(image_meta.__file__),
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert output.strip() == '[]'
+
+
+def test_entries_are_read_and_reused(tmp_path, monkeypatch):
+    write_image(tmp_path / 'card.png')
+    entries, unreadable = read_images(['card.png', 'missing.png'], str(tmp_path), workers=1)
+    assert unreadable == []
+    entry = entries['card.png']
+    assert (entry['width'], entry['height'], entry['color']) == (320, 180, '#c81e1e')
+    assert entry['bytes'] == os.path.getsize(tmp_path / 'card.png')
+    assert entry['version'] == META_VERSION
+
+    hashed = []
+    monkeypatch.setattr(image_meta, 'file_hash', lambda path: hashed.append(path) or entry['hash'])
+
+    # Untouched since the index was written: not even hashed
+    written = os.path.getmtime(tmp_path / 'card.png') + 1
+    again, _ = read_images(['card.png'], str(tmp_path), entries, previous_mtime=written)
+    assert again == entries
+    assert hashed == []
+
+    # Touched since, so hashed, but the same bytes: the entry is reused without opening the image
+    again, _ = read_images(['card.png'], str(tmp_path), entries, previous_mtime=0)
+    assert again == entries
+    assert len(hashed) == 1
+
+
+def test_changed_image_is_read_again(tmp_path):
+    write_image(tmp_path / 'card.png')
+    entries, _ = read_images(['card.png'], str(tmp_path), workers=1)
+    mtime = os.path.getmtime(tmp_path / 'card.png') + 1
+
+    write_image(tmp_path / 'card.png', (30, 30, 200))
+    os.utime(tmp_path / 'card.png', (mtime + 1, mtime + 1))
+    again, _ = read_images(['card.png'], str(tmp_path), entries, workers=1, previous_mtime=mtime)
+    assert again['card.png']['color'] == '#1e1ec8'
+    assert again['card.png']['hash'] != entries['card.png']['hash']
+
+
+def test_unreadable_images_are_reported(tmp_path):
+    (tmp_path / 'broken.png').write_bytes(b'not an image')
+    entries, unreadable = read_images(['broken.png'], str(tmp_path), workers=1)
+    assert entries == {}
+    assert unreadable == ['broken.png']
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Build card-sized image derivatives for every image referenced in projects.json
+
+For each card image in static/img this writes WebP and AVIF versions at the
+card's 1x and 2x widths into static/img/derived/ (animated GIFs become
+animated WebP, plus an optional MP4), and a srcset manifest the site reads
+from src/routes/assets/images.json.
+
+Images are processed in parallel across a process pool, and only images
+whose content changed since the last build are processed again.
+
+Derivatives are named after their source without its extension, so two
+card images that differ only in extension (foo.png and foo.jpg) would
+overwrite each other's files; the build refuses to run until one is renamed.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageSequence, features
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECTS_JSON = os.path.join(ROOT, 'src', 'routes', 'assets', 'projects.json')
+IMAGES_JSON = os.path.join(ROOT, 'src', 'routes', 'assets', 'images.json')
+IMG_DIR = os.path.join(ROOT, 'static', 'img')
+
+# Derivatives live in a subfolder of static/img, so manifest paths are relative to /img/
+DERIVED_DIR = 'derived'
+
+# Cards are at most ~480px wide (a third of a 1400px screen), so 1x and 2x widths
+WIDTHS = [480, 960]
+
+WEBP_QUALITY = 80
+AVIF_QUALITY = 55
+
+# Bump to rebuild every derivative after changing widths, quality or formats
+PIPELINE_VERSION = 1
+
+
+def file_hash(path):
+    """
+    SHA-256 of a file's contents, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def target_widths(width):
+    """
+    Derivative widths for a source image, never upscaling past the source.
+    """
+    widths = [w for w in WIDTHS if w < width]
+    if len(widths) < len(WIDTHS):
+        widths.append(width)
+    return widths
+
+
+def resize(image, width):
+    height = round(image.height * width / image.width)
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def build_still(image, stem, out_dir, avif):
+    """
+    Write WebP (and AVIF) derivatives of a still image.
+
+    Returns:
+        dict of MIME type -> list of (filename, width)
+    """
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    sources = {'image/webp': []}
+    if avif:
+        sources['image/avif'] = []
+
+    for width in target_widths(image.width):
+        scaled = resize(image, width)
+
+        name = f"{stem}-{width}w.webp"
+        scaled.save(os.path.join(out_dir, name), 'WEBP', quality=WEBP_QUALITY, method=6)
+        sources['image/webp'].append((name, width))
+
+        if avif:
+            name = f"{stem}-{width}w.avif"
+            scaled.save(os.path.join(out_dir, name), 'AVIF', quality=AVIF_QUALITY)
+            sources['image/avif'].append((name, width))
+
+    return sources
+
+
+def build_animated(image, stem, out_dir):
+    """
+    Write animated WebP derivatives of an animated GIF.
+
+    Returns:
+        dict of MIME type -> list of (filename, width)
+    """
+    durations = []
+    frames = []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', 100))
+        frames.append(frame.convert('RGBA'))
+
+    sources = {'image/webp': []}
+    for width in target_widths(image.width):
+        scaled = [resize(frame, width) for frame in frames]
+        name = f"{stem}-{width}w.webp"
+        scaled[0].save(
+            os.path.join(out_dir, name), 'WEBP',
+            save_all=True, append_images=scaled[1:], duration=durations,
+            loop=image.info.get('loop', 0), quality=WEBP_QUALITY, method=4,
+        )
+        sources['image/webp'].append((name, width))
+
+    return sources
+
+
+def build_mp4(source_path, stem, out_dir, width):
+    """
+    Transcode an animated GIF to a silent H.264 MP4 with ffmpeg.
+
+    Returns:
+        The MP4 filename, or None if ffmpeg failed
+    """
+    name = f"{stem}-{width}w.mp4"
+    command = [
+        'ffmpeg', '-y', '-loglevel', 'error', '-i', source_path,
+        '-movflags', 'faststart', '-pix_fmt', 'yuv420p', '-an',
+        # H.264 needs even dimensions
+        '-vf', f"scale={width}:-2",
+        os.path.join(out_dir, name),
+    ]
+    result = subprocess.run(command, capture_output=True)
+    return name if result.returncode == 0 else None
+
+
+def stem_clashes(images):
+    """
+    Images whose derivatives would share names, grouped by stem.
+
+    Compared case-insensitively, since static/img may live on a file system that is.
+
+    Returns:
+        List of lists of image filenames, empty if every stem is unique
+    """
+    stems = {}
+    for img in images:
+        stems.setdefault(os.path.splitext(img)[0].lower(), []).append(img)
+    return [sorted(imgs) for _, imgs in sorted(stems.items()) if len(imgs) > 1]
+
+
+def build_image(img, source_hash, avif, mp4):
+    """
+    Build every derivative for one image. Runs in a worker process.
+
+    Returns:
+        Manifest entry for the image
+    """
+    source_path = os.path.join(IMG_DIR, img)
+    out_dir = os.path.join(IMG_DIR, DERIVED_DIR)
+    stem = os.path.splitext(img)[0]
+
+    with Image.open(source_path) as image:
+        width, height = image.size
+        animated = getattr(image, 'is_animated', False)
+        if animated:
+            sources = build_animated(image, stem, out_dir)
+        else:
+            sources = build_still(image, stem, out_dir, avif)
+
+    entry = {
+        'hash': source_hash,
+        'version': PIPELINE_VERSION,
+        'width': width,
+        'height': height,
+        'animated': animated,
+        'sources': [
+            {
+                'type': mime,
+                'srcset': ', '.join(f"{DERIVED_DIR}/{name} {w}w" for name, w in files),
+            }
+            # AVIF first so browsers that support it pick it over WebP
+            for mime, files in sorted(sources.items())
+        ],
+        'files': [f"{DERIVED_DIR}/{name}" for files in sources.values() for name, _ in files],
+    }
+
+    if animated and mp4:
+        name = build_mp4(source_path, stem, out_dir, target_widths(width)[-1])
+        if name:
+            entry['video'] = f"{DERIVED_DIR}/{name}"
+            entry['files'].append(entry['video'])
+
+    return entry
+
+
+def is_current(entry, source_hash, avif, mp4):
+    """
+    Whether a previous manifest entry still matches the source and settings.
+    """
+    if not entry or entry.get('hash') != source_hash or entry.get('version') != PIPELINE_VERSION:
+        return False
+    types = {source['type'] for source in entry['sources']}
+    if avif and not entry['animated'] and 'image/avif' not in types:
+        return False
+    if mp4 and entry['animated'] and 'video' not in entry:
+        return False
+    return all(os.path.exists(os.path.join(IMG_DIR, name)) for name in entry['files'])
+
+
+def build_derivatives(projects_json=PROJECTS_JSON, images_json=IMAGES_JSON, workers=None,
+                      avif=True, mp4=True, force=False):
+    """
+    Build derivatives for every image referenced in the projects file and write the srcset manifest.
+
+    Args:
+        projects_json: Projects file listing the card images
+        images_json: Where to write the manifest
+        workers: Number of worker processes (default: one per CPU)
+        avif: Also write AVIF versions of still images, if Pillow supports it
+        mp4: Also transcode animated GIFs to MP4, if ffmpeg is installed
+        force: Rebuild everything, even unchanged images
+
+    Raises:
+        ValueError: if two card images would get the same derivative names
+    """
+    if avif and not features.check('avif'):
+        print("! This Pillow build has no AVIF support, writing WebP only")
+        avif = False
+    if mp4 and not shutil.which('ffmpeg'):
+        print("! ffmpeg not found, skipping MP4 versions of animated GIFs")
+        mp4 = False
+
+    with open(projects_json, 'r', encoding='utf-8') as f:
+        projects = json.load(f)
+
+    previous = {}
+    if os.path.exists(images_json):
+        with open(images_json, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+
+    os.makedirs(os.path.join(IMG_DIR, DERIVED_DIR), exist_ok=True)
+
+    images = sorted({project['img'] for project in projects if project.get('img')})
+    clashes = stem_clashes(images)
+    if clashes:
+        raise ValueError('Card images must not differ only in extension, their derivatives would overwrite '
+                         'each other: ' + '; '.join(', '.join(imgs) for imgs in clashes))
+
+    manifest = {}
+    jobs = {}
+    for img in images:
+        source_path = os.path.join(IMG_DIR, img)
+        if not os.path.exists(source_path):
+            print(f"✗ Missing: {img}")
+            continue
+
+        source_hash = file_hash(source_path)
+        if not force and is_current(previous.get(img), source_hash, avif, mp4):
+            manifest[img] = previous[img]
+        else:
+            jobs[img] = source_hash
+
+    print(f"{len(manifest)} images unchanged, building {len(jobs)}...")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            img: pool.submit(build_image, img, source_hash, avif, mp4)
+            for img, source_hash in jobs.items()
+        }
+        for img, future in futures.items():
+            try:
+                manifest[img] = future.result()
+                print(f"✓ {img}")
+            except Exception as e:
+                print(f"✗ {img}: {e}")
+
+    # Remove derivatives no longer referenced by any manifest entry
+    keep = {os.path.basename(name) for entry in manifest.values() for name in entry['files']}
+    derived_dir = os.path.join(IMG_DIR, DERIVED_DIR)
+    for name in os.listdir(derived_dir):
+        if name not in keep:
+            os.remove(os.path.join(derived_dir, name))
+
+    with open(images_json, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(manifest.items())), f, indent=4, ensure_ascii=False)
+        f.write('\n')
+
+    # The first file of each entry is its 1x WebP, what most visitors download
+    before = sum(os.path.getsize(os.path.join(IMG_DIR, img)) for img in manifest)
+    after = sum(os.path.getsize(os.path.join(IMG_DIR, entry['files'][0])) for entry in manifest.values())
+    print(f"\n✓ Manifest written: {images_json}")
+    print(f"  Originals: {before / 1e6:.1f} MB, 1x WebP cards: {after / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build card-sized image derivatives and the srcset manifest.')
+    parser.add_argument('--workers', type=int, help='Number of worker processes (default: one per CPU)')
+    parser.add_argument('--no-avif', action='store_true', help="Don't write AVIF versions")
+    parser.add_argument('--no-mp4', action='store_true', help="Don't transcode animated GIFs to MP4")
+    parser.add_argument('--force', action='store_true', help='Rebuild every image, even unchanged ones')
+    args = parser.parse_args()
+
+    try:
+        build_derivatives(workers=args.workers, avif=not args.no_avif, mp4=not args.no_mp4, force=args.force)
+    except ValueError as e:
+        print(f"✗ {e}")
+        raise SystemExit(1)
@@ -0,0 +1,209 @@
+"""
+Cookie banner and overlay removal.
+
+The removal logic is injected with page.add_init_script() before the page
+loads, so it is already running while the page builds itself:
+- a MutationObserver checks every inserted element against one combined
+  selector and removes obvious consent UI (a consent keyword in its id or
+  class and in its visible text) the moment it appears
+- everything that needs layout to judge (generic banners, modals and
+  overlays, fixed backdrops) is left for window.__bannerSweep(), which
+  remove_cookie_banners() calls once the page has loaded
+
+Text is matched against what a reader would see: innerText of visible
+elements, so hidden copy and script or style contents never count. That
+needs layout, so both the observer and the sweep read everything they test
+(visibility, text, sizes) before removing anything, and layout is only
+forced once per pass. The sweep also clicks an accept button inside the
+page, all in a single round-trip.
+"""
+
+import json
+
+
+BANNER_SELECTORS = [
+    '[id*="cookie"]',
+    '[class*="cookie"]',
+    '[id*="consent"]',
+    '[class*="consent"]',
+    '[id*="onetrust"]',
+    '[class*="onetrust"]',
+    '[id*="privacy"]',
+    '[class*="privacy"]',
+    '[class*="banner"]',
+    '[class*="gdpr"]',
+    '[id*="gdpr"]',
+    '.evidon-banner',
+    '.qc-cmp2-container',
+    '[class*="CookieNotice"]',
+    '[class*="cookie-notice"]',
+    '[id*="CookieBanner"]',
+    '[class*="CookieBanner"]',
+    # CNN specific
+    '.privacy-manager',
+    '#privacy-manager',
+    '.privacy-banner',
+    '[class*="modal"]',
+    '[class*="overlay"]',
+    '[id*="modal"]',
+]
+
+# Button labels tried in order when looking for a consent button to click
+ACCEPT_LABELS = ['Accept', 'Agree', 'I Accept', 'OK', 'Got it']
+
+BANNER_INIT_JS = '''
+(() => {
+    if (window.top !== window || window.__bannerSweep) return;
+
+    const SELECTOR = __SELECTOR__;
+    const ACCEPT_LABELS = __ACCEPT_LABELS__;
+    // Words that identify consent UI without needing layout
+    const CONSENT_ATTR = /cookie|consent|onetrust|gdpr|privacy|evidon|cmp/i;
+    const CONSENT_TEXT = /cookie|privacy|consent/i;
+
+    const stats = { whileLoading: 0, byText: 0, bySize: 0, backdrops: 0, clicked: null };
+
+    const attributeMatch = el =>
+        CONSENT_ATTR.test(el.id || '') || CONSENT_ATTR.test(el.getAttribute('class') || '');
+
+    const visible = el => el.checkVisibility
+        ? el.checkVisibility({ visibilityProperty: true })
+        : el.getClientRects().length > 0;
+
+    // innerText leaves out hidden and script/style text, but is the raw textContent for an
+    // element that isn't rendered at all, hence the visibility test first
+    const textMatch = el => visible(el) && CONSENT_TEXT.test(el.innerText || '');
+
+    // Never treat the page itself as a banner, even if its class says "modal-open"
+    const removable = el => el.isConnected && el !== document.body && el !== document.documentElement;
+
+    const candidatesIn = node => {
+        if (node.nodeType !== Node.ELEMENT_NODE) return [];
+        const found = node.matches(SELECTOR) ? [node] : [];
+        return found.concat(Array.from(node.querySelectorAll(SELECTOR)));
+    };
+
+    // Remove consent UI as soon as it is inserted; attributes are tested before any text is read
+    const observer = new MutationObserver(mutations => {
+        const matched = [];
+        for (const mutation of mutations) {
+            for (const node of mutation.addedNodes) {
+                for (const el of candidatesIn(node)) {
+                    if (removable(el) && attributeMatch(el) && textMatch(el)) matched.push(el);
+                }
+            }
+        }
+        // Skip elements already gone with a matched ancestor
+        for (const el of matched.filter(removable)) {
+            el.remove();
+            stats.whileLoading++;
+        }
+    });
+    observer.observe(document, { childList: true, subtree: true });
+
+    window.__bannerSweep = () => {
+        const byText = [];
+        const needsLayout = [];
+        Object.assign(stats, { byText: 0, bySize: 0, backdrops: 0, clicked: null });
+
+        // Read every candidate's text and size in one batch, then remove: one layout pass in total
+        for (const el of document.querySelectorAll(SELECTOR)) {
+            if (!removable(el)) continue;
+            (textMatch(el) ? byText : needsLayout).push(el);
+        }
+        const limit = window.innerHeight * 0.5;
+        const small = needsLayout.filter(el => el.getBoundingClientRect().height < limit);
+
+        for (const el of byText.filter(removable)) {
+            el.remove();
+            stats.byText++;
+        }
+        for (const el of small.filter(removable)) {
+            el.remove();
+            stats.bySize++;
+        }
+
+        // Remove any backdrop/overlay elements
+        for (const div of document.querySelectorAll('body > div')) {
+            const style = window.getComputedStyle(div);
+            if (style.position === 'fixed' && style.zIndex > 1000 &&
+                (style.backgroundColor.includes('rgba') || style.background.includes('rgba'))) {
+                div.remove();
+                stats.backdrops++;
+            }
+        }
+
+        // Re-enable scrolling if it was disabled
+        document.body.style.overflow = 'auto';
+        document.documentElement.style.overflow = 'auto';
+
+        // Click the first visible accept button, trying labels in order
+        const buttons = Array.from(document.querySelectorAll(
+            'button, [class*="accept"][role="button"], [id*="accept"][role="button"]'
+        )).filter(visible);
+        for (const label of ACCEPT_LABELS) {
+            const pattern = new RegExp('\\\\b' + label + '\\\\b', 'i');
+            const button = buttons.find(el => pattern.test(el.innerText || ''));
+            if (button) {
+                button.click();
+                stats.clicked = label;
+                break;
+            }
+        }
+        if (!stats.clicked) {
+            const button = buttons.find(el => el.tagName !== 'BUTTON');
+            if (button) {
+                button.click();
+                stats.clicked = button.id || button.getAttribute('class');
+            }
+        }
+
+        return stats;
+    };
+})();
+'''.replace('__SELECTOR__', json.dumps(', '.join(BANNER_SELECTORS))).replace('__ACCEPT_LABELS__', json.dumps(ACCEPT_LABELS))
+
+
+async def install_banner_remover(page):
+    """
+    Inject the banner remover so it runs before any page script. Call before page.goto().
+    """
+    await page.add_init_script(BANNER_INIT_JS)
+
+
+async def remove_cookie_banners(page):
+    """
+    Remove common cookie consent banners and popups from the page.
+
+    Returns:
+        dict of how many elements were removed ('whileLoading', 'byText',
+        'bySize', 'backdrops') and the accept button label 'clicked', or
+        None if the sweep failed
+    """
+    try:
+        # Pages opened without install_banner_remover() get the script injected now
+        return await page.evaluate('''
+            () => {
+                if (!window.__bannerSweep) {
+                    ''' + BANNER_INIT_JS + '''
+                }
+                return window.__bannerSweep();
+            }
+        ''')
+    except Exception:
+        # Silently fail if cookie banner removal doesn't work
+        return None
+
+
+def describe_banner_stats(stats):
+    """
+    One-line summary of a remove_cookie_banners() result for the progress log.
+    """
+    if stats is None:
+        return "banner removal failed"
+
+    removed = stats['byText'] + stats['bySize'] + stats['backdrops']
+    summary = f"removed {stats['whileLoading']} banners while loading, {removed} after load"
+    if stats['clicked']:
+        summary += f", clicked '{stats['clicked']}'"
+    return summary
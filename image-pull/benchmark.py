@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the screenshot pipeline.
+
+Starts a local HTTP server with synthetic pages that reproduce the hard
+cases met on real sites, then runs screenshot_urls.py against them once per
+capture mode and reports wall time, peak memory and whether the screenshots
+came out right. Nothing touches the network, so runs are reproducible and
+performance changes to the capture path can be compared directly.
+
+Fixture pages:
+- lazy-images: images only loaded by an IntersectionObserver, plus native loading="lazy"
+- cookie-banner: a consent banner and a backdrop overlay matching the banner
+  remover's selectors, and a consent modal inserted after load
+- iframes: eager and lazy iframes
+- tall-page: a 30,000px tall page (past Chromium's texture limit at 3x on mobile)
+- slow-assets: images and a script that take seconds to arrive
+
+Every page is built from solid colour blocks at known positions, so a
+screenshot is checked by sampling the colour at the middle of each block.
+
+Usage:
+    python benchmark.py                    # every mode
+    python benchmark.py --mode shared tiled
+    python benchmark.py --json results.json
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+from dataset import extract_slug_from_url, index_path, source_hash
+from profiles import load_profiles, select_profiles
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Capture modes: name -> extra screenshot_urls.py arguments
+MODES = {
+    'shared': [],
+    'separate': ['--separate-contexts'],
+    'tiled': ['--tiled'],
+    'serial': ['--concurrency', '1'],
+    'sharded': ['--shards', '2'],
+}
+
+# Arguments every mode shares: no politeness delay against localhost, and never touch static/img
+BASE_ARGS = ['--host-interval', '0', '--no-cards']
+
+# How far a sampled channel may be from the expected colour
+COLOR_TOLERANCE = 16
+
+RSS_POLL_INTERVAL = 0.1
+
+COLORS = {
+    'red': (220, 50, 47),
+    'green': (40, 160, 60),
+    'blue': (38, 100, 210),
+    'yellow': (235, 200, 40),
+    'purple': (120, 60, 170),
+    'teal': (20, 150, 150),
+}
+PALETTE = list(COLORS)
+
+# Placeholder behind images that haven't loaded, and the banner colour that must never show
+PLACEHOLDER = (204, 204, 204)
+BANNER = (255, 0, 255)
+
+PAGE_STYLE = '''
+<style>
+    body { margin: 0; background: rgb(204, 204, 204); }
+    .block { display: block; width: 100%; margin: 0; border: 0; }
+</style>
+'''
+
+
+def css(color):
+    return 'rgb({}, {}, {})'.format(*COLORS[color])
+
+
+def page(body, head=''):
+    return f"<!DOCTYPE html><html><head><meta name='viewport' content='width=device-width'>{PAGE_STYLE}{head}</head><body>{body}</body></html>"
+
+
+def lazy_images_page():
+    """
+    24 IntersectionObserver images, then 6 native lazy images, 600px each.
+    """
+    blocks = []
+    checks = []
+    for i in range(30):
+        color = PALETTE[i % len(PALETTE)]
+        if i < 24:
+            blocks.append(f"<img class='block observed' style='height:600px' data-src='/img/{color}.png?n={i}' alt=''>")
+        else:
+            blocks.append(f"<img class='block' style='height:600px' loading='lazy' src='/img/{color}.png?n={i}' alt=''>")
+        checks.append((i * 600 + 300, color))
+
+    script = '''
+    <script>
+        const observer = new IntersectionObserver(entries => {
+            for (const entry of entries) {
+                if (entry.isIntersecting) {
+                    entry.target.src = entry.target.dataset.src;
+                    observer.unobserve(entry.target);
+                }
+            }
+        });
+        document.querySelectorAll('img.observed').forEach(img => observer.observe(img));
+    </script>
+    '''
+    return page(''.join(blocks) + script), checks, 30 * 600
+
+
+def cookie_banner_page():
+    """
+    Colour blocks under a fixed consent banner, a dimming backdrop and a late consent modal.
+    """
+    blocks = ''.join(
+        f"<div class='block' style='height:500px;background:{css(PALETTE[i % len(PALETTE)])}'></div>"
+        for i in range(6)
+    )
+    checks = [(i * 500 + 250, PALETTE[i % len(PALETTE)]) for i in range(6)]
+    banner = (
+        "<div id='cookie-banner' style='position:fixed;bottom:0;left:0;right:0;height:160px;"
+        "background:rgb(255,0,255);z-index:3000'>We use cookies to improve your experience. "
+        "<button>Accept</button></div>"
+        "<div class='overlay-backdrop' style='position:fixed;top:0;left:0;right:0;bottom:0;"
+        "background:rgba(0,0,0,0.5);z-index:2000'></div>"
+    )
+    script = '''
+    <script>
+        setTimeout(() => {
+            const modal = document.createElement('div');
+            modal.className = 'consent-modal';
+            modal.style.cssText = 'position:fixed;top:20%;left:20%;width:60%;height:200px;background:rgb(255,0,255);z-index:4000';
+            modal.textContent = 'Manage your privacy and cookie consent';
+            document.body.appendChild(modal);
+        }, 800);
+    </script>
+    '''
+    return page(blocks + banner + script), checks, 6 * 500
+
+
+def iframes_page():
+    """
+    Two eager iframes at the top and two lazy ones far down the page.
+    """
+    parts = []
+    checks = []
+    y = 0
+    for i, (color, lazy) in enumerate([('green', False), ('blue', False), ('purple', True), ('teal', True)]):
+        if lazy:
+            parts.append("<div class='block' style='height:1600px;background:rgb(204,204,204)'></div>")
+            y += 1600
+        loading = " loading='lazy'" if lazy else ''
+        parts.append(f"<iframe class='block' style='height:400px' src='/frame/{color}?n={i}'{loading}></iframe>")
+        checks.append((y + 200, color))
+        y += 400
+    return page(''.join(parts)), checks, y
+
+
+def tall_page():
+    """
+    30 bands of 1,000px: 30,000px tall, 90,000 device pixels on mobile.
+    """
+    bands = ''.join(
+        f"<div class='block' style='height:1000px;background:{css(PALETTE[i % len(PALETTE)])}'></div>"
+        for i in range(30)
+    )
+    checks = [(i * 1000 + 500, PALETTE[i % len(PALETTE)]) for i in range(30)]
+    return page(bands), checks, 30 * 1000
+
+
+def slow_assets_page():
+    """
+    Images that take 1-3s to arrive, and a slow script that colours the last block.
+    """
+    parts = []
+    checks = []
+    for i, delay in enumerate([1, 2, 3]):
+        color = PALETTE[i]
+        parts.append(f"<img class='block' style='height:500px' src='/img/{color}.png?delay={delay}&n={i}' alt=''>")
+        checks.append((i * 500 + 250, color))
+    parts.append("<div id='late' class='block' style='height:500px'></div>")
+    checks.append((3 * 500 + 250, 'teal'))
+    head = "<script src='/slow.js?delay=2' async></script>"
+    return page(''.join(parts), head), checks, 4 * 500
+
+
+FIXTURES = {
+    'lazy-images': lazy_images_page,
+    'cookie-banner': cookie_banner_page,
+    'iframes': iframes_page,
+    'tall-page': tall_page,
+    'slow-assets': slow_assets_page,
+}
+
+SLOW_JS = f"document.getElementById('late').style.background = '{css('teal')}';"
+
+
+def solid_png(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), COLORS[color]).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class FixtureServer:
+    """
+    Serves the fixture pages on 127.0.0.1 from a background thread.
+
+    Any request can be slowed down with ?delay=SECONDS.
+    """
+
+    def __init__(self):
+        self.pages = {slug: build()[0] for slug, build in FIXTURES.items()}
+        self.images = {color: solid_png(color) for color in COLORS}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self._respond(head_only=True)
+
+            def do_GET(self):
+                self._respond()
+
+            def _respond(self, head_only=False):
+                parsed = urlparse(self.path)
+                delay = float(parse_qs(parsed.query).get('delay', ['0'])[0])
+                if delay:
+                    time.sleep(delay)
+
+                parts = parsed.path.strip('/').split('/')
+                body, content_type = None, 'text/html; charset=utf-8'
+                if parts[0] == 'pages' and len(parts) > 1 and parts[1] in server.pages:
+                    body = server.pages[parts[1]].encode('utf-8')
+                elif parts[0] == 'img' and len(parts) > 1 and parts[1][:-len('.png')] in server.images:
+                    body, content_type = server.images[parts[1][:-len('.png')]], 'image/png'
+                elif parts[0] == 'frame' and len(parts) > 1 and parts[1] in COLORS:
+                    body = f"<html><body style='margin:0;background:{css(parts[1])}'></body></html>".encode('utf-8')
+                elif parts[0] == 'slow.js':
+                    body, content_type = SLOW_JS.encode('utf-8'), 'application/javascript'
+
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-store' if content_type.startswith('text/html') else 'max-age=3600')
+                self.end_headers()
+                if not head_only:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, slug):
+        return f"http://127.0.0.1:{self.port}/pages/{slug}/"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def write_projects(server, directory):
+    """
+    Write a projects.json for the fixture pages, with the index load_projects() expects.
+
+    Returns:
+        Path of the projects.json
+    """
+    projects = [
+        {'order': i, 'name': slug, 'img': None, 'type': 'data', 'date': 'Jan 2026', 'new': 0, 'url': server.url(slug)}
+        for i, slug in enumerate(FIXTURES, 1)
+    ]
+    text = json.dumps(projects, indent=4, ensure_ascii=False)
+    path = os.path.join(directory, 'projects.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+    index = {
+        'source': source_hash(text),
+        'bySlug': {extract_slug_from_url(project['url']): i for i, project in enumerate(projects)},
+    }
+    with open(index_path(path), 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    return path
+
+
+def tree_rss(root_pid):
+    """
+    Resident memory in bytes of a process and all its descendants, from /proc.
+    """
+    children = {}
+    rss = {}
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", 'r') as f:
+                # The command name can contain spaces, so split after its closing parenthesis
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f"/proc/{name}/statm", 'r') as f:
+                rss[int(name)] = int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(name))
+
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+
+def run_mode(projects_json, output_dir, extra_args):
+    """
+    Run screenshot_urls.py in a subprocess and measure it.
+
+    Returns:
+        (wall seconds, peak RSS bytes of the whole process tree incl. Chromium, exit code)
+    """
+    command = [
+        sys.executable, os.path.join(HERE, 'screenshot_urls.py'), projects_json,
+        '--output-dir', output_dir, *BASE_ARGS, *extra_args,
+    ]
+    log_path = os.path.join(output_dir, 'run.log')
+    os.makedirs(output_dir, exist_ok=True)
+
+    peak = 0
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, cwd=HERE)
+        while process.poll() is None:
+            if os.path.isdir('/proc'):
+                peak = max(peak, tree_rss(process.pid))
+            time.sleep(RSS_POLL_INTERVAL)
+    wall = time.perf_counter() - start
+    return wall, peak, process.returncode
+
+
+def close_enough(actual, expected):
+    return all(abs(a - e) <= COLOR_TOLERANCE for a, e in zip(actual, expected))
+
+
+def check_screenshot(path, viewport_width, checks, height):
+    """
+    Check one screenshot against its fixture.
+
+    Returns:
+        List of problems, empty if the screenshot is right
+    """
+    if not os.path.exists(path):
+        return ["missing"]
+
+    with Image.open(path) as image:
+        scale = image.width / viewport_width
+        expected_height = round(height * scale)
+        problems = []
+        if abs(image.height - expected_height) > scale:
+            problems.append(f"height {image.height}px, expected {expected_height}px")
+
+        image = image.convert('RGB')
+        x = image.width // 2
+        for y, color in checks:
+            row = min(round(y * scale), image.height - 1)
+            actual = image.getpixel((x, row))
+            if not close_enough(actual, COLORS[color]):
+                what = 'not loaded' if close_enough(actual, PLACEHOLDER) else f"got {actual}"
+                problems.append(f"{color} block at {y}px {what}")
+
+        # Leftover banners show up as magenta anywhere on a downscaled copy
+        small = image.resize((max(1, image.width // 8), max(1, image.height // 8)))
+        if any(close_enough(pixel, BANNER) for pixel in small.getdata()):
+            problems.append("cookie banner still visible")
+    return problems
+
+
+def check_outputs(output_dir):
+    """
+    Returns:
+        dict of 'slug/viewport' -> list of problems
+    """
+    results = {}
+    for slug, build in FIXTURES.items():
+        _, checks, height = build()
+        for profile in select_profiles(load_profiles()):
+            path = os.path.join(output_dir, profile.name, f"{slug}.png")
+            results[f"{slug}/{profile.name}"] = check_screenshot(path, profile.width, checks, height)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the screenshot pipeline against local fixture pages.')
+    parser.add_argument('--mode', nargs='+', choices=list(MODES), default=list(MODES),
+                        help='Capture modes to run (default: all)')
+    parser.add_argument('--keep', metavar='DIR',
+                        help='Keep screenshots and logs in this directory instead of a temp dir')
+    parser.add_argument('--json', metavar='FILE', help='Also write the results as JSON')
+    args = parser.parse_args()
+
+    # The tall fixture is 1170 x 90,000 pixels on mobile
+    Image.MAX_IMAGE_PIXELS = None
+
+    work_dir = args.keep or tempfile.mkdtemp(prefix='screenshot-bench-')
+    os.makedirs(work_dir, exist_ok=True)
+    results = {}
+
+    try:
+        with FixtureServer() as server:
+            projects_json = write_projects(server, work_dir)
+            print(f"Fixture server on 127.0.0.1:{server.port}, {len(FIXTURES)} pages\n")
+
+            for mode in args.mode:
+                output_dir = os.path.join(work_dir, mode)
+                print(f"Running {mode}...")
+                wall, peak, code = run_mode(projects_json, output_dir, MODES[mode])
+                checks = check_outputs(output_dir)
+                failed = {name: problems for name, problems in checks.items() if problems}
+                results[mode] = {
+                    'wall': round(wall, 2),
+                    'peak_rss_mb': round(peak / 1e6, 1),
+                    'exit_code': code,
+                    'passed': len(checks) - len(failed),
+                    'checked': len(checks),
+                    'failures': failed,
+                }
+                status = '✓' if not failed and code == 0 else '✗'
+                print(f"  {status} {wall:.1f}s, peak RSS {peak / 1e6:.0f} MB, {len(checks) - len(failed)}/{len(checks)} screenshots correct")
+                for name, problems in failed.items():
+                    print(f"    ✗ {name}: {'; '.join(problems)}")
+                if code != 0:
+                    print(f"    ✗ exited with {code}, end of the log:")
+                    with open(os.path.join(output_dir, 'run.log'), 'r', errors='replace') as f:
+                        for line in f.read().strip().splitlines()[-5:]:
+                            print(f"      {line}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{'mode':<10}  {'wall':>7}  {'peak RSS':>9}  correct")
+    for mode, result in results.items():
+        print(f"{mode:<10}  {result['wall']:>6.1f}s  {result['peak_rss_mb']:>6.0f} MB  {result['passed']}/{result['checked']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+
+    ok = all(not result['failures'] and result['exit_code'] == 0 for result in results.values())
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
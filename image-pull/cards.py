@@ -0,0 +1,132 @@
+"""
+Card images made from fresh desktop captures.
+
+Every fresh desktop capture gets a card cut from the top of the screenshot:
+the above-the-fold region is cropped to the card's 16:9 aspect ratio,
+scaled to the 2x card width and saved as a compact JPEG. Where it goes
+depends on the project's `img`:
+- empty: static/img/<slug>.jpg, and the field is filled in the source CSV
+- pointing at a file missing from static/img: that name, or the same name
+  with .jpg when it isn't a JPEG one (the CSV is updated to match)
+- <slug>.jpg, a card made by an earlier run: it's refreshed
+- any other existing file, a hand-made card: it's left alone, and the new
+  card goes to screenshots/cards/<slug>.jpg to compare against
+
+The card is made from the in-memory screenshot buffer handed over by the
+capture, so the full-page PNG is never read back from disk.
+"""
+
+import csv
+import io
+import os
+
+from PIL import Image
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMG_DIR = os.path.join(ROOT, 'static', 'img')
+DATA_CSV = os.path.join(ROOT, 'data-gen', 'PersonalSite_data - Sheet1.csv')
+
+# Cards for projects with a hand-made image, inside the screenshot output directory
+CARDS_DIR = 'cards'
+
+# Cards are shown at 16:9 (.img-wrapper in ProjectCards.svelte), up to ~480px wide
+CARD_SIZE = (960, 540)
+CARD_QUALITY = 82
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+
+def card_target(project, slug, output_dir, img_dir=IMG_DIR):
+    """
+    Where the card from a project's fresh desktop capture goes.
+
+    Args:
+        project: Entry from projects.json
+        slug: The project's slug
+        output_dir: Screenshot output directory, for cards that don't replace a hand-made image
+        img_dir: Folder the site's card images are served from
+
+    Returns:
+        (path to write the card to, new `img` value for the CSV or None to leave it as is)
+    """
+    generated = f"{slug}.jpg"
+    img = project.get('img')
+    if not img:
+        return os.path.join(img_dir, generated), generated
+
+    if not os.path.exists(os.path.join(img_dir, img)):
+        # Cards are always JPEG, so a missing foo.gif becomes foo.jpg
+        name = img if img.lower().endswith(JPEG_EXTENSIONS) else os.path.splitext(img)[0] + '.jpg'
+        if name != img and os.path.exists(os.path.join(img_dir, name)):
+            name = generated
+        return os.path.join(img_dir, name), (name if name != img else None)
+
+    if img == generated:
+        return os.path.join(img_dir, img), None
+    return os.path.join(output_dir, CARDS_DIR, generated), None
+
+
+def make_card(png_bytes, path, size=CARD_SIZE):
+    """
+    Crop the top of a screenshot to the card aspect ratio, scale it down and save it as a JPEG.
+
+    Args:
+        png_bytes: Screenshot PNG; only its top rows are used
+        path: Output path (a .jpg name, see card_target())
+        size: (width, height) of the card
+    """
+    with Image.open(io.BytesIO(png_bytes)) as screenshot:
+        width = screenshot.width
+        height = min(screenshot.height, round(width * size[1] / size[0]))
+        card = screenshot.crop((0, 0, width, height)).convert('RGB')
+
+    card = card.resize(size, Image.LANCZOS)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    card.save(path, 'JPEG', quality=CARD_QUALITY, optimize=True, progressive=True)
+
+
+def fill_image_fields(assignments, csv_path=DATA_CSV, img_dir=IMG_DIR):
+    """
+    Point `img` fields in the project CSV at new cards.
+
+    Only empty fields and fields naming a file missing from img_dir are changed, so an
+    image added by hand since the capture is kept.
+
+    Args:
+        assignments: dict of project URL -> card filename
+        csv_path: Source CSV the site's projects.json is generated from
+        img_dir: Folder the site's card images are served from
+
+    Returns:
+        Number of rows updated
+    """
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        original = f.read()
+
+    rows = list(csv.reader(io.StringIO(original)))
+    header = rows[0]
+    url_col, img_col = header.index('url'), header.index('img')
+
+    updated = 0
+    for row in rows[1:]:
+        if len(row) <= url_col or row[url_col] not in assignments or row[img_col] == assignments[row[url_col]]:
+            continue
+        if not row[img_col] or not os.path.exists(os.path.join(img_dir, row[img_col])):
+            row[img_col] = assignments[row[url_col]]
+            updated += 1
+
+    if updated:
+        # Write the export back with the line endings it came with, so only the changed rows differ
+        first = original.find('\n')
+        newline = '\r\n' if first > 0 and original[first - 1] == '\r' else '\n'
+        out = io.StringIO()
+        csv.writer(out, lineterminator=newline).writerows(rows)
+        text = out.getvalue()
+        # Keep the spreadsheet export's lack of a trailing newline
+        if not original.endswith('\n'):
+            text = text[:-len(newline)]
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+
+    return updated
@@ -0,0 +1,2 @@
+# test_screenshot.py is a manual script that launches a browser when imported
+collect_ignore = ['test_screenshot.py']
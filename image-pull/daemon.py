@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Long-running capture daemon with a warm browser.
+
+Every run of screenshot_urls.py launches Chromium and starts from empty
+browser caches, which dominates the time for a one-off re-shoot of a
+project or two. The daemon launches the browser once and keeps a pool of
+browser contexts, so repeat visits to the same site reuse its HTTP cache
+and cookies. Jobs arrive over a Unix socket, so capturing a single slug
+from the command line takes seconds.
+
+Contexts are reused across jobs and closed after a fixed number of pages,
+which keeps the browser's memory bounded.
+
+Usage:
+    python daemon.py serve                  # start the daemon (foreground)
+    python daemon.py capture SLUG [SLUG...]  # capture projects by slug or URL
+    python daemon.py capture SLUG --force    # even if the manifest says it's fresh
+    python daemon.py status
+    python daemon.py stop
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import socket
+import sys
+import time
+
+from playwright.async_api import async_playwright
+
+from cards import fill_image_fields
+from dataset import PROJECTS_JSON, DatasetError, extract_slug_from_url, load_projects
+from interactive import is_interactive
+from manifest import DEFAULT_MAX_AGE_DAYS, MANIFEST_NAME, Manifest
+from profiles import PROFILES_FILE, ProfileError, load_profiles, select_profiles
+from screenshot_urls import (
+    DEFAULT_CONCURRENCY, DEFAULT_HOST_INTERVAL, DEFAULT_PER_HOST,
+    CaptureSettings, HostLimiter, capture_project, make_interceptor, new_context,
+)
+from store import ScreenshotStore
+from timings import TimingLog
+
+
+# Socket the daemon listens on, inside the output directory
+SOCKET_NAME = '.capture-daemon.sock'
+
+# Timings of daemon jobs, inside the output directory
+DAEMON_TIMINGS_NAME = 'daemon-timings.jsonl'
+
+# A context is closed and replaced after serving this many pages
+PAGES_PER_CONTEXT = 20
+
+
+class ContextPool:
+    """
+    Reusable browser contexts, one set per device configuration.
+
+    A context is handed to one capture at a time. When the capture is done
+    its pages are closed and the context goes back to the pool, until it
+    has served `pages_per_context` pages and is closed for good.
+    """
+
+    def __init__(self, pages_per_context=PAGES_PER_CONTEXT):
+        self.pages_per_context = pages_per_context
+        # key -> list of idle entries
+        self._idle = {}
+        # context -> entry
+        self._busy = {}
+        self.created = 0
+        self.recycled = 0
+
+    @staticmethod
+    def _key(context_options):
+        return json.dumps(context_options, sort_keys=True)
+
+    async def open(self, browser, context_options, interceptor=None, stats=None):
+        idle = self._idle.setdefault(self._key(context_options), [])
+        if idle:
+            entry = idle.pop()
+        else:
+            entry = {'key': self._key(context_options), 'pages': 0, 'stats': None}
+            # Pooled contexts outlive one URL, so the interceptor asks for the current stats per request
+            entry['context'] = await new_context(browser, context_options, interceptor, lambda: entry['stats'])
+            self.created += 1
+
+        entry['stats'] = stats
+        self._busy[entry['context']] = entry
+        return entry['context']
+
+    async def close(self, context):
+        entry = self._busy.pop(context)
+        entry['pages'] += 1
+        try:
+            for page in list(context.pages):
+                await page.close()
+        except Exception:
+            # A context that can't close its pages isn't safe to hand out again
+            entry['pages'] = self.pages_per_context
+
+        if entry['pages'] >= self.pages_per_context:
+            try:
+                await context.close()
+            except Exception:
+                pass
+            self.recycled += 1
+        else:
+            self._idle[entry['key']].append(entry)
+
+    async def close_all(self):
+        for idle in self._idle.values():
+            for entry in idle:
+                await entry['context'].close()
+        self._idle.clear()
+
+    def describe(self):
+        idle = sum(len(entries) for entries in self._idle.values())
+        return f"{idle} idle, {len(self._busy)} busy, {self.created} created, {self.recycled} recycled"
+
+
+class CaptureDaemon:
+    """
+    Serves capture jobs from a warm browser.
+
+    Args:
+        json_file: The site's projects.json; re-read for every job, so dataset changes are picked up
+        output_dir: Directory containing a screenshot folder per profile
+        concurrency: Number of projects captured at the same time
+        pages_per_context: Close a pooled context after this many pages
+        Remaining arguments are as for take_screenshots()
+    """
+
+    def __init__(self, json_file=PROJECTS_JSON, output_dir='screenshots', concurrency=DEFAULT_CONCURRENCY,
+                 per_host=DEFAULT_PER_HOST, host_interval=DEFAULT_HOST_INTERVAL,
+                 pages_per_context=PAGES_PER_CONTEXT, shared_viewports=True, incremental=True,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS, intercept=True, tiling=None, cards=True, profiles=None,
+                 store='hard'):
+        self.json_file = json_file
+        self.output_dir = output_dir
+        self.limiter = HostLimiter(per_host, host_interval)
+        self.slots = asyncio.Semaphore(concurrency)
+        self.pool = ContextPool(pages_per_context)
+        self.settings = CaptureSettings(
+            shared_viewports=shared_viewports,
+            interceptor=make_interceptor(output_dir) if intercept else None,
+            tiling=tiling,
+            manifest=Manifest(os.path.join(output_dir, MANIFEST_NAME)) if incremental else None,
+            max_age_days=max_age_days,
+            cards=cards,
+            timings=TimingLog(os.path.join(output_dir, DAEMON_TIMINGS_NAME)),
+            contexts=self.pool,
+            profiles=profiles,
+            store=ScreenshotStore(output_dir, links=store) if store else None,
+        )
+        self.browser = None
+        self.started = time.time()
+        self.jobs = 0
+        self._stop = None
+
+    async def serve(self, socket_path):
+        for profile in self.settings.profiles:
+            os.makedirs(os.path.join(self.output_dir, profile.name), exist_ok=True)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        self._stop = asyncio.Event()
+        async with async_playwright() as p:
+            self.browser = await p.chromium.launch(headless=True)
+            server = await asyncio.start_unix_server(self._handle, path=socket_path)
+            print(f"✓ Capture daemon listening on {socket_path}")
+            try:
+                async with server:
+                    await self._stop.wait()
+            finally:
+                await self.pool.close_all()
+                await self.browser.close()
+                if os.path.exists(socket_path):
+                    os.remove(socket_path)
+        print("✓ Capture daemon stopped")
+
+    async def _handle(self, reader, writer):
+        try:
+            request = json.loads(await reader.readline())
+            command = request.get('command')
+            if command == 'capture':
+                response = await self.capture(request.get('slugs', []), request.get('force', False))
+            elif command == 'status':
+                response = self.status()
+            elif command == 'stop':
+                response = {'ok': True}
+                self._stop.set()
+            else:
+                response = {'ok': False, 'error': f"Unknown command: {command}"}
+        except Exception as e:
+            response = {'ok': False, 'error': str(e)}
+
+        writer.write(json.dumps(response).encode('utf-8') + b'\n')
+        await writer.drain()
+        writer.close()
+
+    def status(self):
+        return {
+            'ok': True,
+            'uptime': round(time.time() - self.started),
+            'jobs': self.jobs,
+            'contexts': self.pool.describe(),
+        }
+
+    async def capture(self, slugs, force=False):
+        """
+        Capture projects by slug (or URL).
+
+        Returns:
+            Response dict with one result per requested slug
+        """
+        self.jobs += 1
+        try:
+            projects = dict(load_projects(self.json_file))
+        except DatasetError as e:
+            return {'ok': False, 'error': str(e)}
+
+        settings = copy.copy(self.settings)
+        settings.force = force
+        # Slugs are claimed per request, so claims don't pile up over the daemon's lifetime
+        if settings.store is not None:
+            settings.store = settings.store.for_run()
+        card_assignments = {}
+
+        async def capture_one(slug):
+            project = projects.get(slug)
+            if project is None:
+                return {'slug': slug, 'ok': False, 'error': 'unknown slug'}
+            if is_interactive(project['url']):
+                # They need a browser with software WebGL and their own budget; see interactive.py
+                return {'slug': slug, 'ok': False, 'error': 'interactive pages are captured by screenshot_urls.py'}
+
+            start = time.perf_counter()
+            async with self.slots:
+                failed = await capture_project(
+                    self.browser, self.limiter, slug, project, '[daemon]', self.output_dir, settings, card_assignments,
+                )
+            result = {'slug': slug, 'ok': not failed, 'seconds': round(time.perf_counter() - start, 1)}
+            if failed:
+                result['error'] = '; '.join(f"{name}: {error}" for name, error in failed.items())
+            return result
+
+        requested = [extract_slug_from_url(slug) if slug.startswith('http') else slug for slug in slugs]
+        results = await asyncio.gather(*(capture_one(slug) for slug in requested))
+
+        if card_assignments:
+            await asyncio.to_thread(fill_image_fields, card_assignments)
+        return {'ok': all(result['ok'] for result in results), 'results': results}
+
+
+def send(socket_path, request):
+    """
+    Send one request to the daemon and wait for its response.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with client.makefile('r', encoding='utf-8') as f:
+            return json.loads(f.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Capture daemon keeping a warm browser between runs.')
+    parser.add_argument('--output-dir', default='screenshots',
+                        help='Directory to save screenshots (default: screenshots)')
+    parser.add_argument('--socket', help=f'Unix socket path (default: {SOCKET_NAME} in the output directory)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Start the daemon in the foreground')
+    serve.add_argument('json_file', nargs='?', default=PROJECTS_JSON,
+                       help="The site's projects.json (default: src/routes/assets/projects.json)")
+    serve.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                       help=f'Number of projects captured at once (default: {DEFAULT_CONCURRENCY})')
+    serve.add_argument('--pages-per-context', type=int, default=PAGES_PER_CONTEXT,
+                       help=f'Close a pooled context after this many pages (default: {PAGES_PER_CONTEXT})')
+    serve.add_argument('--separate-contexts', action='store_true',
+                       help='Load each page again per viewport instead of resizing one page')
+    serve.add_argument('--no-intercept', action='store_true',
+                       help='Let every request through untouched (no blocklist, no asset cache)')
+    serve.add_argument('--no-cards', action='store_true',
+                       help="Don't make card images from desktop captures")
+    serve.add_argument('--profiles', nargs='+', metavar='NAME',
+                       help='Capture profiles to use (default: those marked default in the profiles file)')
+    serve.add_argument('--profiles-file', default=PROFILES_FILE, metavar='FILE',
+                       help='TOML file describing the capture profiles (default: profiles.toml)')
+    serve.add_argument('--no-store', action='store_true',
+                       help='Write screenshots as plain files instead of keeping every capture in the store')
+
+    capture = commands.add_parser('capture', help='Capture projects by slug or URL')
+    capture.add_argument('slugs', nargs='+', help='Project slugs (or URLs)')
+    capture.add_argument('--force', action='store_true',
+                         help='Re-capture even if the manifest says the capture is fresh')
+
+    commands.add_parser('status', help="Show the daemon's uptime, job count and context pool")
+    commands.add_parser('stop', help='Stop the daemon')
+    args = parser.parse_args()
+
+    socket_path = args.socket or os.path.join(args.output_dir, SOCKET_NAME)
+
+    if args.command == 'serve':
+        if not os.path.exists(args.json_file):
+            print(f"Error: {args.json_file} not found!")
+            return 1
+        try:
+            profiles = select_profiles(load_profiles(args.profiles_file), args.profiles)
+        except ProfileError as e:
+            print(f"Error: {e}")
+            return 1
+        os.makedirs(args.output_dir, exist_ok=True)
+        daemon = CaptureDaemon(
+            args.json_file, args.output_dir,
+            concurrency=args.concurrency,
+            pages_per_context=args.pages_per_context,
+            shared_viewports=not args.separate_contexts,
+            intercept=not args.no_intercept,
+            cards=not args.no_cards,
+            profiles=profiles,
+            store=None if args.no_store else 'hard',
+        )
+        try:
+            asyncio.run(daemon.serve(socket_path))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    request = {'command': args.command}
+    if args.command == 'capture':
+        request.update(slugs=args.slugs, force=args.force)
+
+    try:
+        response = send(socket_path, request)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"Error: no capture daemon on {socket_path}, start one with `python daemon.py serve`")
+        return 1
+
+    if not response['ok'] and 'error' in response:
+        print(f"✗ {response['error']}")
+    elif args.command == 'capture':
+        for result in response['results']:
+            if result['ok']:
+                print(f"✓ {result['slug']} ({result['seconds']}s)")
+            else:
+                print(f"✗ {result['slug']}: {result.get('error', 'capture failed, see the daemon log')}")
+    elif args.command == 'status':
+        print(f"✓ Up {response['uptime']}s, {response['jobs']} jobs, contexts: {response['contexts']}")
+    else:
+        print("✓ Stopping")
+    return 0 if response['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
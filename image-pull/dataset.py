@@ -0,0 +1,108 @@
+"""
+The canonical project list and its precomputed indexes.
+
+data-gen/build_projects.py writes src/routes/assets/projects.json (the list
+the site renders) and projects.index.json next to it:
+- bySlug: screenshot slug -> position in projects.json
+- byDate: positions sorted newest first, the order the site renders the
+  cards in; projects from the same month keep their `order`, then their
+  list position
+- missingImages: `img` files that aren't in static/img or can't be read
+- imageMeta: `img` file -> size, dominant colour and blurred placeholder
+  (see data-gen/image_meta.py)
+- source: SHA-256 of the projects.json the index was built from
+
+The screenshot tools read both files through load_projects(), so slugs are
+never re-derived per run and a stale index is caught before capturing.
+"""
+
+import hashlib
+import json
+import os
+import re
+from urllib.parse import urlparse
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECTS_JSON = os.path.join(ROOT, 'src', 'routes', 'assets', 'projects.json')
+
+
+class DatasetError(ValueError):
+    """
+    projects.json has no index, or its index was built from a different version.
+    """
+
+
+def index_path(projects_json):
+    """
+    Where the index for a projects file lives: projects.json -> projects.index.json.
+    """
+    return os.path.splitext(projects_json)[0] + '.index.json'
+
+
+def source_hash(text):
+    """
+    SHA-256 of the projects.json text an index is built from.
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def extract_slug_from_url(url):
+    """
+    Extract a slug from the URL path.
+    For example: 'https://edition.cnn.com/interactive/2025/08/05/world/north-korea-it-worker-scheme-vis-intl-hnk/index.html'
+    Returns: 'north-korea-it-worker-scheme-vis-intl-hnk'
+    """
+    parsed = urlparse(url)
+    path = parsed.path
+
+    # Remove leading/trailing slashes
+    path = path.strip('/')
+
+    # Split by slashes and get the last meaningful part
+    parts = path.split('/')
+
+    # Filter out common file names
+    parts = [p for p in parts if p not in ['index.html', 'index.htm', '']]
+
+    if parts:
+        # Get the last part which is usually the slug
+        slug = parts[-1]
+
+        # Remove file extensions
+        slug = re.sub(r'\.(html|htm|php)$', '', slug)
+
+        return slug
+
+    # Fallback: use the domain name if no path
+    return parsed.netloc.replace('.', '-')
+
+
+def load_projects(projects_json=PROJECTS_JSON):
+    """
+    Load the canonical project list with its slugs from the prebuilt index.
+
+    Args:
+        projects_json: projects.json written by data-gen/build_projects.py
+
+    Returns:
+        List of (slug, project) tuples in list order
+
+    Raises:
+        DatasetError: if the index is missing or was built from a different projects.json
+    """
+    with open(projects_json, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    try:
+        with open(index_path(projects_json), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        index = None
+
+    if index is None or index.get('source') != source_hash(text):
+        raise DatasetError(f"{index_path(projects_json)} is missing or out of date, run `npm run data`")
+
+    projects = json.loads(text)
+    slugs = {position: slug for slug, position in index['bySlug'].items()}
+    return [(slugs[position], project) for position, project in enumerate(projects)]
@@ -0,0 +1,178 @@
+"""
+Output formats for screenshots.
+
+Chromium hands back full-page captures as quickly-compressed PNG, which at
+3x on a long article runs to tens of megabytes. Screenshots can instead be
+saved as:
+- 'png': Chromium's PNG as is (the default), or re-compressed with
+  `optimize` for smaller files at the same pixels
+- 'webp' / 'avif': lossy, with a quality setting
+- 'jpeg': taken as JPEG by Chromium itself (Playwright's type='jpeg'), so
+  there is nothing to re-encode unless the capture is also downscaled
+
+Captures taken at a higher device scale factor than `max_scale` (the 3x
+mobile capture) can be downscaled on the way.
+
+Encoding runs in a process pool, so a worker can hand the capture over and
+close its page while the image is compressed. Tiled captures of very tall
+pages don't go through the encoder: they are downscaled and compressed strip
+by strip as they are streamed to disk (see tiled.py), and stay PNG, since
+decoding them again to convert them would undo the point of tiling.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, features
+
+
+OUTPUT_FORMATS = ('png', 'webp', 'avif', 'jpeg')
+
+EXTENSIONS = {'png': '.png', 'webp': '.webp', 'avif': '.avif', 'jpeg': '.jpg'}
+
+DEFAULT_QUALITY = {'webp': 80, 'avif': 55, 'jpeg': 85}
+
+# Tallest image each format can store; taller captures fall back to PNG
+MAX_HEIGHT = {'webp': 16383, 'jpeg': 65535}
+
+
+class OutputOptions:
+    """
+    How screenshots are written.
+
+    Args:
+        format: One of OUTPUT_FORMATS
+        quality: Quality for lossy formats, 0-100 (None = DEFAULT_QUALITY for the format)
+        optimize: Re-compress PNGs with maximum compression
+        max_scale: Downscale captures taken at a higher device scale factor to this one (None = keep)
+        workers: Encoder processes (None = one per CPU)
+    """
+
+    def __init__(self, format='png', quality=None, optimize=False, max_scale=None, workers=None):
+        if format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {format}")
+        if format == 'avif' and not features.check('avif'):
+            raise ValueError("This Pillow build can't write AVIF")
+        self.format = format
+        self.quality = quality if quality is not None else DEFAULT_QUALITY.get(format)
+        self.optimize = optimize
+        self.max_scale = max_scale
+        self.workers = workers
+
+    @property
+    def extension(self):
+        return EXTENSIONS[self.format]
+
+    def downscale(self, device_scale_factor):
+        """
+        Factor to resize a capture taken at this device scale factor by (1 = keep).
+        """
+        if self.max_scale is None or device_scale_factor <= self.max_scale:
+            return 1
+        return self.max_scale / device_scale_factor
+
+    def needs_encoding(self, device_scale_factor):
+        """
+        Whether captures at this scale have to go through the encoder, rather than straight to disk.
+        """
+        if self.format == 'png':
+            return self.optimize or self.downscale(device_scale_factor) != 1
+        return True
+
+    def capture_type(self):
+        """
+        Image type to ask Chromium for: JPEG output is captured as JPEG, everything else as PNG.
+        """
+        return 'jpeg' if self.format == 'jpeg' else 'png'
+
+
+def find_capture(base, extension='.png'):
+    """
+    The existing screenshot for a path without extension, in any output format.
+
+    The file with the preferred extension wins; returns None if there's none.
+    """
+    for ext in [extension] + [ext for ext in EXTENSIONS.values() if ext != extension]:
+        if os.path.exists(base + ext):
+            return base + ext
+    return None
+
+
+def encode_screenshot(data, base, image_format, quality=None, optimize=False, downscale=1):
+    """
+    Write a captured screenshot in the requested format. Runs in the encoder processes.
+
+    Args:
+        data: Image bytes from Chromium (PNG, or JPEG for 'jpeg' output)
+        base: Output path without extension
+        image_format: One of OUTPUT_FORMATS
+        quality: Quality for lossy formats
+        optimize: Use maximum PNG compression
+        downscale: Resize factor, 1 = keep the size
+
+    Returns:
+        (path, size in bytes) of the written file
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        if image.format == 'JPEG' and image_format == 'jpeg' and downscale == 1:
+            # Chromium already encoded it
+            path = base + EXTENSIONS['jpeg']
+            with open(path, 'wb') as f:
+                f.write(data)
+            return path, len(data)
+
+        image = image.convert('RGB')
+
+    if downscale != 1:
+        factor = 1 / downscale
+        if factor == int(factor):
+            image = image.reduce(int(factor))
+        else:
+            image = image.resize((round(image.width * downscale), round(image.height * downscale)), Image.LANCZOS)
+
+    if image.height > MAX_HEIGHT.get(image_format, image.height):
+        image_format = 'png'
+
+    path = base + EXTENSIONS[image_format]
+    if image_format == 'png':
+        image.save(path, 'PNG', optimize=optimize, compress_level=9 if optimize else 6)
+    elif image_format == 'webp':
+        image.save(path, 'WEBP', quality=quality, method=4)
+    elif image_format == 'avif':
+        image.save(path, 'AVIF', quality=quality)
+    else:
+        image.save(path, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return path, os.path.getsize(path)
+
+
+class Encoder:
+    """
+    Encodes screenshots in a pool of processes, away from the event loop driving the browser.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        # Spawn rather than fork: the parent runs Playwright's threads
+        self._pool = ProcessPoolExecutor(max_workers=options.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    async def encode(self, data, base, device_scale_factor=1, options=None):
+        """
+        Write a capture as `base` plus the format's extension.
+
+        Args:
+            options: OutputOptions for this capture, e.g. a profile's own format (None = the encoder's)
+
+        Returns:
+            (path, size in bytes); the extension is .png when the capture was too tall for the format
+        """
+        options = options or self.options
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool, encode_screenshot,
+            data, base, options.format, options.quality, options.optimize, options.downscale(device_scale_factor),
+        )
+
+    def close(self):
+        self._pool.shutdown()
@@ -0,0 +1,165 @@
+"""
+HAR record and replay: re-capture pages from archived traffic instead of the network.
+
+Iterating on capture settings or banner selectors against live pages is
+slow, and the pages change between runs. In record mode every browser
+context's traffic is saved as a HAR archive (Playwright's
+route_from_har(update=True)). Each slug has a folder of archives: one
+per profile with separate contexts, or one shared archive for the page
+that shared-viewport mode loads once and resizes for every profile:
+
+    screenshots/har/<slug>/<profile>.har.zip
+    screenshots/har/<slug>/_shared.har.zip
+
+Either mode replays from the other's archive when it has none of its own,
+so a slug recorded in one mode can be re-rendered in the other.
+
+In replay mode the same contexts are answered from those archives, so a
+re-render takes seconds and gives the same page every time. Requests the
+archive doesn't have are either aborted, which keeps the run entirely
+offline, or let through to the network ('fallback'). 'auto' replays the
+slugs that have an archive and records the others.
+
+An archive is only kept when every capture made in its context succeeded,
+so a failed or abandoned capture never leaves half a recording behind.
+"""
+
+import os
+
+
+# Archives live in this folder inside the output directory, one folder per slug
+HAR_DIR = 'har'
+
+HAR_MODES = ('record', 'replay', 'auto')
+
+# What happens to requests that aren't in the archive when replaying
+MISSING_POLICIES = ('abort', 'fallback')
+
+HAR_SUFFIX = '.har.zip'
+
+# Archive name for shared-viewport captures; profile names can't start with '_', so it never clashes
+SHARED_NAME = '_shared'
+
+
+class HarMissingError(FileNotFoundError):
+    """
+    Replay was asked for but there's no archive for this slug and profile.
+    """
+
+
+class HarArchive:
+    """
+    Recording or replay of one browser context's traffic.
+
+    Args:
+        path: Archive path (.har.zip, responses are stored as separate files in the zip)
+        record: Record into the archive rather than replay from it
+        missing: Policy for requests the archive doesn't have, one of MISSING_POLICIES
+    """
+
+    def __init__(self, path, record, missing='abort'):
+        self.path = path
+        self.record = record
+        self.missing = missing
+
+    @property
+    def recording_path(self):
+        """
+        Where a recording is written until its captures have succeeded.
+        """
+        return self.path[:-len(HAR_SUFFIX)] + '.recording' + HAR_SUFFIX
+
+    async def attach(self, context):
+        """
+        Start recording or replaying in a browser context, before any page is opened.
+
+        The HAR router is added after the interceptor, so it sees requests first;
+        with the 'fallback' policy, requests it doesn't have go on to the interceptor.
+        """
+        if self.record:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Playwright writes the archive when the context is closed
+            await context.route_from_har(
+                self.recording_path, update=True, update_content='attach', update_mode='minimal',
+            )
+        else:
+            await context.route_from_har(self.path, not_found=self.missing)
+
+    def finish(self, ok):
+        """
+        Keep a recording whose captures all succeeded and drop any other. Call once the context is closed.
+        """
+        if not self.record or not os.path.exists(self.recording_path):
+            return
+        if ok:
+            os.replace(self.recording_path, self.path)
+        else:
+            os.remove(self.recording_path)
+
+    def describe(self):
+        return f"{'recording' if self.record else 'replaying'} {os.path.basename(self.path)}"
+
+
+class HarOptions:
+    """
+    HAR mode of a run.
+
+    Args:
+        directory: Folder holding one folder of archives per slug
+        mode: One of HAR_MODES
+        missing: Policy for requests not in an archive when replaying, one of MISSING_POLICIES
+    """
+
+    def __init__(self, directory, mode='auto', missing='abort'):
+        if mode not in HAR_MODES:
+            raise ValueError(f"Unknown HAR mode: {mode}")
+        if missing not in MISSING_POLICIES:
+            raise ValueError(f"Unknown policy for requests missing from the HAR: {missing}")
+        self.directory = directory
+        self.mode = mode
+        self.missing = missing
+
+    @property
+    def replay(self):
+        """
+        Every capture comes from an archive, so there's nothing to check against the live site.
+        """
+        return self.mode == 'replay'
+
+    @property
+    def offline(self):
+        """
+        Replaying without ever touching the network.
+        """
+        return self.replay and self.missing == 'abort'
+
+    def archive_path(self, slug, profile_name=None):
+        """
+        Archive of one profile's context, or of the shared-viewport page when `profile_name` is None.
+        """
+        return os.path.join(self.directory, slug, (profile_name or SHARED_NAME) + HAR_SUFFIX)
+
+    def archive(self, slug, profile_name, shared=False):
+        """
+        The archive for a browser context opened with this profile for this slug.
+
+        Args:
+            slug: The project's slug
+            profile_name: Profile the context was opened with
+            shared: The context is the shared-viewport page, captured for every profile
+
+        Raises:
+            HarMissingError: In replay mode, when the slug was never recorded in either mode
+        """
+        own = self.archive_path(slug, None if shared else profile_name)
+        if self.mode == 'record':
+            return HarArchive(own, record=True, missing=self.missing)
+
+        # Fall back to the archive the other mode records
+        other = self.archive_path(slug, profile_name if shared else None)
+        for path in (own, other):
+            if os.path.exists(path):
+                return HarArchive(path, record=False, missing=self.missing)
+        if self.mode == 'replay':
+            raise HarMissingError(f"No HAR archive at {own} or {other}, record one with --har record")
+        return HarArchive(own, record=True, missing=self.missing)
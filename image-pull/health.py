@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+URL health check: find dead and redirected project links before capturing.
+
+A dead link would otherwise only show up once a browser has waited out its
+whole navigation timeout on it. Before the browser is launched, every
+project URL is checked over one pooled HTTP connection per host, all at
+once: a HEAD request, or a GET when the server doesn't answer HEAD
+properly. Redirects are followed and every hop is recorded, so moved
+articles can be updated in the spreadsheet.
+
+Each URL ends up in one of HEALTH_STATES:
+- ok: answered 2xx/3xx without a redirect
+- redirected: answered after one or more redirects
+- dead: 404/410; left out of the capture
+- error: timeouts, failed DNS lookups, server errors and refusals
+  (401/403/429); these may be transient (or the machine offline) or bot
+  protection, so the page is still captured
+
+Results are kept in screenshots/health.json for a few hours, keyed by URL:
+
+    {
+        "https://edition.cnn.com/...": {
+            "state": "redirected",
+            "code": 200,
+            "method": "HEAD",
+            "final_url": "https://edition.cnn.com/.../index.html",
+            "redirects": [{"code": 301, "url": "https://edition.cnn.com/..."}],
+            "error": null,
+            "elapsed": 0.412,
+            "checked_at": "2026-10-18T10:12:03+00:00"
+        }
+    }
+
+Errors aren't cached, so a flaky URL is checked again on the next run.
+
+Run on its own to check every project without capturing:
+
+    python health.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import aiohttp
+
+from dataset import PROJECTS_JSON, DatasetError, load_projects
+from manifest import USER_AGENT
+
+
+HEALTH_NAME = 'health.json'
+
+HEALTH_STATES = ('ok', 'redirected', 'dead', 'error')
+
+# How long a result is trusted before the URL is checked again
+DEFAULT_HEALTH_TTL_HOURS = 12
+
+# Seconds one URL may take, redirects included
+DEFAULT_HEALTH_TIMEOUT = 15
+
+# Requests in flight at once; the per-host cap is the capture's --per-host
+DEFAULT_HEALTH_CONCURRENCY = 16
+
+MAX_REDIRECTS = 10
+
+# Status codes that mean the page is gone
+DEAD_CODES = {404, 410}
+
+
+class HealthCache:
+    """
+    Recent health results, loaded from and saved to a JSON file.
+
+    Args:
+        path: Cache to load
+        save_path: Where save() writes, when it isn't `path` (a shard's own file, see shards.py)
+    """
+
+    def __init__(self, path, save_path=None):
+        self.path = path
+        self.save_path = save_path or path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def fresh(self, url, ttl_hours=DEFAULT_HEALTH_TTL_HOURS):
+        """
+        The cached result for a URL, or None if there's none younger than ttl_hours.
+        """
+        entry = self.entries.get(url)
+        if entry is None or ttl_hours is None:
+            return None
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(entry['checked_at'])
+        return entry if age.total_seconds() < ttl_hours * 3600 else None
+
+    def record(self, url, entry):
+        if entry['state'] == 'error':
+            self.entries.pop(url, None)
+        else:
+            self.entries[url] = entry
+
+    def save(self):
+        """
+        Write the cache atomically so an interrupted run never leaves a half-written file.
+        """
+        tmp_path = f"{self.save_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=4, sort_keys=True, ensure_ascii=False)
+        os.replace(tmp_path, self.save_path)
+
+
+def classify(code, redirects):
+    if code in DEAD_CODES:
+        return 'dead'
+    if code >= 400:
+        return 'error'
+    return 'redirected' if redirects else 'ok'
+
+
+async def request(session, method, url):
+    """
+    One request, following redirects, without reading the body.
+
+    Returns:
+        (final status code, final URL, list of redirect hops)
+    """
+    async with session.request(method, url, allow_redirects=True, max_redirects=MAX_REDIRECTS) as response:
+        redirects = [{'code': hop.status, 'url': str(hop.url)} for hop in response.history]
+        return response.status, str(response.url), redirects
+
+
+async def check_url(session, url):
+    """
+    Check one URL: HEAD first, then GET if HEAD failed or wasn't answered properly.
+
+    Returns:
+        Result dict (see the module docstring)
+    """
+    started = time.monotonic()
+    entry = {'code': None, 'method': 'HEAD', 'final_url': None, 'redirects': [], 'error': None}
+    try:
+        try:
+            entry['code'], entry['final_url'], entry['redirects'] = await request(session, 'HEAD', url)
+        except asyncio.TimeoutError:
+            raise
+        except aiohttp.ClientError:
+            # Some servers drop HEAD requests rather than answer them
+            entry['code'] = None
+        # Plenty of servers answer HEAD with 403, 404 or 405 while the page itself works
+        if entry['code'] is None or entry['code'] >= 400:
+            entry['method'] = 'GET'
+            entry['code'], entry['final_url'], entry['redirects'] = await request(session, 'GET', url)
+        entry['state'] = classify(entry['code'], entry['redirects'])
+    except asyncio.TimeoutError:
+        entry['state'] = 'error'
+        entry['error'] = f"No answer within {session.timeout.total:g}s"
+    except aiohttp.TooManyRedirects:
+        entry['state'] = 'error'
+        entry['error'] = f"More than {MAX_REDIRECTS} redirects"
+    except aiohttp.ClientError as e:
+        # Including hosts that don't resolve: an offline run or a resolver hiccup looks the same
+        entry['state'] = 'error'
+        entry['error'] = str(e) or type(e).__name__
+
+    entry['elapsed'] = round(time.monotonic() - started, 3)
+    entry['checked_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    return entry
+
+
+async def check_urls(urls, cache=None, ttl_hours=DEFAULT_HEALTH_TTL_HOURS, timeout=DEFAULT_HEALTH_TIMEOUT,
+                     concurrency=DEFAULT_HEALTH_CONCURRENCY, per_host=None):
+    """
+    Check many URLs at once over a pooled client, reusing fresh cached results.
+
+    Args:
+        urls: URLs to check
+        cache: HealthCache to read fresh results from and record new ones in (None = check everything)
+        ttl_hours: Age below which a cached result is reused
+        timeout: Seconds one URL may take
+        concurrency: Requests in flight at once
+        per_host: Requests in flight to one host (None = only the overall limit)
+
+    Returns:
+        (dict of url -> result, number of URLs actually requested)
+    """
+    results = {}
+    pending = []
+    for url in dict.fromkeys(urls):
+        entry = cache.fresh(url, ttl_hours) if cache is not None else None
+        if entry is not None:
+            results[url] = entry
+        else:
+            pending.append(url)
+
+    if pending:
+        # One session, so connections (and TLS handshakes) to a host are reused across its URLs
+        connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host or 0, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            headers={'User-Agent': USER_AGENT},
+        ) as session:
+            entries = await asyncio.gather(*(check_url(session, url) for url in pending))
+        for url, entry in zip(pending, entries):
+            results[url] = entry
+            if cache is not None:
+                cache.record(url, entry)
+
+    return results, len(pending)
+
+
+def health_report(results):
+    """
+    Lines describing every URL that needs attention, followed by a count per state.
+    """
+    lines = []
+    for url, entry in results.items():
+        if entry['state'] == 'dead':
+            reason = f"HTTP {entry['code']}" if entry['code'] else entry['error']
+            lines.append(f"✗ Dead ({reason}): {url}")
+        elif entry['state'] == 'redirected':
+            hops = ' -> '.join(str(hop['code']) for hop in entry['redirects'])
+            lines.append(f"! Redirected ({hops}): {url}")
+            lines.append(f"  now {entry['final_url']}")
+        elif entry['state'] == 'error':
+            reason = f"HTTP {entry['code']}" if entry['code'] else entry['error']
+            lines.append(f"! Unreachable ({reason}), capturing anyway: {url}")
+
+    counts = {state: 0 for state in HEALTH_STATES}
+    for entry in results.values():
+        counts[entry['state']] += 1
+    lines.append(', '.join(f"{count} {state}" for state, count in counts.items() if count) or 'No URLs')
+    return lines
+
+
+class HealthOptions:
+    """
+    How project URLs are checked before capturing.
+
+    Args:
+        ttl_hours: Age below which a cached result is reused (0 = check every URL again)
+        timeout: Seconds one URL may take
+        concurrency: Requests in flight at once
+    """
+
+    def __init__(self, ttl_hours=DEFAULT_HEALTH_TTL_HOURS, timeout=DEFAULT_HEALTH_TIMEOUT,
+                 concurrency=DEFAULT_HEALTH_CONCURRENCY):
+        if ttl_hours < 0 or timeout <= 0 or concurrency < 1:
+            raise ValueError("Health check TTL must not be negative, its timeout and concurrency must be positive")
+        self.ttl_hours = ttl_hours
+        self.timeout = timeout
+        self.concurrency = concurrency
+
+    async def check(self, urls, cache, per_host=None):
+        """
+        Check the URLs and print the report.
+
+        Returns:
+            Set of dead URLs
+        """
+        results, checked = await check_urls(
+            urls, cache, self.ttl_hours, self.timeout, self.concurrency, per_host,
+        )
+        if cache is not None:
+            cache.save()
+        print(f"Checked {checked} URLs ({len(results) - checked} from the last {self.ttl_hours:g} hours)")
+        for line in health_report(results):
+            print(line)
+        print()
+        return {url for url, entry in results.items() if entry['state'] == 'dead'}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check that every project URL still resolves.')
+    parser.add_argument('--json-file', default=PROJECTS_JSON, help='projects.json to read (default: the site\'s)')
+    parser.add_argument('--output-dir', default='screenshots',
+                        help=f'Folder holding {HEALTH_NAME} (default: screenshots)')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_HEALTH_TTL_HOURS,
+                        help=f'Reuse results younger than this many hours '
+                             f'(default: {DEFAULT_HEALTH_TTL_HOURS}, 0 = check every URL again)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_HEALTH_TIMEOUT,
+                        help=f'Seconds one URL may take (default: {DEFAULT_HEALTH_TIMEOUT})')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_HEALTH_CONCURRENCY,
+                        help=f'Requests in flight at once (default: {DEFAULT_HEALTH_CONCURRENCY})')
+    args = parser.parse_args(argv)
+
+    try:
+        projects = load_projects(args.json_file)
+    except DatasetError as e:
+        print(f"✗ {e}")
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    options = HealthOptions(args.ttl, args.timeout, args.concurrency)
+    cache = HealthCache(os.path.join(args.output_dir, HEALTH_NAME))
+    urls = [project['url'] for _, project in projects if project.get('url')]
+    dead = asyncio.run(options.check(urls, cache))
+    return 1 if dead else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Capture of interactive pieces: scrollytelling and WebGL pages under /interactive/.
+
+A full-page screenshot of a scrollytelling piece is mostly empty sticky
+containers, and WebGL scenes need a GPU that headless servers don't have.
+These pages are captured as a sequence of viewport screenshots instead:
+- 'scroll': at a set of scroll positions (fractions of the scrollable
+  height), scrolling there in half-viewport steps so step triggers fire
+  on the way, as they would for a reader
+- 'frames': at the top of the page, every FRAME_STEP animation frames
+  (requestAnimationFrame), for pieces that animate on their own
+
+The first image is the project's screenshot (so manifests, diffs and card
+images work as for any page). The whole sequence is saved next to it as
+separate images in <slug>.frames/ or as a short animated WebP,
+<slug>.anim.webp.
+
+Interactive pages get their own browser, launched with SwiftShader
+software rendering so WebGL works headless without a GPU, and their own
+job queue, concurrency and time budget, so a slow piece never holds up the
+standard captures.
+"""
+
+import io
+import os
+import shutil
+
+from PIL import Image
+
+from encode import DEFAULT_QUALITY, encode_screenshot
+
+
+INTERACTIVE_MARKER = '/interactive/'
+
+INTERACTIVE_MODES = ('scroll', 'frames')
+
+# How a sequence is saved: one image per position/frame, or one animated WebP
+SEQUENCE_KINDS = ('images', 'webp')
+
+# Chromium flags for WebGL without a GPU: ANGLE on top of the SwiftShader software renderer
+SOFTWARE_GL_ARGS = [
+    '--use-gl=angle',
+    '--use-angle=swiftshader',
+    '--enable-unsafe-swiftshader',
+    '--ignore-gpu-blocklist',
+]
+
+# Scroll positions captured in 'scroll' mode, as fractions of the scrollable height
+SCROLL_POSITIONS = (0, 0.25, 0.5, 0.75, 1)
+
+# Frames captured in 'frames' mode, and animation frames between two captures
+FRAME_COUNT = 8
+FRAME_STEP = 15
+
+# Deadline of the settle wait after each scroll (seconds); transitions are caught, background work isn't waited for
+STEP_SETTLE = 3
+
+# How long each image shows in the animated WebP (milliseconds)
+SCROLL_FRAME_DURATION = 1000
+
+# Time one viewport of an interactive page may take, and interactive pages captured at once
+DEFAULT_INTERACTIVE_BUDGET = 240.0
+DEFAULT_INTERACTIVE_CONCURRENCY = 1
+
+# Scroll to a fraction of the scrollable height in half-viewport steps, two animation frames per step
+SCROLL_TO_JS = '''
+    async (fraction) => {
+        const frame = () => new Promise(resolve => requestAnimationFrame(() => resolve()));
+        const scroller = document.scrollingElement || document.documentElement;
+        const target = Math.round(fraction * Math.max(0, scroller.scrollHeight - window.innerHeight));
+        const step = Math.max(window.innerHeight / 2, 100);
+
+        let y = window.scrollY;
+        while (Math.abs(target - y) > step) {
+            y += Math.sign(target - y) * step;
+            window.scrollTo(0, y);
+            await frame();
+            await frame();
+        }
+        window.scrollTo(0, target);
+        await frame();
+        await frame();
+        return target;
+    }
+'''
+
+# Resolve after the given number of animation frames
+WAIT_FRAMES_JS = '''
+    (count) => new Promise(resolve => {
+        let left = count;
+        const tick = () => (--left <= 0 ? resolve() : requestAnimationFrame(tick));
+        requestAnimationFrame(tick);
+    })
+'''
+
+
+def is_interactive(url):
+    return INTERACTIVE_MARKER in (url or '')
+
+
+class InteractiveOptions:
+    """
+    How interactive pages are captured.
+
+    Args:
+        mode: One of INTERACTIVE_MODES
+        positions: Scroll positions for 'scroll' mode, fractions of the scrollable height (0 = top, 1 = bottom)
+        frames: Number of captures for 'frames' mode
+        frame_step: Animation frames between two captures in 'frames' mode
+        sequence: How the sequence is saved, one of SEQUENCE_KINDS
+        budget: Seconds one viewport may take before it is abandoned (None = no limit)
+        concurrency: Interactive pages captured at the same time
+    """
+
+    def __init__(self, mode='scroll', positions=SCROLL_POSITIONS, frames=FRAME_COUNT, frame_step=FRAME_STEP,
+                 sequence='images', budget=DEFAULT_INTERACTIVE_BUDGET, concurrency=DEFAULT_INTERACTIVE_CONCURRENCY):
+        if mode not in INTERACTIVE_MODES:
+            raise ValueError(f"Unknown interactive mode: {mode}")
+        if sequence not in SEQUENCE_KINDS:
+            raise ValueError(f"Unknown sequence output: {sequence}")
+        if not positions or not all(0 <= position <= 1 for position in positions):
+            raise ValueError("Scroll positions must be fractions between 0 and 1")
+        if frames < 1 or frame_step < 1:
+            raise ValueError("Frame count and frame step must be at least 1")
+        self.mode = mode
+        self.positions = list(positions)
+        self.frames = frames
+        self.frame_step = frame_step
+        self.sequence = sequence
+        self.budget = budget
+        self.concurrency = concurrency
+
+    @property
+    def frame_duration(self):
+        """
+        Milliseconds each image shows in an animated WebP: real time for frames, a steady pace for scrolling.
+        """
+        if self.mode == 'frames':
+            return round(self.frame_step * 1000 / 60)
+        return SCROLL_FRAME_DURATION
+
+    def describe(self):
+        if self.mode == 'frames':
+            return f"{self.frames} frames, every {self.frame_step} animation frames"
+        return f"scroll positions {', '.join(f'{position:g}' for position in self.positions)}"
+
+
+async def capture_sequence(page, settler, options, log, timer):
+    """
+    Take the viewport screenshots of an interactive page.
+
+    Args:
+        page: Playwright page, loaded and cleared of banners
+        settler: PageSettler for the page
+        options: InteractiveOptions
+        log: Function used to print progress lines for this URL
+        timer: PhaseTimer recording 'interactive'
+
+    Returns:
+        List of PNG bytes, in order
+    """
+    images = []
+    with timer.phase('interactive'):
+        if options.mode == 'scroll':
+            for position in options.positions:
+                y = await page.evaluate(SCROLL_TO_JS, position)
+                await settler.wait(timeout=STEP_SETTLE, log=log)
+                images.append(await page.screenshot(type='png'))
+                log(f"Captured scroll position {position:g} ({y}px)")
+        else:
+            await page.evaluate("window.scrollTo(0, 0)")
+            for number in range(1, options.frames + 1):
+                if number > 1:
+                    await page.evaluate(WAIT_FRAMES_JS, options.frame_step)
+                images.append(await page.screenshot(type='png'))
+            log(f"Captured {options.frames} frames")
+    return images
+
+
+def sequence_paths(base):
+    """
+    Where the sequence for a screenshot path without extension goes: (images folder, animated WebP).
+    """
+    return base + '.frames', base + '.anim.webp'
+
+
+def write_sequence(images, base, kind, output, device_scale_factor=1, duration=SCROLL_FRAME_DURATION):
+    """
+    Save a captured sequence, replacing the previous one in either form. Runs in a worker thread.
+
+    Args:
+        images: List of PNG bytes
+        base: The screenshot's path without extension
+        kind: One of SEQUENCE_KINDS
+        output: OutputOptions; separate images are written in its format, both are downscaled like the screenshot
+        device_scale_factor: Scale the images were captured at
+        duration: Milliseconds per image in an animated WebP
+
+    Returns:
+        (path of the folder or WebP, total size in bytes)
+    """
+    folder, animation = sequence_paths(base)
+    downscale = output.downscale(device_scale_factor)
+
+    if kind == 'images':
+        if os.path.exists(animation):
+            os.remove(animation)
+        shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(folder)
+        size = 0
+        for number, data in enumerate(images, 1):
+            _, written = encode_screenshot(
+                data, os.path.join(folder, f"{number:02d}"), output.format, output.quality, output.optimize, downscale,
+            )
+            size += written
+        return folder, size
+
+    shutil.rmtree(folder, ignore_errors=True)
+    frames = []
+    for data in images:
+        with Image.open(io.BytesIO(data)) as image:
+            frame = image.convert('RGB')
+        if downscale != 1:
+            frame = frame.resize((round(frame.width * downscale), round(frame.height * downscale)), Image.LANCZOS)
+        frames.append(frame)
+    frames[0].save(
+        animation, 'WEBP', save_all=True, append_images=frames[1:], duration=duration, loop=0,
+        quality=output.quality or DEFAULT_QUALITY['webp'], method=4,
+    )
+    return animation, os.path.getsize(animation)
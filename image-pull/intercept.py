@@ -0,0 +1,308 @@
+"""
+Request interception for captures: block ad/tracker traffic and serve static assets from a disk cache.
+
+One Interceptor is shared by every page in a run. It is attached to each
+browser context with context.route(), so every request goes through it:
+- requests to a blocklisted domain (or any subdomain) are aborted
+- GET requests for scripts, stylesheets, fonts and images are answered from
+  the on-disk cache when possible, otherwise fetched and stored for later
+  pages and later runs
+- everything else falls through to the network untouched
+
+The cache is capped by size; once it grows past the limit the least
+recently used entries are evicted. Shard processes share one cache
+directory, so the cap is checked against what's on disk: every process
+re-reads the directory after writing a slice of the cap, and before
+evicting. Cache reads and writes are file I/O, so
+they run in worker threads rather than on the event loop every page shares.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+
+DEFAULT_BLOCKLIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'blocklist.txt')
+
+# Cache size cap in megabytes
+DEFAULT_CACHE_SIZE_MB = 500
+
+# Cached responses older than this are fetched again
+CACHE_TTL = 7 * 86400
+
+# Share of the size cap a process writes before re-reading the cache directory for what other
+# shards stored; with N shards the cap is overshot by at most N times this much
+RESCAN_FRACTION = 0.05
+
+CACHEABLE_TYPES = {'script', 'stylesheet', 'font', 'image'}
+
+# Headers describing the original transfer rather than the (already decoded) body
+TRANSFER_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+def load_blocklist(path=DEFAULT_BLOCKLIST):
+    """
+    Read a blocklist file: one domain per line, '#' starts a comment.
+    """
+    domains = set()
+    with open(path, 'r') as f:
+        for line in f:
+            domain = line.split('#', 1)[0].strip().lower()
+            if domain:
+                domains.add(domain)
+    return domains
+
+
+def is_blocked(url, blocklist):
+    """
+    Whether the URL's host is a blocklisted domain or a subdomain of one.
+    """
+    host = (urlparse(url).hostname or '').lower()
+    parts = host.split('.')
+    return any('.'.join(parts[i:]) in blocklist for i in range(len(parts) - 1))
+
+
+class InterceptStats:
+    """
+    What the interceptor did for one captured URL.
+    """
+
+    def __init__(self):
+        self.blocked = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.bytes_saved = 0
+        self.bytes_fetched = 0
+
+    def summary(self):
+        return (
+            f"{self.blocked} requests blocked, "
+            f"{self.cache_hits} cache hits ({self.bytes_saved / 1e6:.1f} MB saved), "
+            f"{self.cache_misses} misses ({self.bytes_fetched / 1e6:.1f} MB fetched)"
+        )
+
+
+class AssetCache:
+    """
+    On-disk response cache with size-based LRU eviction.
+
+    Each entry is a body file plus a small JSON file with the status and
+    headers. The body file's mtime doubles as the last-used time, so an
+    entry another process has used recently isn't evicted first. get() and
+    put() may be called from several threads at once.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_SIZE_MB * 1_000_000, ttl=CACHE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+        # key -> [size, last_used, stored_at]
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.size = 0
+        # Bytes this process has written since it last read the directory
+        self._unscanned = 0
+        self._scan()
+
+    @staticmethod
+    def key_for(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def _read_meta(self, key):
+        try:
+            with open(self._path(key, 'json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _scan(self):
+        """
+        Rebuild the entries and total size from the directory, including other processes' entries.
+
+        Callers hold the lock (or are the constructor).
+        """
+        entries = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith('.body'):
+                continue
+            key = name[:-len('.body')]
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                # Evicted by another process since listdir()
+                continue
+            known = self._entries.get(key)
+            if known is not None and known[0] == stat.st_size:
+                entries[key] = [stat.st_size, max(known[1], stat.st_mtime), known[2]]
+                continue
+            # New to this process (or rewritten), so its metadata has to be read
+            meta = self._read_meta(key)
+            if meta is not None:
+                entries[key] = [stat.st_size, stat.st_mtime, meta['stored_at']]
+        self._entries = entries
+        self.size = sum(entry[0] for entry in entries.values())
+        self._unscanned = 0
+
+    def get(self, url):
+        """
+        Cached (status, headers, body) for the URL, or None.
+        """
+        key = self.key_for(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[2] > self.ttl:
+                self._evict(key)
+                return None
+
+        meta = self._read_meta(key)
+        try:
+            with open(self._path(key, 'body'), 'rb') as f:
+                body = f.read()
+        except OSError:
+            meta = None
+
+        with self._lock:
+            if meta is None:
+                self._evict(key)
+                return None
+            entry[1] = time.time()
+        try:
+            os.utime(self._path(key, 'body'), (entry[1], entry[1]))
+        except OSError:
+            # Evicted by another thread since; the body read above is still good
+            pass
+        return meta['status'], meta['headers'], body
+
+    def put(self, url, status, headers, body):
+        if len(body) > self.max_bytes // 10:
+            return
+
+        key = self.key_for(url)
+        now = time.time()
+        meta = {'url': url, 'status': status, 'headers': headers, 'stored_at': now}
+
+        # Write to temp files first so concurrent pages never read a partial entry
+        for suffix, data, mode in (('body', body, 'wb'), ('json', json.dumps(meta), 'w')):
+            tmp_path = f"{self._path(key, suffix)}.{os.getpid()}.tmp"
+            with open(tmp_path, mode) as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key, suffix))
+
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries[key][0]
+            self._entries[key] = [len(body), now, now]
+            self.size += len(body)
+            self._unscanned += len(body)
+            if self._unscanned >= self.max_bytes * RESCAN_FRACTION:
+                self._scan()
+            self._enforce_limit()
+
+    def _evict(self, key):
+        # Callers hold the lock
+        size = self._entries.pop(key, [0])[0]
+        self.size -= size
+        for suffix in ('body', 'json'):
+            try:
+                os.remove(self._path(key, suffix))
+            except OSError:
+                pass
+
+    def _enforce_limit(self):
+        if self.size <= self.max_bytes:
+            return
+        # Evict by what is really on disk, other shards' entries and recent use included
+        if self._unscanned:
+            self._scan()
+            if self.size <= self.max_bytes:
+                return
+        for key, _ in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            self._evict(key)
+            if self.size <= self.max_bytes * 0.9:
+                break
+
+
+def is_cacheable_response(status, headers):
+    cache_control = headers.get('cache-control', '').lower()
+    return status == 200 and 'no-store' not in cache_control and 'private' not in cache_control
+
+
+class Interceptor:
+    """
+    Shared route handler that applies the blocklist and the asset cache.
+
+    Args:
+        cache: AssetCache, or None to only block
+        blocklist: Set of blocked domains
+    """
+
+    def __init__(self, cache=None, blocklist=()):
+        self.cache = cache
+        self.blocklist = set(blocklist)
+
+    async def attach(self, context, stats):
+        """
+        Route every request made in the browser context through the interceptor.
+
+        Args:
+            context: Playwright browser context (create it with service_workers='block',
+                otherwise requests made by service workers bypass routing)
+            stats: InterceptStats collecting what happened for this URL, or a function
+                returning the current one (for contexts reused across URLs)
+        """
+        async def handle(route, request):
+            await self._handle(route, request, stats() if callable(stats) else stats)
+
+        await context.route('**/*', handle)
+
+    async def _handle(self, route, request, stats):
+        url = request.url
+        if not url.startswith('http'):
+            await route.fallback()
+            return
+
+        if self.blocklist and is_blocked(url, self.blocklist):
+            stats.blocked += 1
+            await route.abort('blockedbyclient')
+            return
+
+        if self.cache is None or request.method != 'GET' or request.resource_type not in CACHEABLE_TYPES:
+            await route.fallback()
+            return
+
+        cached = await asyncio.to_thread(self.cache.get, url)
+        if cached is not None:
+            status, headers, body = cached
+            stats.cache_hits += 1
+            stats.bytes_saved += len(body)
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            # Let the browser make the request itself and report the failure
+            await route.fallback()
+            return
+
+        stats.cache_misses += 1
+        stats.bytes_fetched += len(body)
+        if is_cacheable_response(response.status, response.headers):
+            headers = {
+                name: value for name, value in response.headers.items()
+                if name.lower() not in TRANSFER_HEADERS
+            }
+            await asyncio.to_thread(self.cache.put, url, response.status, headers, body)
+        await route.fulfill(response=response, body=body)
@@ -0,0 +1,195 @@
+"""
+Adaptive lazy-load triggering.
+
+Instead of a fixed number of blind scroll passes, the page is scrolled in
+viewport-sized steps with the page height re-read at every step, so pages
+that grow while scrolling are followed to their real end. An init script
+records every element handed to an IntersectionObserver, and together with
+`loading="lazy"` images/iframes and `data-src` placeholders these are the
+lazy targets the driver keeps track of.
+
+After the first full pass and a settle wait, another pass only runs if
+there is something left to do: lazy targets that were never scrolled into
+view, or page height added since the last pass. Passing stops as soon as a
+pass triggers no new requests, the first one included: a static page has
+nothing to load. Short pages therefore cost one quick pass, and long ones
+cost time in proportion to their length. With a deadline, no pass starts
+unless there is time left for it and its settle wait.
+"""
+
+import time
+
+
+# Pause after each scroll step (seconds), on top of waiting for two animation frames
+STEP_DELAY = 0.1
+
+# Upper bound on passes, for pages that keep loading more content forever
+MAX_PASSES = 4
+
+# Upper bound on steps in one pass, for infinite-scroll pages
+MAX_STEPS = 200
+
+# Injected before any page script runs: remembers every IntersectionObserver target
+LAZY_TRACKER_JS = '''
+    (() => {
+        if (window.__lazyTargets || !window.IntersectionObserver) return;
+        const targets = window.__lazyTargets = new Set();
+        const observe = IntersectionObserver.prototype.observe;
+        const unobserve = IntersectionObserver.prototype.unobserve;
+        IntersectionObserver.prototype.observe = function (target) {
+            targets.add(target);
+            return observe.apply(this, arguments);
+        };
+        IntersectionObserver.prototype.unobserve = function (target) {
+            targets.delete(target);
+            return unobserve.apply(this, arguments);
+        };
+    })();
+'''
+
+# Shared helpers for the pass and the pending check
+LAZY_HELPERS_JS = '''
+    const pageHeight = () => Math.max(
+        document.body?.scrollHeight || 0,
+        document.documentElement?.scrollHeight || 0
+    );
+
+    // Lazy elements that haven't loaded yet
+    const lazyTargets = () => {
+        const found = new Set();
+        for (const el of document.querySelectorAll('img[loading="lazy"], iframe[loading="lazy"], [data-src], [data-srcset]')) {
+            if (el.tagName === 'IMG' && el.complete && el.currentSrc) continue;
+            found.add(el);
+        }
+        for (const el of window.__lazyTargets || []) {
+            if (el.isConnected) found.add(el);
+        }
+        return Array.from(found);
+    };
+
+    const visited = window.__lazyVisited || (window.__lazyVisited = new WeakSet());
+
+    // Targets never yet scrolled into view, with their document position
+    const pending = () => lazyTargets()
+        .filter(el => !visited.has(el))
+        .map(el => ({ el, top: el.getBoundingClientRect().top + window.scrollY }));
+
+    const markVisible = () => {
+        for (const el of lazyTargets()) {
+            const rect = el.getBoundingClientRect();
+            if (rect.bottom >= 0 && rect.top <= window.innerHeight) visited.add(el);
+        }
+    };
+'''
+
+# One pass: step down from `start` to the (growing) bottom, then visit any targets left above
+SCROLL_PASS_JS = '''
+    async ({ start, delay, maxSteps, reset }) => {
+        if (reset) window.__lazyVisited = new WeakSet();
+        ''' + LAZY_HELPERS_JS + '''
+        const settle = () => new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(() => setTimeout(resolve, delay))));
+        const step = Math.max(window.innerHeight, 100);
+
+        let steps = 0;
+        const visit = async y => {
+            window.scrollTo(0, y);
+            await settle();
+            markVisible();
+            steps++;
+        };
+
+        // Re-read the height every step, so content added while scrolling is followed
+        for (let y = Math.max(start, 0); y < pageHeight() && steps < maxSteps; y += step) {
+            await visit(y);
+        }
+
+        // Targets the stepping skipped past (e.g. above `start`, or moved by layout shifts)
+        for (const target of pending().sort((a, b) => a.top - b.top)) {
+            if (steps >= maxSteps) break;
+            if (!visited.has(target.el)) await visit(Math.max(target.top - step / 2, 0));
+        }
+
+        return { steps, height: pageHeight() };
+    }
+'''
+
+# After a settle wait: how tall the page is now and how many targets were never in view
+PENDING_JS = '''
+    () => {
+        ''' + LAZY_HELPERS_JS + '''
+        return { height: pageHeight(), pending: pending().length };
+    }
+'''
+
+
+def another_pass_needed(new_requests, pending, height_before, height_after):
+    """
+    Whether a pass left anything for the next one to do.
+
+    Args:
+        new_requests: Requests the pass and its settle wait started
+        pending: Lazy targets never scrolled into view
+        height_before: Page height when the pass finished scrolling
+        height_after: Page height after the settle wait
+    """
+    if new_requests == 0:
+        # Scrolling loaded nothing, so scrolling again won't either
+        return False
+    # Targets left out of view, or content added below, are worth another pass
+    return bool(pending) or height_after > height_before
+
+
+async def install_lazy_tracker(page):
+    """
+    Start recording IntersectionObserver targets. Call before page.goto().
+    """
+    await page.add_init_script(LAZY_TRACKER_JS)
+
+
+async def trigger_lazy_load(page, settler, log, timer, max_passes=MAX_PASSES, deadline=None):
+    """
+    Scroll through the page until lazy loading stops producing new requests.
+
+    Args:
+        page: Playwright page, loaded
+        settler: PageSettler for the page; its request count tells whether a pass did anything
+        log: Function used to print progress lines for this URL
+        timer: PhaseTimer; pass N records 'scroll_N' and 'scroll_N_settle'
+        max_passes: Give up after this many passes
+        deadline: time.monotonic() by which scrolling and settling must be done (None = no limit)
+
+    Returns:
+        Number of passes made
+    """
+    start = 0
+    passes = 0
+    for number in range(1, max_passes + 1):
+        if deadline is not None and time.monotonic() + settler.timeout > deadline:
+            log(f"Out of time, skipping lazy-load pass {number}")
+            break
+        passes = number
+        requests_before = settler.request_count
+
+        with timer.phase(f'scroll_{number}'):
+            result = await page.evaluate(SCROLL_PASS_JS, {
+                'start': start,
+                'delay': int(STEP_DELAY * 1000),
+                'maxSteps': MAX_STEPS,
+                'reset': number == 1,
+            })
+        with timer.phase(f'scroll_{number}_settle'):
+            await settler.wait(log=log, deadline=deadline)
+
+        new_requests = settler.request_count - requests_before
+        state = await page.evaluate(PENDING_JS)
+        log(f"Lazy-load pass {number}: {result['steps']} steps, {new_requests} new requests, "
+            f"page {state['height']}px, {state['pending']} targets not yet in view")
+
+        if not another_pass_needed(new_requests, state['pending'], result['height'], state['height']):
+            break
+
+        # Only the part of the page added since this pass still needs stepping through
+        start = result['height'] - await page.evaluate('window.innerHeight')
+
+    await page.evaluate("window.scrollTo(0, 0)")
+    return passes
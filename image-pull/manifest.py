@@ -0,0 +1,165 @@
+"""
+Capture manifest: remembers what was captured so unchanged pages aren't shot again.
+
+The manifest lives next to the screenshots (screenshots/manifest.json) and is
+keyed by slug and viewport:
+
+    {
+        "north-korea-it-worker-scheme-vis-intl-hnk": {
+            "desktop": {
+                "url": "https://edition.cnn.com/...",
+                "captured_at": "2025-08-06T10:12:03+00:00",
+                "etag": "\"abc123\"",
+                "last_modified": "Tue, 05 Aug 2025 09:00:00 GMT",
+                "phash": "e0f0d8c8c4c6e2f0"
+            },
+            "mobile": {...}
+        }
+    }
+"""
+
+import json
+import os
+import urllib.request
+from datetime import datetime, timezone
+
+import numpy as np
+from PIL import Image
+
+
+MANIFEST_NAME = 'manifest.json'
+
+# Re-capture entries older than this even if the server says nothing changed
+DEFAULT_MAX_AGE_DAYS = 30
+
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36'
+
+
+def fetch_validators(url, timeout=15):
+    """
+    Ask the server for the page's cache validators with a HEAD request.
+
+    Returns:
+        dict with 'etag' and 'last_modified' (either may be None); both are
+        None when the request fails
+    """
+    request = urllib.request.Request(url, method='HEAD', headers={'User-Agent': USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return validators_from_headers(response.headers)
+    except Exception:
+        return {'etag': None, 'last_modified': None}
+
+
+def validators_from_headers(headers):
+    """
+    Pick the ETag/Last-Modified validators out of a response's headers.
+    """
+    headers = {key.lower(): value for key, value in (headers or {}).items()}
+    return {
+        'etag': headers.get('etag'),
+        'last_modified': headers.get('last-modified'),
+    }
+
+
+def dhash(image, hash_size=8):
+    """
+    Difference hash (dHash) of a PIL image, as a 16-character hex string.
+
+    The image is shrunk to (hash_size + 1) x hash_size greyscale pixels and
+    each bit records whether a pixel is brighter than its right-hand
+    neighbour, so re-encodes and tiny rendering differences hash the same.
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, :-1] > pixels[:, 1:]).ravel()
+    value = int(np.packbits(bits).tobytes().hex(), 16) if bits.size else 0
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+
+def perceptual_hash(path, hash_size=8):
+    """
+    dHash of an image file (see dhash()).
+    """
+    with Image.open(path) as image:
+        image.draft('L', (hash_size * 64, hash_size * 64))
+        return dhash(image, hash_size)
+
+
+def hash_distance(a, b):
+    """
+    Number of differing bits between two hex hashes (0 = looks the same).
+    """
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+class Manifest:
+    """
+    Persisted record of previous captures, loaded from and saved to a JSON file.
+
+    Args:
+        path: Manifest to load
+        save_path: Where save() writes, when it isn't `path` (a shard's own manifest, see shards.py)
+    """
+
+    def __init__(self, path, save_path=None):
+        self.path = path
+        self.save_path = save_path or path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    def get(self, slug, viewport):
+        return self.entries.get(slug, {}).get(viewport)
+
+    def is_fresh(self, slug, viewport, url, screenshot_path, validators, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        """
+        Whether the stored capture for this slug/viewport can be kept as is.
+
+        A capture is stale when there's no manifest entry or file for it, the
+        URL changed, it is older than max_age_days, or the server reports a
+        different ETag/Last-Modified than when it was captured.
+        """
+        entry = self.get(slug, viewport)
+        if not entry or entry.get('url') != url or not os.path.exists(screenshot_path):
+            return False
+
+        if max_age_days is not None:
+            captured_at = datetime.fromisoformat(entry['captured_at'])
+            age = datetime.now(timezone.utc) - captured_at
+            if age.total_seconds() > max_age_days * 86400:
+                return False
+
+        # Only compare validators the server actually sent this time
+        for key in ('etag', 'last_modified'):
+            if validators.get(key) and validators[key] != entry.get(key):
+                return False
+
+        return True
+
+    def record(self, slug, viewport, url, validators, phash):
+        """
+        Store a fresh capture.
+
+        Returns:
+            True if the image looks the same as the previous capture
+        """
+        previous = self.get(slug, viewport)
+        self.entries.setdefault(slug, {})[viewport] = {
+            'url': url,
+            'captured_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'etag': validators.get('etag'),
+            'last_modified': validators.get('last_modified'),
+            'phash': phash,
+        }
+        return bool(previous) and previous.get('phash') == phash
+
+    def save(self):
+        """
+        Write the manifest atomically so an interrupted run never leaves a half-written file.
+        """
+        tmp_path = f"{self.save_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, self.save_path)
@@ -0,0 +1,250 @@
+"""
+Capture profiles: the devices every project is captured on.
+
+Each profile in profiles.toml is one screenshot per project, saved under
+a folder named after it (screenshots/<profile>/<slug>.png). A profile
+describes the browser context (viewport, device scale factor, mobile
+mode, touch, user agent), how long to wait for the page (navigation
+event, settle deadline and quiet window, lazy-load passes), how much of
+the page to keep and, optionally, its own output format.
+
+Profiles marked `default = false` (e.g. tablet or social cards) are only
+captured when asked for with `--profiles`. Adding a size is a new table
+in the file; the capture code is the same for every profile.
+"""
+
+import os
+import re
+import tomllib
+
+from encode import OUTPUT_FORMATS, OutputOptions
+from lazyload import MAX_PASSES
+from settle import QUIET_WINDOW, SETTLE_TIMEOUT
+from tiled import TilingOptions
+
+
+PROFILES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles.toml')
+
+# Events page.goto() can wait for before the settle detection takes over
+WAIT_UNTIL = ('commit', 'domcontentloaded', 'load', 'networkidle')
+
+# Profile names become folder names
+NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]*$')
+
+# Keys passed to browser.new_context() as they are
+CONTEXT_KEYS = ('viewport', 'device_scale_factor', 'is_mobile', 'has_touch', 'user_agent')
+
+# Every key a profile may have, with the type its value must be
+PROFILE_KEYS = {
+    'viewport': dict,
+    'device_scale_factor': (int, float),
+    'is_mobile': bool,
+    'has_touch': bool,
+    'user_agent': str,
+    'default': bool,
+    'card': bool,
+    'max_height': int,
+    'wait_until': str,
+    'settle_timeout': (int, float),
+    'quiet': (int, float),
+    'lazy_passes': int,
+    'format': str,
+    'quality': int,
+    'optimize': bool,
+    'max_scale': (int, float),
+}
+
+
+class ProfileError(ValueError):
+    """
+    profiles.toml is missing, can't be parsed or describes an invalid profile.
+    """
+
+
+class Profile:
+    """
+    One device a project is captured on.
+
+    Args:
+        name: Profile name, also the screenshot folder
+        context_options: Keyword arguments for browser.new_context (viewport and device settings)
+        default: Captured when no --profiles are given
+        card: Card images are made from this profile's captures
+        max_height: Keep only the top this many CSS pixels of the page (None = the full page)
+        wait_until: Navigation event to wait for, one of WAIT_UNTIL
+        settle_timeout: Deadline of each settle wait in seconds
+        quiet: How long the page must stay quiet to count as settled
+        lazy_passes: Maximum lazy-load scroll passes (0 = don't scroll)
+        output: dict of OutputOptions arguments overriding the run's output options
+    """
+
+    def __init__(self, name, context_options, default=True, card=False, max_height=None,
+                 wait_until='domcontentloaded', settle_timeout=SETTLE_TIMEOUT, quiet=QUIET_WINDOW,
+                 lazy_passes=MAX_PASSES, output=None):
+        self.name = name
+        self.context_options = context_options
+        self.default = default
+        self.card = card
+        self.max_height = max_height
+        self.wait_until = wait_until
+        self.settle_timeout = settle_timeout
+        self.quiet = quiet
+        self.lazy_passes = lazy_passes
+        self.output = output or {}
+
+    @property
+    def device_scale_factor(self):
+        return self.context_options.get('device_scale_factor', 1)
+
+    @property
+    def width(self):
+        return self.context_options['viewport']['width']
+
+    def output_options(self, default):
+        """
+        The run's OutputOptions with this profile's format settings applied.
+        """
+        if not self.output:
+            return default
+        settings = {
+            'format': default.format,
+            'optimize': default.optimize,
+            'max_scale': default.max_scale,
+            'workers': default.workers,
+        }
+        if 'format' not in self.output:
+            settings['quality'] = default.quality
+        settings.update(self.output)
+        return OutputOptions(**settings)
+
+    def tiling_options(self, default):
+        """
+        The run's TilingOptions, cut off at max_height for profiles that only keep the top of the page.
+        """
+        if self.max_height is None:
+            return default
+        default = default or TilingOptions()
+        return TilingOptions(max_height=self.max_height, policy='truncate', strip_height=default.strip_height)
+
+    def configure(self, settler):
+        """
+        Apply this profile's settle thresholds to a PageSettler.
+        """
+        settler.timeout = self.settle_timeout
+        settler.quiet = self.quiet
+
+    def describe(self):
+        viewport = self.context_options['viewport']
+        text = f"{viewport['width']}x{viewport['height']}"
+        if self.device_scale_factor != 1:
+            text += f" @{self.device_scale_factor:g}x"
+        if self.max_height is not None:
+            text += f", top {self.max_height}px"
+        return text
+
+
+def parse_profile(name, table):
+    """
+    Build a Profile from its table in profiles.toml, checking every key.
+    """
+    if not NAME_PATTERN.match(name):
+        raise ProfileError(f"Profile name {name!r} must be lowercase letters, digits, - and _")
+    if not isinstance(table, dict):
+        raise ProfileError(f"Profile {name!r} must be a table")
+
+    for key, value in table.items():
+        if key not in PROFILE_KEYS:
+            raise ProfileError(f"Profile {name!r} has an unknown key {key!r}")
+        expected = PROFILE_KEYS[key]
+        # bool is an int, but an int where a bool belongs (or the other way round) is a typo
+        if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+            raise ProfileError(f"Profile {name!r}: {key} has the wrong type ({type(value).__name__})")
+
+    viewport = table.get('viewport')
+    if viewport is None:
+        raise ProfileError(f"Profile {name!r} has no viewport")
+    if set(viewport) != {'width', 'height'} or not all(
+        isinstance(viewport[side], int) and not isinstance(viewport[side], bool) and viewport[side] > 0
+        for side in ('width', 'height')
+    ):
+        raise ProfileError(f"Profile {name!r}: viewport needs a positive width and height in pixels")
+
+    if table.get('wait_until', 'domcontentloaded') not in WAIT_UNTIL:
+        raise ProfileError(f"Profile {name!r}: wait_until must be one of {', '.join(WAIT_UNTIL)}")
+    if table.get('format', 'png') not in OUTPUT_FORMATS:
+        raise ProfileError(f"Profile {name!r}: format must be one of {', '.join(OUTPUT_FORMATS)}")
+    if not 0 <= table.get('quality', 0) <= 100:
+        raise ProfileError(f"Profile {name!r}: quality must be between 0 and 100")
+    for key in ('device_scale_factor', 'max_height', 'settle_timeout', 'quiet', 'max_scale'):
+        if key in table and table[key] <= 0:
+            raise ProfileError(f"Profile {name!r}: {key} must be positive")
+    if table.get('lazy_passes', 0) < 0:
+        raise ProfileError(f"Profile {name!r}: lazy_passes must not be negative")
+
+    output = {key: table[key] for key in ('format', 'quality', 'optimize', 'max_scale') if key in table}
+    if output:
+        try:
+            # Fails early on formats this Pillow build can't write
+            OutputOptions(**{'format': 'png', **output})
+        except ValueError as e:
+            raise ProfileError(f"Profile {name!r}: {e}") from None
+
+    return Profile(
+        name,
+        {key: table[key] for key in CONTEXT_KEYS if key in table},
+        default=table.get('default', True),
+        card=table.get('card', False),
+        max_height=table.get('max_height'),
+        wait_until=table.get('wait_until', 'domcontentloaded'),
+        settle_timeout=table.get('settle_timeout', SETTLE_TIMEOUT),
+        quiet=table.get('quiet', QUIET_WINDOW),
+        lazy_passes=table.get('lazy_passes', MAX_PASSES),
+        output=output,
+    )
+
+
+def load_profiles(path=PROFILES_FILE):
+    """
+    Read every profile from a profiles file.
+
+    Returns:
+        dict of profile name -> Profile, in file order
+    """
+    try:
+        with open(path, 'rb') as f:
+            tables = tomllib.load(f)
+    except FileNotFoundError:
+        raise ProfileError(f"Profiles file {path} not found") from None
+    except tomllib.TOMLDecodeError as e:
+        raise ProfileError(f"Can't parse {path}: {e}") from None
+
+    profiles = {name: parse_profile(name, table) for name, table in tables.items()}
+    if not profiles:
+        raise ProfileError(f"{path} defines no profiles")
+    cards = [profile.name for profile in profiles.values() if profile.card]
+    if len(cards) > 1:
+        raise ProfileError(f"Only one profile can make card images, not {', '.join(cards)}")
+    return profiles
+
+
+def select_profiles(profiles, names=None):
+    """
+    The profiles to capture, in file order.
+
+    Args:
+        profiles: dict from load_profiles()
+        names: Profile names to capture (None = the ones marked default)
+
+    Returns:
+        List of Profile
+    """
+    if names is None:
+        selected = [profile for profile in profiles.values() if profile.default]
+        if not selected:
+            raise ProfileError("No profile is marked default; pick some with --profiles")
+        return selected
+
+    unknown = [name for name in names if name not in profiles]
+    if unknown:
+        raise ProfileError(f"Unknown profiles: {', '.join(unknown)} (defined: {', '.join(profiles)})")
+    return [profile for name, profile in profiles.items() if name in names]
@@ -0,0 +1,279 @@
+"""
+Job scheduler for captures: time budgets, retries and a failed-jobs list.
+
+Every (URL, viewport) is its own unit of work. A job covers the viewports
+of one project that still need capturing; when some of them fail, the
+ones that were saved are kept and only the failed viewports are tried
+again. Transient errors (timeouts, dropped connections, crashed pages,
+5xx responses) are retried with exponential backoff. The retry waits off
+to the side, so the worker picks up the next project instead of sleeping.
+Errors that won't go away by trying again, and jobs out of retries, end up
+in a failed-jobs file that a later run can re-run on its own
+(`screenshot_urls.py --retry-failed`).
+
+The time budget is enforced in two steps. Waits that can be cut short
+(lazy-load passes and settle waits) stop at the capture's soft deadline,
+which leaves WRITE_RESERVE seconds for the screenshot itself, so a page
+that never settles still ends up with a screenshot. Only a capture that
+overruns the whole budget is cancelled.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import random
+import time
+
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+
+# Failed jobs of the last run, inside the output directory
+FAILED_NAME = 'failed.json'
+
+# Retries per job after the first attempt
+DEFAULT_RETRIES = 2
+
+# Backoff before retry N is BACKOFF_BASE * 2**(N-1) seconds plus jitter, capped at BACKOFF_MAX
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 60.0
+
+# Time one viewport's capture may take, from navigation to the file write (seconds)
+DEFAULT_JOB_BUDGET = 90.0
+
+# Part of the budget kept for taking and writing the screenshot (seconds)
+WRITE_RESERVE = 20.0
+
+# Main document statuses worth another try rather than a screenshot of the error page
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Parts of Playwright error messages that mean the network or the page fell over, not the script
+TRANSIENT_MESSAGES = (
+    'net::ERR_CONNECTION',
+    'net::ERR_TIMED_OUT',
+    'net::ERR_NETWORK_CHANGED',
+    'net::ERR_INTERNET_DISCONNECTED',
+    'net::ERR_EMPTY_RESPONSE',
+    'net::ERR_HTTP2',
+    'net::ERR_SSL_PROTOCOL_ERROR',
+    'Target closed',
+    'has been closed',
+    'crashed',
+)
+
+
+# time.monotonic() by which the capture running in this task should start writing
+_soft_deadline = contextvars.ContextVar('soft_deadline', default=None)
+
+
+class TransientError(Exception):
+    """
+    A failure that is likely to go away on its own, such as a 503 from the server.
+    """
+
+
+def is_transient(error):
+    """
+    Whether a capture that failed with this exception is worth retrying.
+    """
+    if isinstance(error, (TransientError, TimeoutError, PlaywrightTimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, PlaywrightError):
+        return any(marker in str(error) for marker in TRANSIENT_MESSAGES)
+    return False
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, limit=BACKOFF_MAX):
+    """
+    Seconds to wait before retry number `attempt` (1 = first retry).
+    """
+    delay = min(base * 2 ** (attempt - 1), limit)
+    # Jitter keeps retries for one host from lining up
+    return delay + random.uniform(0, delay / 2)
+
+
+def soft_deadline():
+    """
+    time.monotonic() by which the current capture should stop waiting and
+    take its screenshot (None = no budget).
+    """
+    return _soft_deadline.get()
+
+
+async def within_budget(capture, budget, reserve=WRITE_RESERVE):
+    """
+    Await a capture, abandoning it after `budget` seconds (None = no limit).
+
+    While the capture runs, soft_deadline() is `reserve` seconds before the
+    end of the budget (never less than half of it), for the waits that can
+    be cut short. Cancelling the capture closes its browser context on the
+    way out, so a hung page is torn down without affecting the browser or
+    other workers.
+    """
+    if budget is None:
+        return await capture
+    token = _soft_deadline.set(time.monotonic() + max(budget - reserve, budget / 2))
+    try:
+        return await asyncio.wait_for(capture, budget)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"Capture abandoned after its {budget:g}s budget") from None
+    finally:
+        _soft_deadline.reset(token)
+
+
+class CaptureJob:
+    """
+    One project's viewports that still need capturing.
+
+    Args:
+        slug: The project's slug
+        project: Entry from projects.json
+        viewports: Names of the viewports to capture
+        label: Progress prefix such as '[3/31]'
+        force: Capture even if the manifest says the viewports are fresh
+    """
+
+    def __init__(self, slug, project, viewports, label, force=False):
+        self.slug = slug
+        self.project = project
+        self.viewports = list(viewports)
+        self.label = label
+        self.force = force
+        self.attempts = 0
+        self.errors = {}
+
+    def retry(self, viewports):
+        """
+        Follow-up job for the viewports that failed, keeping the attempt count.
+        """
+        job = CaptureJob(self.slug, self.project, viewports, self.label, force=True)
+        job.attempts = self.attempts
+        return job
+
+    def to_dict(self):
+        return {
+            'slug': self.slug,
+            'url': self.project.get('url'),
+            'viewports': self.viewports,
+            'attempts': self.attempts,
+            'errors': self.errors,
+        }
+
+
+class Scheduler:
+    """
+    Runs capture jobs on a pool of workers, retrying transient failures.
+
+    Args:
+        capture: Async function called with a CaptureJob, returning a dict of
+            viewport name -> exception for the viewports that failed (empty = all done)
+        concurrency: Number of jobs running at the same time
+        retries: Retries per job after the first attempt
+        backoff_base: Backoff before the first retry, doubled for every later one
+    """
+
+    def __init__(self, capture, concurrency, retries=DEFAULT_RETRIES, backoff_base=BACKOFF_BASE):
+        self.capture = capture
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.failed = []
+        self.retried = 0
+        self._queue = asyncio.Queue()
+        self._outstanding = 0
+        self._done = asyncio.Event()
+        self._waiting = set()
+
+    def _finish(self):
+        self._outstanding -= 1
+        if self._outstanding == 0:
+            self._done.set()
+
+    async def _requeue_later(self, job, delay):
+        await asyncio.sleep(delay)
+        self._queue.put_nowait(job)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.attempts += 1
+            try:
+                failed = await self.capture(job)
+            except Exception as e:
+                # capture() handles its own errors; this is a bug, so don't retry it
+                failed = {name: e for name in job.viewports}
+
+            job.errors = {name: str(error) for name, error in failed.items()}
+            transient = [name for name, error in failed.items() if is_transient(error)]
+
+            if transient and job.attempts <= self.retries:
+                permanent = [name for name in failed if name not in transient]
+                if permanent:
+                    self._record_failure(job, permanent)
+                delay = backoff_delay(job.attempts, self.backoff_base)
+                print(f"  {job.label} {job.slug}: ↻ Retrying {', '.join(transient)} in {delay:.0f}s "
+                      f"(attempt {job.attempts + 1} of {self.retries + 1})")
+                self.retried += 1
+                task = asyncio.create_task(self._requeue_later(job.retry(transient), delay))
+                self._waiting.add(task)
+                task.add_done_callback(self._waiting.discard)
+            else:
+                if failed:
+                    self._record_failure(job, list(failed))
+                self._finish()
+
+    def _record_failure(self, job, viewports):
+        failure = job.retry(viewports)
+        failure.errors = {name: job.errors[name] for name in viewports}
+        self.failed.append(failure)
+
+    async def run(self, jobs):
+        """
+        Run every job to success or final failure.
+
+        Returns:
+            List of CaptureJob that failed for good, one per project and set of viewports
+        """
+        for job in jobs:
+            self._outstanding += 1
+            self._queue.put_nowait(job)
+        if not self._outstanding:
+            return []
+
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            await self._done.wait()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return self.failed
+
+
+def write_failed(path, failed):
+    """
+    Write failed jobs for a later --retry-failed run, or remove the file when nothing failed.
+    """
+    if not failed:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([job.to_dict() for job in failed], f, indent=2, ensure_ascii=False)
+
+
+def load_failed(path):
+    """
+    Failed jobs from a previous run.
+
+    Returns:
+        dict of slug -> list of viewport names to capture again
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    failed = {}
+    for entry in entries:
+        viewports = failed.setdefault(entry['slug'], [])
+        viewports.extend(name for name in entry['viewports'] if name not in viewports)
+    return failed
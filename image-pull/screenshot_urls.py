@@ -1,434 +1,1302 @@
 #!/usr/bin/env python3
 """
-Screenshot script for taking desktop and mobile screenshots of URLs from projects.json
+Screenshot script for taking desktop and mobile (or any other profile's) screenshots of the URLs in the site's projects.json
 """
 
-import json
+import argparse
+import asyncio
+import base64
+import functools
 import os
-import re
-from urllib.parse import urlparse
-from playwright.sync_api import sync_playwright
+import sys
 import time
+from urllib.parse import urlparse
+from playwright.async_api import async_playwright
+
+from banners import describe_banner_stats, install_banner_remover, remove_cookie_banners
+from cards import ROOT, card_target, fill_image_fields, make_card
+from dataset import PROJECTS_JSON, DatasetError, load_projects
+from encode import EXTENSIONS, OUTPUT_FORMATS, Encoder, OutputOptions, find_capture
+from har import HAR_DIR, HAR_MODES, MISSING_POLICIES, HarOptions
+from health import DEFAULT_HEALTH_TIMEOUT, DEFAULT_HEALTH_TTL_HOURS, HEALTH_NAME, HealthCache, HealthOptions
+from interactive import (
+    DEFAULT_INTERACTIVE_BUDGET, DEFAULT_INTERACTIVE_CONCURRENCY, FRAME_COUNT, FRAME_STEP, INTERACTIVE_MODES,
+    SCROLL_POSITIONS, SEQUENCE_KINDS, SOFTWARE_GL_ARGS, InteractiveOptions, capture_sequence, is_interactive,
+    write_sequence,
+)
+from intercept import DEFAULT_BLOCKLIST, DEFAULT_CACHE_SIZE_MB, AssetCache, InterceptStats, Interceptor, load_blocklist
+from lazyload import MAX_PASSES, install_lazy_tracker, trigger_lazy_load
+from manifest import DEFAULT_MAX_AGE_DAYS, MANIFEST_NAME, Manifest, fetch_validators, perceptual_hash, validators_from_headers
+from scheduler import (
+    DEFAULT_JOB_BUDGET, DEFAULT_RETRIES, FAILED_NAME, RETRY_STATUSES,
+    CaptureJob, Scheduler, TransientError, load_failed, soft_deadline, within_budget, write_failed,
+)
+from profiles import PROFILES_FILE, ProfileError, load_profiles, select_profiles
+from settle import PageSettler
+from shards import CARDS_NAME, in_shard, merge_shards, parse_shard, run_shards, shard_path, write_cards
+from store import LINK_MODES, STORE_INDEX, ScreenshotStore, SlugCollisionError, detach_all
+from tiled import TALL_PAGE_POLICIES, TilingOptions, capture_full_page
+from timings import NetworkMeter, PhaseTimer, TimingLog
+from visual_diff import DEFAULT_DIFF_THRESHOLD, DIFF_REPORT_NAME, DiffReport, describe_review, review_capture, staging_path
+
+
+# Number of URLs captured at once when no --concurrency is given
+DEFAULT_CONCURRENCY = 4
+
+# Politeness limits: at most this many open pages per host, and at least
+# this many seconds between two navigations to the same host
+DEFAULT_PER_HOST = 4
+DEFAULT_HOST_INTERVAL = 1.0
+
+# Static assets cached across pages and runs, inside the output directory
+ASSET_CACHE_DIR = '.asset-cache'
+
+# Per-phase timings of the last run, inside the output directory
+TIMINGS_NAME = 'timings.jsonl'
+
+# The devices each project is captured on live in profiles.toml (see profiles.py).
+# In shared mode the page is loaded with the first profile and resized in place for the rest.
+
+class HostLimiter:
+    """
+    Per-host politeness limits shared by all capture workers.
+
+    Caps the number of pages open against one host at the same time and
+    spaces out navigations to that host by a minimum interval.
+    """
+
+    def __init__(self, max_per_host=DEFAULT_PER_HOST, min_interval=DEFAULT_HOST_INTERVAL):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self._semaphores = {}
+        self._locks = {}
+        self._last_start = {}
+
+    async def acquire(self, url):
+        host = urlparse(url).netloc
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.max_per_host))
+        await semaphore.acquire()
+
+        # Space out navigation starts so a burst of workers doesn't hit the host at once
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self._last_start.get(host, 0) + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_start[host] = time.monotonic()
+
+    def release(self, url):
+        self._semaphores[urlparse(url).netloc].release()
+
+
+async def prepare_page(page, settler, log, timer, lazy_passes=MAX_PASSES):
+    """
+    Get a loaded page ready for a full-page screenshot.
+
+    Removes cookie banners, scrolls through the page until lazy loading
+    stops (see lazyload.py, at most `lazy_passes` passes, 0 = no scrolling)
+    and waits for everything to settle. Scrolling and waiting stop at the
+    capture's soft deadline (see scheduler.py), so the screenshot is taken
+    in time even when the page never settles.
+    """
+    deadline = soft_deadline()
+
+    # Remove cookie banners early
+    log("Removing cookie banners...")
+    with timer.phase('banners'):
+        banner_stats = await remove_cookie_banners(page)
+    log(f"Cookie banners: {describe_banner_stats(banner_stats)}")
+
+    # Scroll through the page until lazy loading stops producing new requests
+    if lazy_passes:
+        log("Triggering lazy load...")
+        await trigger_lazy_load(page, settler, log, timer, max_passes=lazy_passes, deadline=deadline)
+
+    # Wait for network, DOM and layout to go quiet and for images and iframes to be ready
+    log("Waiting for images and iframes...")
+    with timer.phase('final_settle'):
+        await settler.wait(log=log, deadline=deadline)
+
+
+async def open_page(context, url, profile, log, timer):
+    """
+    Open a new page in the context, load the URL and wait for the initial load to settle.
+
+    The profile decides which navigation event to wait for and the settle thresholds.
+
+    Returns:
+        (page, settler, meter, response) tuple, response being the main document response
+        and meter the NetworkMeter counting the page's traffic towards `timer`
+    """
+    page = await context.new_page()
+    settler = PageSettler(page)
+    profile.configure(settler)
+    await settler.install()
+    await install_banner_remover(page)
+    await install_lazy_tracker(page)
+    meter = NetworkMeter(page, timer)
+
+    # Set longer timeout and wait for domcontentloaded first
+    with timer.phase('navigation'):
+        response = await page.goto(url, wait_until=profile.wait_until, timeout=120000)
+    if response is not None and response.status in RETRY_STATUSES:
+        await page.close()
+        raise TransientError(f"HTTP {response.status} from {url}")
+    await timer.record_navigation(page)
+
+    log("Waiting for initial load...")
+    with timer.phase('initial_settle'):
+        await settler.wait(log=log, deadline=soft_deadline())
+    return page, settler, meter, response
+
+
+async def new_context(browser, context_options, interceptor=None, stats=None):
+    """
+    Create a browser context, routed through the interceptor when there is one.
+    """
+    if interceptor is None:
+        return await browser.new_context(**context_options)
+
+    # Requests made by service workers skip page.route, so keep them out of the way
+    context = await browser.new_context(service_workers='block', **context_options)
+    await interceptor.attach(context, stats)
+    return context
+
+
+class FreshContexts:
+    """
+    Gives every capture a brand new browser context and closes it afterwards.
+
+    The capture daemon swaps this for a pool of reused contexts (see daemon.py).
+    """
+
+    async def open(self, browser, context_options, interceptor=None, stats=None):
+        return await new_context(browser, context_options, interceptor, stats)
+
+    async def close(self, context):
+        await context.close()
+
+
+class CaptureSettings:
+    """
+    Run-wide capture settings shared by every worker.
+
+    Args:
+        shared_viewports: Load each page once and resize it for every viewport,
+            instead of a fresh context and page load per viewport
+        interceptor: Optional Interceptor for blocking ad/tracker requests and caching assets
+        tiling: TilingOptions for tall pages (None = only tile past Chromium's texture limit)
+        manifest: Manifest of previous captures; viewports that are still fresh are skipped
+            (None = capture everything and keep no record)
+        force: Re-capture even if the manifest says the capture is fresh
+        max_age_days: Re-capture entries older than this many days (None = no limit)
+        cards: Make card images from the card profile's (desktop) captures (see cards.py)
+        timings: TimingLog collecting per-phase timings (None = keep them in memory only)
+        contexts: Where capture contexts come from, an object with async open()/close()
+            like FreshContexts (None = a new context per capture)
+        job_budget: Seconds one viewport's capture may take before it is abandoned (None = no limit)
+        diff_threshold: Compare new captures with the stored screenshot and keep the old file
+            when less than this fraction of pixels changed (None = always overwrite, no diffing)
+        diffs: DiffReport collecting the comparisons (None = keep counts only)
+        output: OutputOptions for the screenshot files (None = PNG as captured); profiles
+            can override the format
+        encoder: Encoder for outputs that need re-encoding (None = write captures as they come)
+        profiles: List of Profile to capture (None = the default ones in profiles.toml)
+        interactive: InteractiveOptions for pages under /interactive/ (None = capture them like any other page)
+        har: HarOptions to record or replay each capture's traffic (None = use the network as is)
+        store: ScreenshotStore keeping every capture as a content-addressed blob (None = screenshots
+            are plain files, overwritten by each capture)
+    """
+
+    def __init__(self, shared_viewports=True, interceptor=None, tiling=None, manifest=None,
+                 force=False, max_age_days=DEFAULT_MAX_AGE_DAYS, cards=True, timings=None,
+                 contexts=None, job_budget=DEFAULT_JOB_BUDGET, diff_threshold=DEFAULT_DIFF_THRESHOLD,
+                 diffs=None, output=None, encoder=None, profiles=None, interactive=None, har=None,
+                 store=None):
+        self.shared_viewports = shared_viewports
+        self.interceptor = interceptor
+        self.tiling = tiling
+        self.manifest = manifest
+        self.force = force
+        self.max_age_days = max_age_days
+        self.cards = cards
+        self.timings = timings or TimingLog()
+        self.contexts = contexts or FreshContexts()
+        self.job_budget = job_budget
+        self.diff_threshold = diff_threshold
+        self.diffs = diffs or DiffReport()
+        self.output = output or OutputOptions()
+        self.encoder = encoder
+        self.profiles = profiles or select_profiles(load_profiles())
+        self.interactive = interactive
+        self.har = har
+        self.store = store
 
 
-def remove_cookie_banners(page):
+async def capture_viewport(browser, url, target, log, settings, stats, timer, on_screenshot=None, save=None,
+                           har=None):
     """
-    Remove common cookie consent banners and popups from the page.
+    Load a URL in a fresh browser context and save a full-page screenshot.
+
+    Args:
+        browser: Playwright browser shared by all workers
+        url: Page to capture
+        target: (profile, path) tuple, the Profile describing the device and where to save
+        log: Function used to print progress lines for this URL
+        settings: CaptureSettings for the run
+        stats: InterceptStats for this URL
+        timer: PhaseTimer for this URL and viewport
+        on_screenshot: Optional async function called with (name, image_bytes), the
+            bytes covering at least the top of the page
+        save: Optional async function called with (name, image_bytes) to hand the capture
+            to the encoder instead of writing it to `path` (see save_options())
+        har: Optional HarArchive recording or replaying the context's traffic (see har.py)
+
+    Returns:
+        Headers of the main document response
     """
+    profile, path = target
+    context = await settings.contexts.open(browser, profile.context_options, settings.interceptor, stats)
     try:
-        # More comprehensive script to remove cookie banners and overlays
-        page.evaluate('''
-            // Remove common cookie banner elements
-            const selectors = [
-                '[id*="cookie"]',
-                '[class*="cookie"]',
-                '[id*="consent"]',
-                '[class*="consent"]',
-                '[id*="onetrust"]',
-                '[class*="onetrust"]',
-                '[id*="privacy"]',
-                '[class*="privacy"]',
-                '[class*="banner"]',
-                '[class*="gdpr"]',
-                '[id*="gdpr"]',
-                '.evidon-banner',
-                '.qc-cmp2-container',
-                '[class*="CookieNotice"]',
-                '[class*="cookie-notice"]',
-                '[id*="CookieBanner"]',
-                '[class*="CookieBanner"]',
-                // CNN specific
-                '.privacy-manager',
-                '#privacy-manager',
-                '.privacy-banner',
-                '[class*="modal"]',
-                '[class*="overlay"]',
-                '[id*="modal"]'
-            ];
-            
-            selectors.forEach(selector => {
-                try {
-                    document.querySelectorAll(selector).forEach(el => {
-                        // Check if it might be a cookie banner (not too large)
-                        const rect = el.getBoundingClientRect();
-                        if (rect.height < window.innerHeight * 0.5 || el.innerText.toLowerCase().includes('cookie') || el.innerText.toLowerCase().includes('privacy') || el.innerText.toLowerCase().includes('consent')) {
-                            el.remove();
-                        }
-                    });
-                } catch (e) {}
-            });
-            
-            // Remove any backdrop/overlay elements
-            document.querySelectorAll('body > div').forEach(div => {
-                const style = window.getComputedStyle(div);
-                if (style.position === 'fixed' && style.zIndex > 1000 && 
-                    (style.backgroundColor.includes('rgba') || style.background.includes('rgba'))) {
-                    div.remove();
-                }
-            });
-            
-            // Re-enable scrolling if it was disabled
-            document.body.style.overflow = 'auto';
-            document.documentElement.style.overflow = 'auto';
-        ''')
-        
-        # Wait a moment for any DOM updates
-        time.sleep(0.5)
-        
-        # Try to click accept buttons
-        accept_selectors = [
-            'button:has-text("Accept")',
-            'button:has-text("Agree")',
-            'button:has-text("I Accept")',
-            'button:has-text("OK")',
-            'button:has-text("Got it")',
-            '[class*="accept"][role="button"]',
-            '[id*="accept"][role="button"]',
-        ]
-        
-        for selector in accept_selectors:
-            try:
-                page.click(selector, timeout=500)
-                time.sleep(0.5)
-                break
-            except:
-                continue
-                
-    except Exception as e:
-        # Silently fail if cookie banner removal doesn't work
-        pass
-
-
-def extract_slug_from_url(url):
-    """
-    Extract a slug from the URL path.
-    For example: 'https://edition.cnn.com/interactive/2025/08/05/world/north-korea-it-worker-scheme-vis-intl-hnk/index.html'
-    Returns: 'north-korea-it-worker-scheme-vis-intl-hnk'
-    """
-    parsed = urlparse(url)
-    path = parsed.path
-    
-    # Remove leading/trailing slashes
-    path = path.strip('/')
-    
-    # Split by slashes and get the last meaningful part
-    parts = path.split('/')
-    
-    # Filter out common file names
-    parts = [p for p in parts if p not in ['index.html', 'index.htm', '']]
-    
-    if parts:
-        # Get the last part which is usually the slug
-        slug = parts[-1]
-        
-        # Remove file extensions
-        slug = re.sub(r'\.(html|htm|php)$', '', slug)
-        
-        return slug
-    
-    # Fallback: use the domain name if no path
-    return parsed.netloc.replace('.', '-')
-
-
-def take_screenshots(json_file, output_dir='screenshots'):
-    """
-    Take desktop and mobile screenshots of all URLs in the JSON file.
-    
+        if har is not None:
+            await har.attach(context)
+        page, settler, meter, response = await open_page(context, url, profile, log, timer)
+        await prepare_page(page, settler, log, timer, profile.lazy_passes)
+
+        head = await capture_full_page(
+            page, page_grabber(page), path, profile.tiling_options(settings.tiling), log, timer,
+            **save_options(settings, profile, save),
+        )
+        if on_screenshot is not None:
+            await on_screenshot(profile.name, head)
+        await meter.flush()
+        await page.close()
+        return response.headers if response else {}
+    finally:
+        await settings.contexts.close(context)
+
+
+async def capture_interactive(browser, url, target, log, settings, stats, timer, on_screenshot=None, save=None,
+                              har=None, sequence_base=None):
+    """
+    Load an interactive page in a fresh browser context and capture it as a sequence (see interactive.py).
+
+    The first image of the sequence is saved as the screenshot, the whole
+    sequence next to `sequence_base`. Arguments are as for capture_viewport().
+
+    Returns:
+        Headers of the main document response
+    """
+    profile, path = target
+    options = settings.interactive
+    context = await settings.contexts.open(browser, profile.context_options, settings.interceptor, stats)
+    try:
+        if har is not None:
+            await har.attach(context)
+        page, settler, meter, response = await open_page(context, url, profile, log, timer)
+        # Scrollytelling reacts to scrolling, so no lazy-load passes: the sequence does the scrolling
+        await prepare_page(page, settler, log, timer, lazy_passes=0)
+        images = await capture_sequence(page, settler, options, log, timer)
+        await meter.flush()
+        await page.close()
+
+        head = images[0]
+        kwargs = save_options(settings, profile, save)
+        if 'save' in kwargs:
+            await kwargs['save'](head)
+        else:
+            with timer.phase('write'), open(path, 'wb') as f:
+                f.write(head)
+        if on_screenshot is not None:
+            await on_screenshot(profile.name, head)
+
+        with timer.phase('sequence'):
+            written, size = await asyncio.to_thread(
+                write_sequence, images, sequence_base, options.sequence,
+                profile.output_options(settings.output), profile.device_scale_factor, options.frame_duration,
+            )
+        log(f"✓ {profile.name.capitalize()} sequence saved: {written} ({len(images)} images, {size / 1e6:.1f} MB)")
+        return response.headers if response else {}
+    finally:
+        await settings.contexts.close(context)
+
+
+def open_archive(settings, slug, profile, log, shared=False):
+    """
+    HarArchive for a browser context opened with this profile, or None when the run doesn't use HAR.
+
+    `shared` marks the shared-viewport page, whose archive covers every profile.
+    """
+    if settings.har is None:
+        return None
+    archive = settings.har.archive(slug, profile.name, shared)
+    log(f"HAR: {archive.describe()}")
+    return archive
+
+
+def save_options(settings, profile, save):
+    """
+    Keyword arguments for capture_full_page() that route one profile's capture through the encoder.
+
+    Captures that need no encoding (PNG output at the captured scale) are
+    written straight to disk as before.
+    """
+    output = profile.output_options(settings.output)
+    if save is None or not output.needs_encoding(profile.device_scale_factor):
+        return {}
+    return {
+        'save': functools.partial(save, profile.name),
+        'image_type': output.capture_type(),
+        'quality': output.quality,
+        'output': output,
+    }
+
+
+async def emulate_viewport(cdp, context_options, default_user_agent=None):
+    """
+    Switch an already loaded page to another viewport/device through the Chrome DevTools Protocol.
+
+    Playwright fixes device scale factor, mobile mode and user agent per
+    context, so changing them on a live page has to go through CDP. Profiles
+    without a user agent get `default_user_agent`, so one emulated before
+    them doesn't stick.
+    """
+    viewport = context_options['viewport']
+    has_touch = context_options.get('has_touch', False)
+
+    await cdp.send('Emulation.setDeviceMetricsOverride', {
+        'width': viewport['width'],
+        'height': viewport['height'],
+        'deviceScaleFactor': context_options.get('device_scale_factor', 1),
+        'mobile': context_options.get('is_mobile', False),
+    })
+    await cdp.send('Emulation.setTouchEmulationEnabled', {
+        'enabled': has_touch,
+        'maxTouchPoints': 5 if has_touch else 0,
+    })
+    user_agent = context_options.get('user_agent') or default_user_agent
+    if user_agent:
+        await cdp.send('Emulation.setUserAgentOverride', {'userAgent': user_agent})
+
+
+def page_grabber(page):
+    """
+    Screenshot function for capture_full_page() using Playwright's own full-page capture.
+    """
+    async def grab(clip, image_type='png', quality=None):
+        options = {'type': image_type, 'full_page': True}
+        if image_type == 'jpeg':
+            options['quality'] = quality
+        if clip is not None:
+            options['clip'] = clip
+        return await page.screenshot(**options)
+    return grab
+
+
+def cdp_grabber(cdp):
+    """
+    Screenshot function for capture_full_page() on a page whose viewport is emulated through CDP.
+
+    page.screenshot() would reset the emulated metrics back to the context
+    viewport, so the capture is taken with CDP directly.
+    """
+    async def grab(clip, image_type='png', quality=None):
+        if clip is None:
+            metrics = await cdp.send('Page.getLayoutMetrics')
+            content = metrics['cssContentSize']
+            clip = {'x': 0, 'y': 0, 'width': content['width'], 'height': content['height']}
+        params = {
+            'format': image_type,
+            'captureBeyondViewport': True,
+            'clip': {**clip, 'scale': 1},
+        }
+        if image_type == 'jpeg':
+            params['quality'] = quality
+        result = await cdp.send('Page.captureScreenshot', params)
+        return base64.b64decode(result['data'])
+    return grab
+
+
+async def capture_shared(browser, url, targets, log, settings, stats, timers, on_screenshot=None, save=None,
+                         har=None):
+    """
+    Capture several viewports from a single navigation.
+
+    The page is loaded once with the first target's settings. Each later
+    target resizes the same page in place and re-runs the lazy-load passes
+    for the new layout, so the network only pays for one page load.
+
     Args:
-        json_file: Path to the JSON file containing URLs
-        output_dir: Directory to save screenshots (default: 'screenshots')
+        browser: Playwright browser shared by all workers
+        url: Page to capture
+        targets: List of (profile, path) tuples, the first profile is loaded natively
+        log: Function used to print progress lines for this URL
+        settings: CaptureSettings for the run
+        stats: InterceptStats for this URL
+        timers: dict of target name -> PhaseTimer
+        on_screenshot: Optional async function called with (name, image_bytes) after each capture
+        save: Optional async function called with (name, image_bytes) to hand each capture
+            to the encoder instead of writing it to its path (see save_options())
+        har: Optional HarArchive recording or replaying the page's traffic (see har.py)
+
+    Returns:
+        Headers of the main document response
     """
-    # Create output directories
-    desktop_dir = os.path.join(output_dir, 'desktop')
-    mobile_dir = os.path.join(output_dir, 'mobile')
-    os.makedirs(desktop_dir, exist_ok=True)
-    os.makedirs(mobile_dir, exist_ok=True)
-    
-    # Load URLs from JSON
-    with open(json_file, 'r') as f:
-        projects = json.load(f)
-    
-    # Desktop viewport (1100px wide)
-    desktop_viewport = {'width': 1100, 'height': 800}
-    
-    # iPhone 14 viewport
-    # iPhone 14: 390 x 844 points (1170 x 2532 pixels at 3x)
-    mobile_viewport = {'width': 390, 'height': 844}
-    
-    with sync_playwright() as p:
-        # Launch browser
-        browser = p.chromium.launch(headless=True)
-        
-        print(f"Processing {len(projects)} URLs...\n")
-        
-        for idx, project in enumerate(projects, 1):
-            url = project.get('url')
-            if not url:
-                print(f"[{idx}/{len(projects)}] Skipping project (no URL): {project.get('name', 'Unknown')}")
-                continue
-            
-            # Skip interactive pages as they won't load properly
-            if '/interactive/' in url:
-                print(f"[{idx}/{len(projects)}] Skipping interactive page: {project.get('name', 'Unknown')}")
-                print(f"  URL: {url}\n")
+    (first, first_path), *rest = targets
+    context = await settings.contexts.open(browser, first.context_options, settings.interceptor, stats)
+    try:
+        if har is not None:
+            await har.attach(context)
+        log(f"Taking {first.name} screenshot...")
+        timer = timers[first.name]
+        page, settler, meter, response = await open_page(context, url, first, log, timer)
+        await prepare_page(page, settler, log, timer, first.lazy_passes)
+        head = await capture_full_page(
+            page, page_grabber(page), first_path, first.tiling_options(settings.tiling), log, timer,
+            **save_options(settings, first, save),
+        )
+        log(f"✓ {first.name.capitalize()} saved: {first_path}")
+        if on_screenshot is not None:
+            await on_screenshot(first.name, head)
+
+        cdp = await context.new_cdp_session(page)
+        browser_agent = (await cdp.send('Browser.getVersion'))['userAgent']
+        for profile, path in rest:
+            log(f"Taking {profile.name} screenshot (resized in place)...")
+            timer = meter.timer = timers[profile.name]
+            with timer.phase('resize'):
+                await page.evaluate("window.scrollTo(0, 0)")
+                await emulate_viewport(cdp, profile.context_options, browser_agent)
+            profile.configure(settler)
+            with timer.phase('initial_settle'):
+                await settler.wait(log=log)
+            await prepare_page(page, settler, log, timer, profile.lazy_passes)
+            head = await capture_full_page(
+                page, cdp_grabber(cdp), path, profile.tiling_options(settings.tiling), log, timer,
+                **save_options(settings, profile, save),
+            )
+            log(f"✓ {profile.name.capitalize()} saved: {path}")
+            if on_screenshot is not None:
+                await on_screenshot(profile.name, head)
+
+        await meter.flush()
+        await page.close()
+        return response.headers if response else {}
+    finally:
+        await settings.contexts.close(context)
+
+
+async def capture_project(browser, limiter, slug, project, label, output_dir, settings, card_assignments,
+                          viewports=None, force=False):
+    """
+    Take the screenshots for one project, one per capture profile.
+
+    Each viewport succeeds or fails on its own: a screenshot that was saved
+    is kept and recorded even if a later viewport fails.
+
+    Args:
+        browser: Playwright browser shared by all workers
+        limiter: HostLimiter applied around each page load
+        slug: The project's slug from the dataset index, used for file names
+        project: Entry from projects.json
+        label: Progress prefix such as '[3/31]'
+        output_dir: Directory containing a screenshot folder per profile
+        settings: CaptureSettings for the run
+        card_assignments: dict collecting project URL -> new card filename, for
+            projects whose `img` should be filled in or renamed
+        viewports: Names of the profiles to capture (None = all of settings.profiles)
+        force: Capture even if the manifest says the viewports are fresh
+
+    Returns:
+        dict of viewport name -> exception for the viewports that failed (empty = all
+        captured or still fresh)
+    """
+    url = project.get('url')
+    project_name = project.get('name', 'Unknown')
+    manifest = settings.manifest
+
+    def log(message):
+        print(f"  {label} {slug}: {message}")
+
+    print(f"{label} Processing: {project_name}")
+    print(f"  URL: {url}")
+    print(f"  Slug: {slug}")
+
+    # Screenshot paths without extension, and the screenshot each viewport already has in any format
+    profiles = {profile.name: profile for profile in settings.profiles}
+    outputs = {name: profile.output_options(settings.output) for name, profile in profiles.items()}
+    bases = {name: os.path.join(output_dir, name, slug) for name in profiles}
+    previous = {name: find_capture(base, outputs[name].extension) for name, base in bases.items()}
+    targets = [
+        (profile, previous[name] or bases[name] + outputs[name].extension)
+        for name, profile in profiles.items()
+        if viewports is None or name in viewports
+    ]
+
+    if settings.store is not None:
+        try:
+            other = settings.store.claim(slug, url)
+        except SlugCollisionError as e:
+            # Capturing would overwrite the other project's screenshots
+            log(f"✗ {e}\n")
+            return {profile.name: e for profile, _ in targets}
+        if other:
+            log(f"! Slug was captured from {other} before, keeping its history")
+
+    # A replay re-renders from the archives, so the live site isn't asked whether anything changed
+    replay = settings.har is not None and settings.har.replay
+    validators = {'etag': None, 'last_modified': None}
+    if manifest is not None and not replay:
+        validators = await asyncio.to_thread(fetch_validators, url)
+        if not (settings.force or force):
+            targets = [
+                (profile, path) for profile, path in targets
+                if not manifest.is_fresh(slug, profile.name, url, path, validators, settings.max_age_days)
+            ]
+            if not targets:
+                log("✓ Unchanged since last capture, skipping\n")
+                return {}
+
+    # Captures are written as PNG, or handed to the encoder which picks the final extension. With
+    # diffing on they go to a staging file and only replace the stored one if they differ enough;
+    # with the store on, so a screenshot linked to a stored blob is never written into.
+    staged = settings.diff_threshold is not None or settings.store is not None
+    targets = [
+        (profile, staging_path(bases[profile.name] + '.png') if staged else bases[profile.name] + '.png')
+        for profile, _ in targets
+    ]
+    if not staged:
+        # The encoder writes <slug>.webp etc. in place, and any of them may be linked to a blob
+        for profile, _ in targets:
+            detach_all(bases[profile.name], EXTENSIONS.values())
+
+    card = card_target(project, slug, output_dir) if settings.cards else None
+    timers = {profile.name: PhaseTimer(slug, url, profile.name) for profile, _ in targets}
+    captured = []
+
+    capture_paths = {profile.name: path for profile, path in targets}
+    encodes = {}
+
+    async def save(name, data):
+        # Encode in the background; the page moves on to the next viewport meanwhile
+        base = os.path.splitext(capture_paths[name])[0]
+        encodes[name] = asyncio.ensure_future(
+            settings.encoder.encode(data, base, profiles[name].device_scale_factor, outputs[name])
+        )
+
+    async def on_screenshot(name, png_bytes):
+        captured.append(name)
+        if not profiles[name].card or card is None:
+            return
+        card_path, img = card
+        with timers[name].phase('card'):
+            await asyncio.to_thread(make_card, png_bytes, card_path)
+        log(f"✓ Card image saved: {os.path.relpath(card_path, ROOT)}")
+        if img:
+            card_assignments[url] = img
+
+    stats = InterceptStats()
+    failed = {}
+    headers = {}
+    if settings.encoder is None:
+        save = None
+
+    interactive = settings.interactive is not None and is_interactive(url)
+    if interactive:
+        log(f"Interactive page, capturing {settings.interactive.describe()}")
+
+    if settings.shared_viewports and not interactive:
+        with timers[targets[0][0].name].phase('host_wait'):
+            await limiter.acquire(url)
+        archive = None
+        try:
+            archive = open_archive(settings, slug, targets[0][0], log, shared=True)
+            budget = settings.job_budget * len(targets) if settings.job_budget else None
+            headers = await within_budget(
+                capture_shared(browser, url, targets, log, settings, stats, timers, on_screenshot, save, archive),
+                budget,
+            )
+        except Exception as e:
+            # Viewports saved before the failure are kept
+            failed = {profile.name: e for profile, _ in targets if profile.name not in captured}
+        finally:
+            limiter.release(url)
+            if archive is not None:
+                archive.finish(ok=not failed)
+    else:
+        for target in targets:
+            profile, path = target
+            name = profile.name
+            log(f"Taking {name} screenshot...")
+
+            with timers[name].phase('host_wait'):
+                await limiter.acquire(url)
+            archive = None
+            try:
+                archive = open_archive(settings, slug, profile, log)
+                if interactive:
+                    capture = capture_interactive(
+                        browser, url, target, log, settings, stats, timers[name], on_screenshot, save, archive,
+                        sequence_base=bases[name],
+                    )
+                    budget = settings.interactive.budget
+                else:
+                    capture = capture_viewport(
+                        browser, url, target, log, settings, stats, timers[name], on_screenshot, save, archive,
+                    )
+                    budget = settings.job_budget
+                headers = await within_budget(capture, budget)
+                log(f"✓ {name.capitalize()} saved: {path}")
+            except Exception as e:
+                failed[name] = e
+            finally:
+                limiter.release(url)
+                if archive is not None:
+                    archive.finish(ok=name not in failed)
+
+    # Where each capture was written; the encoder may have chosen another extension
+    written = {}
+    for profile, path in targets:
+        name = profile.name
+        if name in encodes:
+            try:
+                with timers[name].phase('encode'):
+                    written[name], _ = await encodes[name]
+            except Exception as e:
+                failed.setdefault(name, e)
+        elif name in captured:
+            written[name] = path
+
+    final_paths = {}
+    reviews = {}
+    for profile, path in targets:
+        name = profile.name
+        if name in failed:
+            # Don't leave a partial capture behind
+            for partial in {path, written.get(name)}:
+                if partial and partial != previous[name] and os.path.exists(partial):
+                    os.remove(partial)
+            continue
+
+        final_paths[name] = bases[name] + os.path.splitext(written[name])[1]
+        if settings.diff_threshold is not None:
+            try:
+                with timers[name].phase('diff'):
+                    reviews[name] = await asyncio.to_thread(
+                        review_capture, previous[name], written[name], final_paths[name], settings.diff_threshold,
+                    )
+            except Exception as e:
+                failed[name] = e
                 continue
-            
-            slug = extract_slug_from_url(url)
-            project_name = project.get('name', 'Unknown')
-            
-            print(f"[{idx}/{len(projects)}] Processing: {project_name}")
-            print(f"  URL: {url}")
-            print(f"  Slug: {slug}")
-            
+            settings.diffs.write(slug, name, reviews[name])
+            log(f"{name.capitalize()} {describe_review(reviews[name])}")
+        else:
+            if written[name] != final_paths[name]:
+                os.replace(written[name], final_paths[name])
+            if previous[name] and previous[name] != final_paths[name] and os.path.exists(previous[name]):
+                # The screenshot used to be in another format (and wasn't unlinked from the store already)
+                os.remove(previous[name])
+
+        if settings.store is not None:
             try:
-                # Desktop screenshot
-                print(f"  Taking desktop screenshot...")
-                context_desktop = browser.new_context(viewport=desktop_viewport)
-                page_desktop = context_desktop.new_page()
-                
-                # Set longer timeout and wait for domcontentloaded first
-                page_desktop.goto(url, wait_until='domcontentloaded', timeout=120000)
-                
-                print(f"  Waiting for initial load...")
-                time.sleep(5)
-                
-                # Remove cookie banners early
-                print(f"  Removing cookie banners...")
-                remove_cookie_banners(page_desktop)
-                
-                # Perform multiple scroll passes to trigger all lazy loading
-                print(f"  Triggering lazy load (pass 1/3)...")
-                page_desktop.evaluate('''
-                    async () => {
-                        // Scroll in chunks to trigger lazy loading
-                        const distance = 500;
-                        const delay = 200;
-                        const height = Math.max(
-                            document.body?.scrollHeight || 0,
-                            document.documentElement?.scrollHeight || 0
-                        );
-                        
-                        if (height === 0) return;
-                        
-                        for (let scrolled = 0; scrolled < height; scrolled += distance) {
-                            window.scrollTo(0, scrolled);
-                            await new Promise(resolve => setTimeout(resolve, delay));
-                        }
-                        window.scrollTo(0, height);
-                    }
-                ''')
-                time.sleep(8)
-                
-                # Second pass - go back up
-                print(f"  Triggering lazy load (pass 2/3)...")
-                page_desktop.evaluate('''
-                    async () => {
-                        const distance = 500;
-                        const delay = 200;
-                        const height = Math.max(
-                            document.body?.scrollHeight || 0,
-                            document.documentElement?.scrollHeight || 0
-                        );
-                        
-                        if (height === 0) return;
-                        
-                        for (let scrolled = height; scrolled > 0; scrolled -= distance) {
-                            window.scrollTo(0, scrolled);
-                            await new Promise(resolve => setTimeout(resolve, delay));
-                        }
-                        window.scrollTo(0, 0);
-                    }
-                ''')
-                time.sleep(8)
-                
-                # Third pass - quick final scroll
-                print(f"  Triggering lazy load (pass 3/3)...")
-                page_desktop.evaluate("window.scrollTo(0, Math.max(document.body?.scrollHeight || 0, document.documentElement?.scrollHeight || 0))")
-                time.sleep(6)
-                page_desktop.evaluate("window.scrollTo(0, 0)")
-                time.sleep(4)
-                
-                # Wait for images and iframes
-                print(f"  Waiting for images and iframes...")
-                page_desktop.evaluate('''
-                    new Promise((resolve) => {
-                        const timeout = setTimeout(resolve, 15000); // 15 sec max wait
-                        
-                        // Wait for all images
-                        const images = Array.from(document.images);
-                        const iframes = Array.from(document.querySelectorAll('iframe'));
-                        const all = [...images, ...iframes];
-                        
-                        if (all.length === 0) {
-                            clearTimeout(timeout);
-                            resolve();
-                            return;
-                        }
-                        
-                        let loaded = 0;
-                        const checkComplete = () => {
-                            loaded++;
-                            if (loaded >= all.length) {
-                                clearTimeout(timeout);
-                                resolve();
-                            }
-                        };
-                        
-                        all.forEach(el => {
-                            if (el.complete || el.readyState === 'complete') {
-                                checkComplete();
-                            } else {
-                                el.addEventListener('load', checkComplete);
-                                el.addEventListener('error', checkComplete);
-                            }
-                        });
-                    });
-                ''')
-                time.sleep(3)
-                
-                desktop_path = os.path.join(desktop_dir, f"{slug}.png")
-                page_desktop.screenshot(path=desktop_path, full_page=True)
-                print(f"  ✓ Desktop saved: {desktop_path}")
-                
-                page_desktop.close()
-                context_desktop.close()
-                
-                # Mobile screenshot
-                print(f"  Taking mobile screenshot...")
-                context_mobile = browser.new_context(
-                    viewport=mobile_viewport,
-                    device_scale_factor=3,  # iPhone 14 has 3x display
-                    is_mobile=True,
-                    has_touch=True,
-                    user_agent='Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1'
-                )
-                page_mobile = context_mobile.new_page()
-                
-                # Set longer timeout and wait for domcontentloaded first
-                page_mobile.goto(url, wait_until='domcontentloaded', timeout=120000)
-                
-                print(f"  Waiting for initial load...")
-                time.sleep(5)
-                
-                # Remove cookie banners early
-                remove_cookie_banners(page_mobile)
-                
-                # Perform multiple scroll passes to trigger all lazy loading
-                print(f"  Triggering lazy load (pass 1/3)...")
-                page_mobile.evaluate('''
-                    async () => {
-                        // Scroll in chunks to trigger lazy loading
-                        const distance = 500;
-                        const delay = 200;
-                        const height = Math.max(
-                            document.body?.scrollHeight || 0,
-                            document.documentElement?.scrollHeight || 0
-                        );
-                        
-                        if (height === 0) return;
-                        
-                        for (let scrolled = 0; scrolled < height; scrolled += distance) {
-                            window.scrollTo(0, scrolled);
-                            await new Promise(resolve => setTimeout(resolve, delay));
-                        }
-                        window.scrollTo(0, height);
-                    }
-                ''')
-                time.sleep(8)
-                
-                # Second pass - go back up
-                print(f"  Triggering lazy load (pass 2/3)...")
-                page_mobile.evaluate('''
-                    async () => {
-                        const distance = 500;
-                        const delay = 200;
-                        const height = Math.max(
-                            document.body?.scrollHeight || 0,
-                            document.documentElement?.scrollHeight || 0
-                        );
-                        
-                        if (height === 0) return;
-                        
-                        for (let scrolled = height; scrolled > 0; scrolled -= distance) {
-                            window.scrollTo(0, scrolled);
-                            await new Promise(resolve => setTimeout(resolve, delay));
-                        }
-                        window.scrollTo(0, 0);
-                    }
-                ''')
-                time.sleep(8)
-                
-                # Third pass - quick final scroll
-                print(f"  Triggering lazy load (pass 3/3)...")
-                page_mobile.evaluate("window.scrollTo(0, Math.max(document.body?.scrollHeight || 0, document.documentElement?.scrollHeight || 0))")
-                time.sleep(6)
-                page_mobile.evaluate("window.scrollTo(0, 0)")
-                time.sleep(4)
-                
-                # Wait for images and iframes
-                page_mobile.evaluate('''
-                    new Promise((resolve) => {
-                        const timeout = setTimeout(resolve, 15000); // 15 sec max wait
-                        
-                        // Wait for all images
-                        const images = Array.from(document.images);
-                        const iframes = Array.from(document.querySelectorAll('iframe'));
-                        const all = [...images, ...iframes];
-                        
-                        if (all.length === 0) {
-                            clearTimeout(timeout);
-                            resolve();
-                            return;
-                        }
-                        
-                        let loaded = 0;
-                        const checkComplete = () => {
-                            loaded++;
-                            if (loaded >= all.length) {
-                                clearTimeout(timeout);
-                                resolve();
-                            }
-                        };
-                        
-                        all.forEach(el => {
-                            if (el.complete || el.readyState === 'complete') {
-                                checkComplete();
-                            } else {
-                                el.addEventListener('load', checkComplete);
-                                el.addEventListener('error', checkComplete);
-                            }
-                        });
-                    });
-                ''')
-                time.sleep(3)
-                
-                mobile_path = os.path.join(mobile_dir, f"{slug}.png")
-                page_mobile.screenshot(path=mobile_path, full_page=True)
-                print(f"  ✓ Mobile saved: {mobile_path}")
-                
-                page_mobile.close()
-                context_mobile.close()
-                
-                print(f"  ✓ Completed\n")
-                
+                with timers[name].phase('store'):
+                    blob, size, known = await asyncio.to_thread(settings.store.put, final_paths[name])
             except Exception as e:
-                print(f"  ✗ Error: {str(e)}\n")
+                failed[name] = e
                 continue
-        
-        browser.close()
-    
+            if not settings.store.record(slug, name, url, blob, size):
+                log(f"{name.capitalize()} is the stored capture already")
+            elif known:
+                log(f"{name.capitalize()} is identical to a stored capture, no space used")
+
+        size = os.path.getsize(final_paths[name])
+        timers[name].file = os.path.relpath(final_paths[name], output_dir)
+        timers[name].file_bytes = size
+        log(f"{name.capitalize()} file: {timers[name].file} ({size / 1e6:.1f} MB)")
+
+    done = [name for name in final_paths if name not in failed]
+    if manifest is not None and done:
+        # Fall back to the validators on the page response if HEAD didn't give us any
+        if not any(validators.values()):
+            validators = validators_from_headers(headers)
+
+        for name in done:
+            if name in reviews:
+                phash = reviews[name]['phash']
+            else:
+                try:
+                    with timers[name].phase('hash'):
+                        phash = await asyncio.to_thread(perceptual_hash, final_paths[name])
+                except Exception as e:
+                    failed[name] = e
+                    continue
+            if manifest.record(slug, name, url, validators, phash) and name not in reviews:
+                log(f"{name.capitalize()} looks the same as the previous capture")
+        manifest.save()
+    if settings.store is not None and done:
+        settings.store.save()
+
+    if settings.interceptor is not None:
+        log(f"Network: {stats.summary()}")
+
+    for name, error in failed.items():
+        log(f"✗ {name.capitalize()} error: {str(error) or type(error).__name__}")
+        timers[name].error = str(error) or type(error).__name__
+    log("✓ Completed\n" if not failed else "✗ Incomplete\n")
+
+    for timer in timers.values():
+        if timer.started:
+            settings.timings.write(timer)
+    return failed
+
+
+def make_interceptor(output_dir, blocklist_file=DEFAULT_BLOCKLIST, cache_size_mb=DEFAULT_CACHE_SIZE_MB):
+    """
+    Interceptor with the blocklist and an asset cache inside the output directory.
+
+    Args:
+        output_dir: Screenshot directory the asset cache lives in
+        blocklist_file: File listing the domains to block (None = block nothing)
+        cache_size_mb: Size cap of the asset cache (0 = don't cache, only block)
+    """
+    cache = AssetCache(os.path.join(output_dir, ASSET_CACHE_DIR), cache_size_mb * 1_000_000) if cache_size_mb else None
+    blocklist = load_blocklist(blocklist_file) if blocklist_file else set()
+    return Interceptor(cache, blocklist)
+
+
+async def take_screenshots_async(json_file, output_dir='screenshots', concurrency=DEFAULT_CONCURRENCY,
+                                 per_host=DEFAULT_PER_HOST, host_interval=DEFAULT_HOST_INTERVAL,
+                                 shared_viewports=True, incremental=True, force=False,
+                                 max_age_days=DEFAULT_MAX_AGE_DAYS, intercept=True,
+                                 blocklist_file=DEFAULT_BLOCKLIST, cache_size_mb=DEFAULT_CACHE_SIZE_MB,
+                                 tiling=None, cards=True, timings_file=TIMINGS_NAME,
+                                 retries=DEFAULT_RETRIES, job_budget=DEFAULT_JOB_BUDGET, only=None,
+                                 diff_threshold=DEFAULT_DIFF_THRESHOLD, diff_file=DIFF_REPORT_NAME, output=None,
+                                 shard=None, profiles=None, interactive=None, har=None, health=None,
+                                 store='hard'):
+    """
+    Capture every project with a pool of workers sharing one browser.
+
+    Projects are run by a Scheduler (see scheduler.py) so at most
+    `concurrency` pages are being captured at once, transient failures are
+    retried and each host gets its own politeness limit. Failed captures
+    are written to failed.json in the output directory.
+
+    Args:
+        json_file: projects.json built by data-gen/build_projects.py, with its index next to it
+        output_dir: Directory to save screenshots (default: 'screenshots')
+        concurrency: Number of projects captured at the same time
+        per_host: Maximum number of open pages per host
+        host_interval: Minimum seconds between navigations to the same host
+        shared_viewports: Load each page once and resize it for every viewport
+        incremental: Skip captures the manifest says are still fresh
+        force: Re-capture everything, but still update the manifest
+        max_age_days: Re-capture entries older than this many days (None = no limit)
+        intercept: Block ad/tracker requests and serve static assets from a disk cache
+        blocklist_file: File listing the domains to block (None = block nothing)
+        cache_size_mb: Size cap of the asset cache (0 = don't cache, only block)
+        tiling: TilingOptions for tall pages (None = only tile past Chromium's texture limit)
+        cards: Make card images from the card profile's (desktop) captures (see cards.py)
+        timings_file: JSON Lines file for per-phase timings, relative to output_dir (None = don't write one)
+        retries: Retries after the first attempt for captures that failed with a transient error
+        job_budget: Seconds one viewport's capture may take before it is abandoned (None = no limit)
+        only: dict of slug -> viewport names; capture just these, regardless of the manifest
+            (None = every project)
+        diff_threshold: Keep the stored screenshot when less than this fraction of its pixels
+            changed (None = always overwrite, no diffing)
+        diff_file: JSON Lines diff report, relative to output_dir (None = don't write one)
+        output: OutputOptions for format, quality and downscaling (None = PNG as captured)
+        shard: (i, N) to capture only shard i of N and write shard files for merging
+            (None = every project; see shards.py)
+        profiles: List of Profile to capture each project with (None = the default ones in profiles.toml)
+        interactive: InteractiveOptions for pages under /interactive/, captured as sequences by a
+            separate browser and queue (None = skip them)
+        har: HarOptions to record each capture's traffic or replay it from archives (None = live network)
+        health: HealthOptions to check every URL first and skip dead links (None = don't check)
+        store: How screenshots link into the content-addressed store, one of LINK_MODES ('hard' or
+            'symbolic'; None = plain files, overwritten by each capture, see store.py)
+    """
+    # Create an output directory per profile
+    profiles = profiles or select_profiles(load_profiles())
+    for profile in profiles:
+        os.makedirs(os.path.join(output_dir, profile.name), exist_ok=True)
+
+    # Load the projects with their slugs from the dataset index
+    projects = [(slug, project) for slug, project in load_projects(json_file) if in_shard(slug, shard)]
+    if shard is not None:
+        print(f"Shard {shard[0]}/{shard[1]}: {len(projects)} projects")
+
+    # A shard writes its own copy of every run-wide file, merged by merge_shards()
+    def run_file(name):
+        return shard_path(os.path.join(output_dir, name), shard) if name else None
+
+    if har is not None and har.offline:
+        # Nothing reaches a server, so there's nobody to be polite to
+        print(f"Replaying from HAR archives in {har.directory}, offline")
+        limiter = HostLimiter(concurrency, 0)
+    else:
+        limiter = HostLimiter(per_host, host_interval)
+
+    output = output or OutputOptions()
+    needs_encoder = any(
+        profile.output_options(output).needs_encoding(profile.device_scale_factor) for profile in profiles
+    )
+
+    settings = CaptureSettings(
+        shared_viewports=shared_viewports,
+        interceptor=make_interceptor(output_dir, blocklist_file, cache_size_mb) if intercept else None,
+        tiling=tiling,
+        manifest=Manifest(os.path.join(output_dir, MANIFEST_NAME), run_file(MANIFEST_NAME)) if incremental else None,
+        force=force,
+        max_age_days=max_age_days,
+        cards=cards,
+        timings=TimingLog(run_file(timings_file)),
+        job_budget=job_budget,
+        diff_threshold=diff_threshold,
+        diffs=DiffReport(run_file(diff_file) if diff_threshold is not None else None),
+        output=output,
+        encoder=Encoder(output) if needs_encoder else None,
+        profiles=profiles,
+        interactive=interactive,
+        har=har,
+        store=ScreenshotStore(output_dir, run_file(STORE_INDEX), store) if store else None,
+    )
+    card_assignments = {}
+
+    if only is not None:
+        projects = [(slug, project) for slug, project in projects if slug in only]
+
+    jobs = []
+    interactive_jobs = []
+    for idx, (slug, project) in enumerate(projects, 1):
+        label = f"[{idx}/{len(projects)}]"
+        url = project.get('url')
+        if not url:
+            print(f"{label} Skipping project (no URL): {project.get('name', 'Unknown')}")
+            continue
+
+        # Interactive pages are skipped unless they get their own capture mode
+        if is_interactive(url) and interactive is None:
+            print(f"{label} Skipping interactive page: {project.get('name', 'Unknown')}")
+            print(f"  URL: {url}\n")
+            continue
+
+        if only is not None:
+            job = CaptureJob(slug, project, only[slug], label, force=True)
+        else:
+            job = CaptureJob(slug, project, [profile.name for profile in profiles], label)
+        (interactive_jobs if is_interactive(url) else jobs).append(job)
+
+    # Replays never reach the live site, so its links don't matter
+    if health is not None and jobs + interactive_jobs and not (har is not None and har.replay):
+        # Dead links are dropped before a browser is launched to wait out their navigation timeout
+        cache = HealthCache(os.path.join(output_dir, HEALTH_NAME), run_file(HEALTH_NAME))
+        dead = await health.check([job.project['url'] for job in jobs + interactive_jobs], cache, per_host)
+        for job in jobs + interactive_jobs:
+            if job.project['url'] in dead:
+                print(f"{job.label} Skipping dead link: {job.project.get('name', 'Unknown')}")
+        if dead:
+            print()
+        jobs = [job for job in jobs if job.project['url'] not in dead]
+        interactive_jobs = [job for job in interactive_jobs if job.project['url'] not in dead]
+
+    async with async_playwright() as p:
+        # Interactive pages get a browser of their own with software WebGL, launched when first needed
+        browsers = {}
+        relaunch = asyncio.Lock()
+
+        async def get_browser(software_gl):
+            # A crashed page or context only fails its own job, but a dead browser fails every job after it
+            async with relaunch:
+                browser = browsers.get(software_gl)
+                if browser is None or not browser.is_connected():
+                    if browser is not None:
+                        print("! Browser disconnected, launching a new one")
+                    browser = browsers[software_gl] = await p.chromium.launch(
+                        headless=True, args=SOFTWARE_GL_ARGS if software_gl else None,
+                    )
+                return browser
+
+        async def capture(job):
+            browser = await get_browser(is_interactive(job.project.get('url')))
+            return await capture_project(
+                browser, limiter, job.slug, job.project, job.label, output_dir, settings, card_assignments,
+                viewports=job.viewports, force=job.force,
+            )
+
+        print(f"Processing {len(jobs)} URLs with {concurrency} workers, "
+              f"profiles: {', '.join(f'{profile.name} ({profile.describe()})' for profile in profiles)}")
+        if interactive_jobs:
+            print(f"Processing {len(interactive_jobs)} interactive URLs separately with "
+                  f"{interactive.concurrency} workers ({interactive.describe()})")
+        print()
+
+        # Two queues side by side, so slow interactive pieces never hold up the standard captures
+        scheduler = Scheduler(capture, concurrency, retries=retries)
+        interactive_scheduler = Scheduler(capture, interactive.concurrency if interactive else 1, retries=retries)
+        try:
+            standard_failed, interactive_failed = await asyncio.gather(
+                scheduler.run(jobs), interactive_scheduler.run(interactive_jobs),
+            )
+            failed = standard_failed + interactive_failed
+        finally:
+            if settings.encoder is not None:
+                settings.encoder.close()
+
+        for browser in browsers.values():
+            await browser.close()
+
+    failed_file = run_file(FAILED_NAME)
+    write_failed(failed_file, failed)
+
+    if card_assignments and shard is not None:
+        write_cards(run_file(CARDS_NAME), card_assignments)
+    elif card_assignments:
+        updated = fill_image_fields(card_assignments)
+        print(f"\n✓ Updated {updated} img fields in the project CSV")
+
     print(f"\n✓ All screenshots completed!")
-    print(f"  Desktop screenshots: {desktop_dir}")
-    print(f"  Mobile screenshots: {mobile_dir}")
+    for profile in profiles:
+        print(f"  {profile.name.capitalize()} screenshots: {os.path.join(output_dir, profile.name)}")
+    if timings_file:
+        print(f"  Timings: {run_file(timings_file)}")
+    if diff_threshold is not None:
+        print(f"  Compared with previous captures: {settings.diffs.summary()}")
+        if diff_file:
+            print(f"  Diff report: {run_file(diff_file)}")
+    if scheduler.retried or interactive_scheduler.retried:
+        print(f"  Retries: {scheduler.retried + interactive_scheduler.retried}")
+    if failed:
+        print(f"\n✗ {len(failed)} projects failed, listed in {failed_file}")
+        for job in failed:
+            for name, error in job.errors.items():
+                print(f"  {job.slug} ({name}): {error}")
+        print("  Re-run just these with --retry-failed")
+
+    print(f"\n{settings.timings.summary()}")
+
+
+def take_screenshots(json_file, output_dir='screenshots', concurrency=DEFAULT_CONCURRENCY,
+                     per_host=DEFAULT_PER_HOST, host_interval=DEFAULT_HOST_INTERVAL,
+                     shared_viewports=True, incremental=True, force=False,
+                     max_age_days=DEFAULT_MAX_AGE_DAYS, intercept=True,
+                     blocklist_file=DEFAULT_BLOCKLIST, cache_size_mb=DEFAULT_CACHE_SIZE_MB,
+                     tiling=None, cards=True, timings_file=TIMINGS_NAME,
+                     retries=DEFAULT_RETRIES, job_budget=DEFAULT_JOB_BUDGET, only=None,
+                     diff_threshold=DEFAULT_DIFF_THRESHOLD, diff_file=DIFF_REPORT_NAME, output=None,
+                     shard=None, profiles=None, interactive=None, har=None, health=None, store='hard'):
+    """
+    Take a screenshot of every URL in the JSON file for each capture profile.
+
+    Args:
+        json_file: projects.json built by data-gen/build_projects.py, with its index next to it
+        output_dir: Directory to save screenshots (default: 'screenshots')
+        concurrency: Number of projects captured at the same time (1 = serial)
+        per_host: Maximum number of open pages per host
+        host_interval: Minimum seconds between navigations to the same host
+        shared_viewports: Load each page once and resize it for every viewport
+            (False = a fresh context and page load per viewport)
+        incremental: Skip captures the manifest says are still fresh
+        force: Re-capture everything, but still update the manifest
+        max_age_days: Re-capture entries older than this many days (None = no limit)
+        intercept: Block ad/tracker requests and serve static assets from a disk cache
+        blocklist_file: File listing the domains to block (None = block nothing)
+        cache_size_mb: Size cap of the asset cache (0 = don't cache, only block)
+        tiling: TilingOptions for tall pages (None = only tile past Chromium's texture limit)
+        cards: Make card images from the card profile's (desktop) captures (see cards.py)
+        timings_file: JSON Lines file for per-phase timings, relative to output_dir (None = don't write one)
+        retries: Retries after the first attempt for captures that failed with a transient error
+        job_budget: Seconds one viewport's capture may take before it is abandoned (None = no limit)
+        only: dict of slug -> viewport names; capture just these, regardless of the manifest
+            (None = every project)
+        diff_threshold: Keep the stored screenshot when less than this fraction of its pixels
+            changed (None = always overwrite, no diffing)
+        diff_file: JSON Lines diff report, relative to output_dir (None = don't write one)
+        output: OutputOptions for format, quality and downscaling (None = PNG as captured)
+        shard: (i, N) to capture only shard i of N and write shard files for merging
+            (None = every project; see shards.py)
+        profiles: List of Profile to capture each project with (None = the default ones in profiles.toml)
+        interactive: InteractiveOptions for pages under /interactive/, captured as sequences by a
+            separate browser and queue (None = skip them)
+        har: HarOptions to record each capture's traffic or replay it from archives (None = live network)
+        health: HealthOptions to check every URL first and skip dead links (None = don't check)
+        store: How screenshots link into the content-addressed store, one of LINK_MODES ('hard' or
+            'symbolic'; None = plain files, overwritten by each capture, see store.py)
+    """
+    asyncio.run(take_screenshots_async(
+        json_file, output_dir,
+        concurrency=concurrency,
+        per_host=per_host,
+        host_interval=host_interval,
+        shared_viewports=shared_viewports,
+        incremental=incremental,
+        force=force,
+        max_age_days=max_age_days,
+        intercept=intercept,
+        blocklist_file=blocklist_file,
+        cache_size_mb=cache_size_mb,
+        tiling=tiling,
+        cards=cards,
+        timings_file=timings_file,
+        retries=retries,
+        job_budget=job_budget,
+        only=only,
+        diff_threshold=diff_threshold,
+        diff_file=diff_file,
+        output=output,
+        shard=shard,
+        profiles=profiles,
+        interactive=interactive,
+        har=har,
+        health=health,
+        store=store,
+    ))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Take desktop and mobile screenshots of project URLs.')
+    parser.add_argument('json_file', nargs='?', default=PROJECTS_JSON,
+                        help="The site's projects.json, built by `npm run data` (default: src/routes/assets/projects.json)")
+    parser.add_argument('--output-dir', default='screenshots',
+                        help='Directory to save screenshots (default: screenshots)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Number of projects captured at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST,
+                        help=f'Maximum open pages per host (default: {DEFAULT_PER_HOST})')
+    parser.add_argument('--host-interval', type=float, default=DEFAULT_HOST_INTERVAL,
+                        help=f'Minimum seconds between navigations to one host (default: {DEFAULT_HOST_INTERVAL})')
+    parser.add_argument('--separate-contexts', action='store_true',
+                        help='Load each page again in its own context per viewport instead of resizing one page '
+                             '(use for sites whose layout breaks when resized)')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-capture every URL even if the manifest says it is unchanged')
+    parser.add_argument('--max-age', type=float, default=DEFAULT_MAX_AGE_DAYS, metavar='DAYS',
+                        help=f'Re-capture entries older than this many days (default: {DEFAULT_MAX_AGE_DAYS})')
+    parser.add_argument('--no-intercept', action='store_true',
+                        help='Let every request through untouched (no blocklist, no asset cache)')
+    parser.add_argument('--blocklist', default=DEFAULT_BLOCKLIST,
+                        help='File of ad/tracker domains to block (default: blocklist.txt)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE_MB, metavar='MB',
+                        help=f'Size cap of the on-disk asset cache, 0 disables it (default: {DEFAULT_CACHE_SIZE_MB})')
+    parser.add_argument('--tiled', action='store_true',
+                        help='Capture every page in strips streamed into the PNG (memory stays flat on tall pages)')
+    parser.add_argument('--max-height', type=int, metavar='PX',
+                        help='Pages taller than this many CSS pixels are handled by --tall-pages (default: no limit)')
+    parser.add_argument('--tall-pages', choices=TALL_PAGE_POLICIES, default='tile',
+                        help='What to do with pages taller than --max-height: capture them in strips, '
+                             'or cut them off (default: tile)')
+    parser.add_argument('--timings', default=TIMINGS_NAME, metavar='FILE',
+                        help=f'JSON Lines file for per-phase timings, inside --output-dir (default: {TIMINGS_NAME})')
+    parser.add_argument('--no-cards', action='store_true',
+                        help="Don't make card images from desktop captures")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'Retries for captures that fail with a transient error (default: {DEFAULT_RETRIES})')
+    parser.add_argument('--job-budget', type=float, default=DEFAULT_JOB_BUDGET, metavar='SECONDS',
+                        help=f'Abandon a viewport capture after this long, 0 for no limit (default: {DEFAULT_JOB_BUDGET:.0f})')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help=f'Only capture the projects and viewports listed in {FAILED_NAME} by the last run')
+    parser.add_argument('--diff-threshold', type=float, default=DEFAULT_DIFF_THRESHOLD, metavar='FRACTION',
+                        help='Keep the previous screenshot when less than this fraction of its pixels changed '
+                             f'(default: {DEFAULT_DIFF_THRESHOLD})')
+    parser.add_argument('--no-diff', action='store_true',
+                        help='Always overwrite previous screenshots without comparing them')
+    parser.add_argument('--diff-report', default=DIFF_REPORT_NAME, metavar='FILE',
+                        help=f'JSON Lines diff report, inside --output-dir (default: {DIFF_REPORT_NAME})')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='png',
+                        help='Screenshot file format; jpeg is encoded by Chromium itself (default: png)')
+    parser.add_argument('--quality', type=int, metavar='0-100',
+                        help='Quality for webp, avif and jpeg (default: 80, 55 and 85)')
+    parser.add_argument('--optimize-png', action='store_true',
+                        help='Re-compress PNGs with maximum compression (smaller files, same pixels)')
+    parser.add_argument('--max-scale', type=float, metavar='N',
+                        help='Downscale captures taken at a higher device scale factor, e.g. 2 for the 3x mobile '
+                             'capture (default: keep)')
+    parser.add_argument('--profiles', nargs='+', metavar='NAME',
+                        help='Capture profiles to use, e.g. desktop mobile tablet (default: those marked default)')
+    parser.add_argument('--profiles-file', default=PROFILES_FILE, metavar='FILE',
+                        help='TOML file describing the capture profiles (default: profiles.toml)')
+    parser.add_argument('--skip-interactive', action='store_true',
+                        help='Skip pages under /interactive/ instead of capturing them as sequences')
+    parser.add_argument('--interactive-mode', choices=INTERACTIVE_MODES, default='scroll',
+                        help='Capture interactive pages at scroll positions, or as animation frames (default: scroll)')
+    parser.add_argument('--interactive-positions', type=float, nargs='+', metavar='FRACTION',
+                        help='Scroll positions for interactive pages, as fractions of the page '
+                             '(default: 0 0.25 0.5 0.75 1)')
+    parser.add_argument('--interactive-frames', type=int, default=FRAME_COUNT, metavar='N',
+                        help=f'Frames captured in frames mode, {FRAME_STEP} animation frames apart '
+                             f'(default: {FRAME_COUNT})')
+    parser.add_argument('--interactive-output', choices=SEQUENCE_KINDS, default='images',
+                        help='Save interactive sequences as separate images or an animated WebP (default: images)')
+    parser.add_argument('--interactive-budget', type=float, default=DEFAULT_INTERACTIVE_BUDGET, metavar='SECONDS',
+                        help='Abandon an interactive viewport capture after this long, 0 for no limit '
+                             f'(default: {DEFAULT_INTERACTIVE_BUDGET:.0f})')
+    parser.add_argument('--interactive-concurrency', type=int, default=DEFAULT_INTERACTIVE_CONCURRENCY, metavar='N',
+                        help='Interactive pages captured at once, next to the standard workers '
+                             f'(default: {DEFAULT_INTERACTIVE_CONCURRENCY})')
+    parser.add_argument('--har', choices=HAR_MODES,
+                        help='Record every page\'s traffic to HAR archives, replay captures from them, or '
+                             'replay where an archive exists and record the rest (default: live network only)')
+    parser.add_argument('--har-missing', choices=MISSING_POLICIES, default='abort',
+                        help='When replaying, abort requests missing from the archive or fetch them from '
+                             'the network (default: abort)')
+    parser.add_argument('--har-dir', metavar='DIR',
+                        help=f'Folder of HAR archives (default: {HAR_DIR}/ inside --output-dir)')
+    parser.add_argument('--no-store', action='store_true',
+                        help='Write screenshots as plain files, overwritten by each capture, instead of keeping '
+                             'every capture in the content-addressed store')
+    parser.add_argument('--store-links', choices=LINK_MODES, default='hard',
+                        help='How screenshot paths point at their stored capture (default: hard)')
+    parser.add_argument('--no-health-check', action='store_true',
+                        help="Don't check that project URLs resolve before capturing (dead links are skipped)")
+    parser.add_argument('--health-ttl', type=float, default=DEFAULT_HEALTH_TTL_HOURS, metavar='HOURS',
+                        help=f'Reuse health check results younger than this, 0 to check every URL again '
+                             f'(default: {DEFAULT_HEALTH_TTL_HOURS})')
+    parser.add_argument('--health-timeout', type=float, default=DEFAULT_HEALTH_TIMEOUT, metavar='SECONDS',
+                        help=f'Seconds one URL may take in the health check (default: {DEFAULT_HEALTH_TIMEOUT})')
+    parser.add_argument('--shard', metavar='I/N',
+                        help='Only capture shard I of N (projects split by slug) and write shard files to merge later')
+    parser.add_argument('--shards', type=int, metavar='N',
+                        help='Run N shard processes side by side, each with its own browser, then merge them')
+    parser.add_argument('--merge-shards', type=int, metavar='N',
+                        help='Merge the files written by N --shard runs into --output-dir, without capturing')
+    args = parser.parse_args()
+
+    if args.concurrency < 1 or args.per_host < 1:
+        parser.error('--concurrency and --per-host must be at least 1')
+    if args.retries < 0:
+        parser.error('--retries must not be negative')
+    if args.quality is not None and not 0 <= args.quality <= 100:
+        parser.error('--quality must be between 0 and 100')
+    try:
+        args.output = OutputOptions(args.format, args.quality, args.optimize_png, args.max_scale)
+    except ValueError as e:
+        parser.error(str(e))
+    args.har_options = None
+    if args.har:
+        har_dir = args.har_dir or os.path.join(args.output_dir, HAR_DIR)
+        args.har_options = HarOptions(har_dir, args.har, args.har_missing)
+    args.health = None
+    if not args.no_health_check:
+        try:
+            args.health = HealthOptions(args.health_ttl, args.health_timeout)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.interactive_concurrency < 1:
+        parser.error('--interactive-concurrency must be at least 1')
+    args.interactive = None
+    if not args.skip_interactive:
+        try:
+            args.interactive = InteractiveOptions(
+                mode=args.interactive_mode,
+                positions=args.interactive_positions or SCROLL_POSITIONS,
+                frames=args.interactive_frames,
+                sequence=args.interactive_output,
+                budget=args.interactive_budget or None,
+                concurrency=args.interactive_concurrency,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        args.profile_table = load_profiles(args.profiles_file)
+        args.profiles = select_profiles(args.profile_table, args.profiles)
+    except ProfileError as e:
+        parser.error(str(e))
+    if args.shard:
+        try:
+            args.shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if sum(option is not None for option in (args.shard, args.shards, args.merge_shards)) > 1:
+        parser.error('--shard, --shards and --merge-shards are mutually exclusive')
+    if (args.shards or args.merge_shards or 1) < 1:
+        parser.error('--shards and --merge-shards must be at least 1')
+
+    return args
+
+
+def merge_and_report(args, count):
+    """
+    Merge the shard files of a sharded run and print the combined results.
+
+    Returns:
+        Number of failed jobs over all shards
+    """
+    timings, diffs, failed, found = merge_shards(
+        args.output_dir, count, MANIFEST_NAME, args.timings,
+        None if args.no_diff else args.diff_report, FAILED_NAME, HEALTH_NAME,
+        store=not args.no_store,
+    )
+    print(f"\n✓ Merged {found} of {count} shards into {args.output_dir}")
+    print(timings.summary())
+    if not args.no_diff:
+        print(f"  Compared with previous captures: {diffs.summary()}")
+    if failed:
+        print(f"  ✗ Failed: {len(failed)} (see {os.path.join(args.output_dir, FAILED_NAME)}, "
+              f"re-run them with --retry-failed)")
+    return len(failed)
 
 
 if __name__ == '__main__':
-    # Use the projects.json file in the current directory
-    json_file = 'projects.json'
-    
-    if not os.path.exists(json_file):
-        print(f"Error: {json_file} not found!")
+    args = parse_args()
+
+    if not os.path.exists(args.json_file):
+        print(f"Error: {args.json_file} not found!")
         exit(1)
-    
-    take_screenshots(json_file)
 
+    only = None
+    if args.retry_failed:
+        failed_file = os.path.join(args.output_dir, FAILED_NAME)
+        if not os.path.exists(failed_file):
+            print(f"Nothing to retry: {failed_file} not found")
+            exit(0)
+        only = load_failed(failed_file)
+        # Failed profiles are captured again even if this run didn't ask for them
+        names = {profile.name for profile in args.profiles}
+        names.update(name for viewports in only.values() for name in viewports if name in args.profile_table)
+        args.profiles = select_profiles(args.profile_table, names)
+
+    if args.merge_shards:
+        merge_and_report(args, args.merge_shards)
+        exit(0)
+
+    if args.shards:
+        os.makedirs(args.output_dir, exist_ok=True)
+        codes = run_shards(sys.argv[1:], args.shards, args.per_host, args.host_interval)
+        broken = [f"{index}/{args.shards}" for index, code in codes.items() if code != 0]
+        merge_and_report(args, args.shards)
+        if broken:
+            print(f"✗ Shards {', '.join(broken)} exited with an error")
+            exit(1)
+        exit(0)
+
+    try:
+        take_screenshots(
+            args.json_file, args.output_dir,
+            concurrency=args.concurrency,
+            per_host=args.per_host,
+            host_interval=args.host_interval,
+            shared_viewports=not args.separate_contexts,
+            force=args.force,
+            max_age_days=args.max_age,
+            intercept=not args.no_intercept,
+            blocklist_file=args.blocklist,
+            cache_size_mb=args.cache_size,
+            tiling=TilingOptions(max_height=args.max_height, policy=args.tall_pages, always=args.tiled),
+            cards=not args.no_cards,
+            timings_file=args.timings,
+            retries=args.retries,
+            job_budget=args.job_budget or None,
+            only=only,
+            diff_threshold=None if args.no_diff else args.diff_threshold,
+            diff_file=args.diff_report,
+            output=args.output,
+            shard=args.shard,
+            profiles=args.profiles,
+            interactive=args.interactive,
+            har=args.har_options,
+            health=args.health,
+            store=None if args.no_store else args.store_links,
+        )
+    except DatasetError as e:
+        print(f"Error: {e}")
+        exit(1)
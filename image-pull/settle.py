@@ -0,0 +1,221 @@
+"""
+Page-settle detection: decide when a page is ready to screenshot instead of sleeping for a fixed time.
+
+A page counts as settled once all of these hold:
+- network idle: no requests in flight for the quiet window (requests open longer
+  than LONG_REQUEST, e.g. analytics beacons or long polling, are ignored)
+- DOM quiet: no nodes added/removed or src/srcset changes for the quiet window
+- layout stable: the document scrollHeight hasn't changed for the quiet window
+- media ready: every image has decoded and every frame has fired its load event
+
+All of them share one overall deadline. Each wait logs which signal held it up
+the longest, so the thresholds can be tuned from real runs.
+"""
+
+import asyncio
+import time
+
+
+# Overall deadline for a single settle wait (seconds)
+SETTLE_TIMEOUT = 15
+
+# How long every signal has to stay quiet before the page counts as settled
+QUIET_WINDOW = 0.5
+
+# Requests in flight for longer than this are treated as background traffic
+LONG_REQUEST = 5
+
+POLL_INTERVAL = 0.1
+
+# Injected before any page script runs: remembers when the DOM last changed
+MUTATION_TRACKER_JS = '''
+    (() => {
+        window.__settleLastMutation = performance.now();
+        new MutationObserver(() => {
+            window.__settleLastMutation = performance.now();
+        }).observe(document, {
+            subtree: true,
+            childList: true,
+            attributes: true,
+            attributeFilter: ['src', 'srcset']
+        });
+    })();
+'''
+
+PAGE_STATE_JS = '''
+    () => ({
+        sinceMutation: window.__settleLastMutation === undefined
+            ? null : performance.now() - window.__settleLastMutation,
+        height: Math.max(
+            document.body?.scrollHeight || 0,
+            document.documentElement?.scrollHeight || 0
+        )
+    })
+'''
+
+# Resolve once every image has loaded and decoded, or when the timeout runs out
+DECODE_IMAGES_JS = '''
+    async (timeoutMs) => {
+        const images = Array.from(document.images);
+        const ready = images.map(img => {
+            const loaded = img.complete ? Promise.resolve() : new Promise(resolve => {
+                img.addEventListener('load', resolve, { once: true });
+                img.addEventListener('error', resolve, { once: true });
+            });
+            return loaded.then(() => img.decode()).catch(() => {});
+        });
+
+        let timedOut = false;
+        await Promise.race([
+            Promise.all(ready),
+            new Promise(resolve => setTimeout(() => { timedOut = true; resolve(); }, timeoutMs))
+        ]);
+        return { images: images.length, timedOut };
+    }
+'''
+
+
+class PageSettler:
+    """
+    Tracks network activity for a page and waits for it to settle.
+
+    Create it right after the page and before page.goto(), so the network
+    listeners and the mutation tracker see the whole load.
+    """
+
+    def __init__(self, page, quiet=QUIET_WINDOW, long_request=LONG_REQUEST, timeout=SETTLE_TIMEOUT):
+        self.page = page
+        self.quiet = quiet
+        self.timeout = timeout
+        self.long_request = long_request
+        self._in_flight = {}
+        self._last_network = time.monotonic()
+        # Requests started since install(), so callers can tell whether an action caused any
+        self.request_count = 0
+
+    async def install(self):
+        self.page.on('request', self._on_request_start)
+        self.page.on('requestfinished', self._on_request_end)
+        self.page.on('requestfailed', self._on_request_end)
+        await self.page.add_init_script(MUTATION_TRACKER_JS)
+
+    def _on_request_start(self, request):
+        self.request_count += 1
+        self._in_flight[request] = time.monotonic()
+        self._last_network = time.monotonic()
+
+    def _on_request_end(self, request):
+        self._in_flight.pop(request, None)
+        self._last_network = time.monotonic()
+
+    def _network_quiet_since(self, now):
+        """
+        Time the network went quiet, or None while counted requests are in flight.
+        """
+        for started in self._in_flight.values():
+            if now - started < self.long_request:
+                return None
+        return self._last_network
+
+    async def wait(self, timeout=None, log=print, deadline=None):
+        """
+        Wait until the page is settled or the deadline passes.
+
+        Args:
+            timeout: Overall deadline in seconds for this wait (None = the settler's timeout)
+            log: Function used to report which signal ended the wait
+            deadline: time.monotonic() to give up at if that comes before the timeout
+                (None = only the timeout)
+
+        Returns:
+            dict with 'elapsed' seconds, the 'signal' that ended the wait and
+            whether the deadline was hit ('timed_out')
+        """
+        start = time.monotonic()
+        end = start + (timeout if timeout is not None else self.timeout)
+        deadline = end if deadline is None else min(end, deadline)
+
+        # Every signal has to be quiet for a full window after the wait starts,
+        # so work kicked off just before the call (e.g. a scroll) gets a chance to begin
+        quiet_since = {'network': start, 'dom': start, 'layout': start}
+        last_height = None
+        signal = None
+
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return self._report(start, self._still_waiting(quiet_since, now) or ['media'], True, log)
+
+            network_since = self._network_quiet_since(now)
+            quiet_since['network'] = None if network_since is None else max(start, network_since)
+
+            try:
+                state = await self.page.evaluate(PAGE_STATE_JS)
+            except Exception:
+                # The page is navigating or the frame went away; try again next poll
+                state = {'sinceMutation': None, 'height': last_height}
+
+            now = time.monotonic()
+            if state['sinceMutation'] is None:
+                quiet_since['dom'] = now
+            else:
+                quiet_since['dom'] = max(start, now - state['sinceMutation'] / 1000)
+
+            if state['height'] != last_height:
+                quiet_since['layout'] = now
+                last_height = state['height']
+
+            waiting = self._still_waiting(quiet_since, now)
+            if not waiting:
+                break
+
+            # Remember which signal was the last one holding the wait open
+            signal = max(waiting, key=lambda name: quiet_since[name] or now)
+            await asyncio.sleep(POLL_INTERVAL)
+
+        # Everything is quiet: make sure the media on the page is actually ready to paint
+        remaining = max(deadline - time.monotonic(), 0)
+        media = await self._wait_for_media(remaining)
+        if media['timedOut']:
+            return self._report(start, ['media'], True, log)
+        if media['waited'] > POLL_INTERVAL:
+            signal = 'media'
+
+        return self._report(start, [signal or 'network'], False, log)
+
+    def _still_waiting(self, quiet_since, now):
+        return [
+            name for name, since in quiet_since.items()
+            if since is None or now - since < self.quiet
+        ]
+
+    async def _wait_for_media(self, timeout):
+        started = time.monotonic()
+        try:
+            images = await self.page.evaluate(DECODE_IMAGES_JS, int(timeout * 1000))
+        except Exception:
+            images = {'images': 0, 'timedOut': False}
+
+        # Frames are checked through Playwright so cross-origin iframes count too
+        # Playwright treats a timeout of 0 as "no timeout", so keep at least 1ms
+        remaining = max(timeout - (time.monotonic() - started), 0.001)
+        frames_ready = True
+        if self.page.frames:
+            results = await asyncio.gather(
+                *(frame.wait_for_load_state('load', timeout=remaining * 1000) for frame in self.page.frames),
+                return_exceptions=True,
+            )
+            frames_ready = not any(isinstance(result, Exception) for result in results)
+
+        return {
+            'timedOut': images['timedOut'] or not frames_ready,
+            'waited': time.monotonic() - started,
+        }
+
+    def _report(self, start, signals, timed_out, log):
+        elapsed = time.monotonic() - start
+        if timed_out:
+            log(f"Settle deadline reached after {elapsed:.1f}s (still waiting on: {', '.join(signals)})")
+        else:
+            log(f"Settled after {elapsed:.1f}s (last signal: {signals[0]})")
+        return {'elapsed': elapsed, 'signal': signals[0], 'timed_out': timed_out}
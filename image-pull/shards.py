@@ -0,0 +1,254 @@
+"""
+Sharded capture across processes (and hosts).
+
+One screenshot_urls.py process drives one Chromium, which keeps a
+multi-core machine mostly idle. With `--shard i/N` a process only takes
+the projects whose slug hashes to shard i of N. The split depends on
+nothing but the slug, so every process (on any machine) agrees on it
+without talking to the others.
+
+A shard never writes the run-wide files. It reads manifest.json to decide
+what's fresh, but writes its manifest, timings, diff report, failed list,
+URL health results, screenshot store index and card assignments to its
+own files, e.g. manifest.shard-2-of-4.json.
+Merging folds those back into the usual files afterwards.
+
+`--shards N` does both on one machine: it starts N shard processes, each
+with its own browser, streams their output prefixed with the shard, and
+merges when they're done. Across machines, run `--shard i/N` on each one
+against the same output directory (or copy the shard files together) and
+then `--merge-shards N`.
+
+The asset cache is shared between shards: entries are written to
+process-specific temp files and renamed into place, so concurrent writers
+never expose a partial entry. Its size cap is shared too, since each
+process re-reads the cache directory for the others' entries before
+evicting (see intercept.py).
+"""
+
+import hashlib
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+
+from cards import fill_image_fields
+from health import HealthCache
+from store import ScreenshotStore
+from manifest import Manifest
+from timings import TimingLog
+from visual_diff import DiffReport
+
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'screenshot_urls.py')
+
+# Card assignments of a shard, merged into the project CSV at the end
+CARDS_NAME = 'cards.json'
+
+
+def parse_shard(text):
+    """
+    Parse 'i/N' into (i, N), with shards numbered from 1.
+    """
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like 2/4, not {text!r}") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard {index} is not between 1 and {count}")
+    return index, count
+
+
+def shard_of(slug, count):
+    """
+    Shard (1 to count) a slug belongs to. Stable across processes and machines, unlike hash().
+    """
+    digest = hashlib.sha256(slug.encode('utf-8')).hexdigest()
+    return int(digest, 16) % count + 1
+
+
+def in_shard(slug, shard):
+    return shard is None or shard_of(slug, shard[1]) == shard[0]
+
+
+def shard_path(path, shard):
+    """
+    The shard's own version of a run-wide file: manifest.json -> manifest.shard-2-of-4.json.
+    """
+    if shard is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{shard[0]}-of-{shard[1]}{ext}"
+
+
+def write_cards(path, assignments):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(assignments, f, indent=2, ensure_ascii=False)
+
+
+def shard_arguments(argv, shard, per_host, host_interval):
+    """
+    Command-line arguments for one shard process: the coordinator's own, minus
+    --shards, plus --shard and politeness limits split between the shards.
+    """
+    args = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == '--shards':
+            skip = True
+        elif not arg.startswith('--shards='):
+            args.append(arg)
+
+    # Hosts see every shard at once, so each one gets its share of the limits (later flags win)
+    count = shard[1]
+    return args + [
+        '--shard', f"{shard[0]}/{count}",
+        '--per-host', str(max(1, math.ceil(per_host / count))),
+        '--host-interval', str(host_interval * count),
+    ]
+
+
+def run_shards(argv, count, per_host, host_interval):
+    """
+    Run `count` shard processes of screenshot_urls.py side by side and wait for them.
+
+    Each line a shard prints is echoed with a '[shard i/N]' prefix.
+
+    Returns:
+        dict of shard index -> exit code
+    """
+    processes = {}
+    threads = []
+    for index in range(1, count + 1):
+        command = [sys.executable, '-u', SCRIPT, *shard_arguments(argv, (index, count), per_host, host_interval)]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        processes[index] = process
+
+        def echo(stream, prefix):
+            for line in stream:
+                print(f"{prefix} {line}", end='', flush=True)
+
+        thread = threading.Thread(target=echo, args=(process.stdout, f"[shard {index}/{count}]"), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    codes = {index: process.wait() for index, process in processes.items()}
+    for thread in threads:
+        thread.join()
+    return codes
+
+
+def merge_shards(output_dir, count, manifest_name, timings_file, diff_file, failed_name, health_name=None,
+                 store=False):
+    """
+    Fold the files written by `count` shards into the run-wide ones and remove them.
+
+    Args:
+        output_dir: Output directory the shards wrote to
+        count: Number of shards
+        manifest_name: Manifest file name; each shard only contributes entries for its own slugs
+        timings_file: Timings file name (None = shards didn't write timings)
+        diff_file: Diff report name (None = shards didn't write one)
+        failed_name: Failed-jobs file name
+        health_name: URL health cache name (None = shards didn't check URLs)
+        store: Shards kept their captures in the screenshot store; each contributes its own slugs
+            to the store's index (the blobs are already in the shared store)
+
+    Returns:
+        (TimingLog with every shard's records, DiffReport, list of failed job dicts, number of shards found)
+    """
+    manifest = Manifest(os.path.join(output_dir, manifest_name))
+    timings = TimingLog(os.path.join(output_dir, timings_file) if timings_file else None)
+    diffs = DiffReport(os.path.join(output_dir, diff_file) if diff_file else None)
+    health = HealthCache(os.path.join(output_dir, health_name)) if health_name else None
+    # Every shard started from this copy, so a URL missing from a shard's file was dropped by that shard
+    health_before = dict(health.entries) if health is not None else {}
+    health_dropped = set()
+    health_found = False
+    screenshots = ScreenshotStore(output_dir) if store else None
+    failed = []
+    cards = {}
+    found = 0
+
+    for index in range(1, count + 1):
+        shard = (index, count)
+        seen = False
+
+        path = shard_path(manifest.path, shard)
+        if os.path.exists(path):
+            seen = True
+            with open(path, 'r') as f:
+                entries = json.load(f)
+            # A shard's file also has everything it loaded from manifest.json; only its own slugs are news
+            manifest.entries.update({slug: entry for slug, entry in entries.items() if in_shard(slug, shard)})
+            os.remove(path)
+
+        for name, log in ((timings_file, timings), (diff_file, diffs)):
+            path = shard_path(os.path.join(output_dir, name), shard) if name else None
+            if path and os.path.exists(path):
+                seen = True
+                log.load(path)
+                os.remove(path)
+
+        path = shard_path(screenshots.path, shard) if screenshots is not None else None
+        if path and os.path.exists(path):
+            seen = True
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            screenshots.entries.update({slug: entry for slug, entry in entries.items() if in_shard(slug, shard)})
+            os.remove(path)
+
+        path = shard_path(health.path, shard) if health is not None else None
+        if path and os.path.exists(path):
+            seen = health_found = True
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            # Shards may share URLs; the latest check of each wins
+            health.entries.update({
+                url: entry for url, entry in entries.items()
+                if entry['checked_at'] >= health.entries.get(url, {}).get('checked_at', '')
+            })
+            # Errors aren't cached, so a shard whose check failed removed the URL's old result
+            health_dropped.update(url for url in health_before if url not in entries)
+            os.remove(path)
+
+        for name, collect in ((failed_name, failed.extend), (CARDS_NAME, cards.update)):
+            path = shard_path(os.path.join(output_dir, name), shard)
+            if os.path.exists(path):
+                seen = True
+                with open(path, 'r', encoding='utf-8') as f:
+                    collect(json.load(f))
+                os.remove(path)
+
+        if seen:
+            found += 1
+        else:
+            print(f"! Nothing found for shard {index}/{count} in {output_dir}")
+
+    if health_found:
+        for url in health_dropped:
+            # Unless another shard has checked it again since
+            if health.entries[url]['checked_at'] <= health_before[url]['checked_at']:
+                del health.entries[url]
+        health.save()
+
+    manifest.save()
+    if screenshots is not None and screenshots.entries:
+        screenshots.save()
+
+    failed_path = os.path.join(output_dir, failed_name)
+    if failed:
+        with open(failed_path, 'w', encoding='utf-8') as f:
+            json.dump(failed, f, indent=2, ensure_ascii=False)
+    elif os.path.exists(failed_path):
+        os.remove(failed_path)
+
+    if cards:
+        updated = fill_image_fields(cards)
+        print(f"✓ Updated {updated} img fields in the project CSV")
+
+    return timings, diffs, failed, found
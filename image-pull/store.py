@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Content-addressed screenshot store: history and deduplication for captures.
+
+Every screenshot is kept once, as a blob named after the SHA-256 of its
+bytes, under the output directory:
+
+    screenshots/.store/blobs/3a/3a306eee...c8.png
+
+An index records, per slug and profile, every distinct capture in order:
+
+    {
+        "north-korea-it-worker-scheme-vis-intl-hnk": {
+            "desktop": [
+                {
+                    "blob": "3a/3a306eee...c8.png",
+                    "captured_at": "2026-10-18T10:12:03+00:00",
+                    "url": "https://edition.cnn.com/...",
+                    "bytes": 2841023
+                }
+            ]
+        }
+    }
+
+The usual screenshots/<profile>/<slug>.png paths stay, as hard links to
+the latest blob (or symbolic links where hard links aren't possible or
+wanted), so everything that reads them works as before. A capture that's
+byte-for-byte one already stored costs no extra space: the new file is
+dropped and its path linked to the existing blob.
+
+Two projects can end up with the same slug (e.g. two bare-domain URLs).
+The dataset build refuses that, but a slug that another URL has claimed
+during the run is refused here too, before anything is written, rather than
+silently overwriting the other project's screenshot. A slug captured from a
+different URL in an earlier run is reported, since the project's link may
+simply have changed.
+
+Old captures are only removed by garbage collection, which keeps the latest
+capture of every slug and profile and caps the rest by count, age or total
+size:
+
+    python store.py gc --keep 5 --max-age 90 --max-size 2000
+    python store.py history north-korea-it-worker-scheme-vis-intl-hnk
+
+Don't run gc while a capture is writing to the same output directory.
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import shutil
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+
+STORE_DIR = '.store'
+BLOBS_DIR = 'blobs'
+STORE_INDEX = os.path.join(STORE_DIR, 'index.json')
+
+# How the readable screenshot paths point into the store
+LINK_MODES = ('hard', 'symbolic')
+
+
+class SlugCollisionError(ValueError):
+    """
+    Two different URLs were captured under the same slug in one run.
+    """
+
+
+def file_hash(path):
+    """
+    SHA-256 of a file's contents, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def detach(path):
+    """
+    Remove a screenshot that's linked into the store before it's overwritten in place.
+
+    Writing into a hard link would change the stored blob too; unlinking only drops the readable path.
+    """
+    if os.path.islink(path) or (os.path.exists(path) and os.stat(path).st_nlink > 1):
+        os.remove(path)
+
+
+def detach_all(base, extensions):
+    """
+    detach() the screenshot at a path without extension in every one of these extensions.
+
+    Any of them may be linked to a blob from an earlier run in another output format.
+    """
+    for extension in extensions:
+        detach(base + extension)
+
+
+class ScreenshotStore:
+    """
+    Blobs named by content hash, and the index of captures pointing into them.
+
+    Args:
+        output_dir: Screenshot directory the store lives in
+        save_path: Where save() writes the index, when it isn't the run-wide one (a shard's own
+            index, see shards.py)
+        links: How readable paths point at blobs, one of LINK_MODES; hard links fall back to
+            symbolic ones where the file system has none
+    """
+
+    def __init__(self, output_dir, save_path=None, links='hard'):
+        if links not in LINK_MODES:
+            raise ValueError(f"Unknown link mode: {links}")
+        self.root = os.path.join(output_dir, STORE_DIR)
+        self.path = os.path.join(output_dir, STORE_INDEX)
+        self.save_path = save_path or self.path
+        self.links = links
+        self.entries = {}
+        self._claims = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def blob_path(self, blob):
+        return os.path.join(self.root, BLOBS_DIR, blob)
+
+    def history(self, slug, viewport):
+        """
+        Every stored capture of a slug and profile, oldest first.
+        """
+        return self.entries.get(slug, {}).get(viewport, [])
+
+    def latest(self, slug, viewport):
+        history = self.history(slug, viewport)
+        return history[-1] if history else None
+
+    def claim(self, slug, url):
+        """
+        Reserve a slug for a URL for this run (or one daemon request, see for_run()), before capturing it.
+
+        Returns:
+            The URL the slug was last captured from, if that was a different one (else None)
+
+        Raises:
+            SlugCollisionError: if another URL already claimed the slug in this run
+        """
+        claimed = self._claims.setdefault(slug, url)
+        if claimed != url:
+            raise SlugCollisionError(f"Slug '{slug}' is already used by {claimed} in this run")
+        urls = [entry['url'] for history in self.entries.get(slug, {}).values() for entry in history[-1:]]
+        return next((other for other in urls if other != url), None)
+
+    def for_run(self):
+        """
+        The same store and index, with claims of its own.
+
+        The daemon takes one per request, so claims end with the request: a slug whose
+        project URL changed in between can be captured again without restarting.
+        """
+        run = copy.copy(self)
+        run._claims = {}
+        return run
+
+    def link(self, blob_path, path):
+        """
+        Point a readable path at a blob, replacing whatever is there in one step.
+        """
+        tmp_path = f"{path}.{os.getpid()}.link"
+        if self.links == 'hard':
+            try:
+                os.link(blob_path, tmp_path)
+                os.replace(tmp_path, path)
+                return
+            except OSError:
+                # No hard links on this file system (or across devices)
+                pass
+        os.symlink(os.path.relpath(blob_path, os.path.dirname(path)), tmp_path)
+        os.replace(tmp_path, path)
+
+    def put(self, path):
+        """
+        Move a screenshot's content into the store and leave a link to it at `path`. Runs in a worker thread.
+
+        Returns:
+            (blob name, size in bytes, True if an identical blob was already stored)
+        """
+        digest = file_hash(path)
+        blob = os.path.join(digest[:2], digest + os.path.splitext(path)[1])
+        blob_path = self.blob_path(blob)
+        size = os.path.getsize(path)
+
+        if os.path.exists(blob_path):
+            if not os.path.samefile(path, blob_path):
+                # Same bytes as a stored capture: keep that copy and drop this one
+                self.link(blob_path, path)
+            return blob, size, True
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        if self.links == 'hard' and not os.path.islink(path):
+            try:
+                # The blob and the readable path share one file, nothing is copied
+                os.link(path, blob_path)
+                return blob, size, False
+            except FileExistsError:
+                # Another shard stored the same bytes a moment ago
+                self.link(blob_path, path)
+                return blob, size, True
+            except OSError:
+                pass
+        shutil.move(path, blob_path)
+        self.link(blob_path, path)
+        return blob, size, False
+
+    def record(self, slug, viewport, url, blob, size):
+        """
+        Add a capture to the index, unless it's the one already recorded last.
+
+        Returns:
+            True if the capture is new to this slug and profile
+        """
+        history = self.entries.setdefault(slug, {}).setdefault(viewport, [])
+        if history and history[-1]['blob'] == blob:
+            return False
+        history.append({
+            'blob': blob,
+            'captured_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'url': url,
+            'bytes': size,
+        })
+        return True
+
+    def save(self):
+        """
+        Write the index atomically so an interrupted run never leaves a half-written file.
+        """
+        os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
+        tmp_path = f"{self.save_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=4, sort_keys=True, ensure_ascii=False)
+        os.replace(tmp_path, self.save_path)
+
+    def blobs(self):
+        """
+        dict of blob name -> size in bytes for every blob on disk.
+        """
+        blobs = {}
+        blobs_dir = os.path.join(self.root, BLOBS_DIR)
+        if not os.path.isdir(blobs_dir):
+            return blobs
+        for prefix in os.listdir(blobs_dir):
+            for name in os.listdir(os.path.join(blobs_dir, prefix)):
+                blob = os.path.join(prefix, name)
+                blobs[blob] = os.path.getsize(self.blob_path(blob))
+        return blobs
+
+    def collect_garbage(self, keep=None, max_age_days=None, max_bytes=None, dry_run=False):
+        """
+        Drop old captures from the index and delete the blobs nothing refers to any more.
+
+        The latest capture of every slug and profile is always kept, since the
+        readable screenshot paths point at it.
+
+        Args:
+            keep: Captures kept per slug and profile, the latest included (None = no limit)
+            max_age_days: Drop older captures than this (None = no limit)
+            max_bytes: Drop the oldest captures until the store holds at most this much (None = no limit)
+            dry_run: Only work out what would go
+
+        Returns:
+            (captures dropped, blobs deleted, bytes freed)
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days) if max_age_days is not None else None
+        dropped = 0
+        entries = {}
+        old = []
+        for slug, viewports in self.entries.items():
+            for viewport, history in viewports.items():
+                kept = history[-keep:] if keep else list(history)
+                kept = [
+                    entry for entry in kept[:-1]
+                    if cutoff is None or datetime.fromisoformat(entry['captured_at']) >= cutoff
+                ] + kept[-1:]
+                dropped += len(history) - len(kept)
+                entries.setdefault(slug, {})[viewport] = kept
+                old.extend((entry['captured_at'], slug, viewport, entry) for entry in kept[:-1])
+
+        blobs = self.blobs()
+        # Identical captures share a blob, which can only go once nothing refers to it
+        references = Counter(
+            entry['blob'] for viewports in entries.values() for history in viewports.values() for entry in history
+        )
+
+        if max_bytes is not None:
+            total = sum(blobs.get(blob, 0) for blob in references)
+            for _, slug, viewport, entry in sorted(old, key=lambda item: item[0]):
+                if total <= max_bytes:
+                    break
+                entries[slug][viewport].remove(entry)
+                dropped += 1
+                references[entry['blob']] -= 1
+                if not references[entry['blob']]:
+                    total -= blobs.get(entry['blob'], 0)
+
+        unused = {blob for blob in blobs if not references[blob]}
+        freed = sum(blobs[blob] for blob in unused)
+        if not dry_run:
+            for blob in unused:
+                os.remove(self.blob_path(blob))
+            self.entries = entries
+            self.save()
+        return dropped, len(unused), freed
+
+    def summary(self):
+        blobs = self.blobs()
+        captures = sum(len(history) for viewports in self.entries.values() for history in viewports.values())
+        return (f"{captures} captures of {len(self.entries)} slugs in {len(blobs)} blobs, "
+                f"{sum(blobs.values()) / 1e6:.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect and prune the content-addressed screenshot store.')
+    parser.add_argument('--output-dir', default='screenshots', help='Screenshot directory (default: screenshots)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gc = commands.add_parser('gc', help='Drop old captures and delete blobs nothing refers to')
+    gc.add_argument('--keep', type=int, metavar='N', help='Captures kept per slug and profile (default: all)')
+    gc.add_argument('--max-age', type=float, metavar='DAYS', help='Drop captures older than this (default: none)')
+    gc.add_argument('--max-size', type=float, metavar='MB',
+                    help='Drop the oldest captures until the store fits in this much (default: no cap)')
+    gc.add_argument('--dry-run', action='store_true', help="Only print what would be removed")
+
+    history = commands.add_parser('history', help='List the stored captures of a slug')
+    history.add_argument('slug')
+
+    args = parser.parse_args(argv)
+    store = ScreenshotStore(args.output_dir)
+
+    if args.command == 'history':
+        viewports = store.entries.get(args.slug)
+        if not viewports:
+            print(f"✗ Nothing stored for {args.slug}")
+            return 1
+        for viewport, entries in sorted(viewports.items()):
+            print(f"{viewport}:")
+            for entry in entries:
+                print(f"  {entry['captured_at']}  {entry['bytes'] / 1e6:6.1f} MB  {store.blob_path(entry['blob'])}")
+        return 0
+
+    if args.keep is not None and args.keep < 1:
+        parser.error('--keep must be at least 1, the latest capture is always kept')
+    max_bytes = args.max_size * 1_000_000 if args.max_size is not None else None
+    dropped, deleted, freed = store.collect_garbage(args.keep, args.max_age, max_bytes, args.dry_run)
+    verb = 'Would drop' if args.dry_run else 'Dropped'
+    print(f"✓ {verb} {dropped} captures and {deleted} blobs, {freed / 1e6:.1f} MB")
+    print(f"  {store.summary()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
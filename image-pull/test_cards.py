@@ -0,0 +1,80 @@
+"""
+Tests for card images cut from desktop captures.
+"""
+
+import io
+
+from PIL import Image
+
+from cards import CARD_SIZE, card_target, fill_image_fields, make_card
+
+
+def screenshot(width=1100, height=5000):
+    image = Image.new('RGB', (width, height), 'white')
+    image.paste((200, 30, 30), (0, 0, width, 300))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_targets(tmp_path):
+    img_dir = tmp_path / 'img'
+    img_dir.mkdir()
+    (img_dir / 'hand-made.png').write_bytes(b'png')
+    (img_dir / 'storm.jpg').write_bytes(b'jpg')
+    (img_dir / 'taken.jpg').write_bytes(b'jpg')
+    output_dir = str(tmp_path / 'screenshots')
+
+    def target(img):
+        path, new_img = card_target({'img': img}, 'storm', output_dir, str(img_dir))
+        return str(path).replace(str(tmp_path) + '/', ''), new_img
+
+    assert target(None) == ('img/storm.jpg', 'storm.jpg')
+    assert target('') == ('img/storm.jpg', 'storm.jpg')
+    # Missing files are made, always as JPEG
+    assert target('globe.jpg') == ('img/globe.jpg', None)
+    assert target('globe.gif') == ('img/globe.jpg', 'globe.jpg')
+    assert target('taken.gif') == ('img/storm.jpg', 'storm.jpg')
+    # A card from an earlier run is refreshed, a hand-made one never overwritten
+    assert target('storm.jpg') == ('img/storm.jpg', None)
+    assert target('hand-made.png') == ('screenshots/cards/storm.jpg', None)
+
+
+def test_card_is_the_top_of_the_capture_as_jpeg(tmp_path):
+    path = tmp_path / 'cards' / 'storm.jpg'
+    make_card(screenshot(), str(path))
+
+    with Image.open(path) as card:
+        assert card.format == 'JPEG'
+        assert card.size == CARD_SIZE
+        # 300 of the 619 rows cropped are the red header
+        assert card.getpixel((480, 100))[0] > 150 > card.getpixel((480, 100))[1]
+        assert card.getpixel((480, 400)) == (255, 255, 255)
+
+
+CSV = [
+    'order,name,img,type,date,new,url',
+    '1,Storm,,interactive,Mar 2026,1,https://example.com/storm',
+    '2,Globe,globe.gif,interactive,Mar 2026,1,https://example.com/globe',
+    '3,Hand made,hand-made.png,explainer,Feb 2026,0,https://example.com/hand-made',
+    '4,"Quoted, name",,explainer,Jan 2026,0,https://example.com/untouched',
+]
+
+
+def test_fill_image_fields_keeps_line_endings(tmp_path):
+    (tmp_path / 'hand-made.png').write_bytes(b'png')
+    for newline in ('\r\n', '\n'):
+        path = tmp_path / 'projects.csv'
+        path.write_bytes(newline.join(CSV).encode('utf-8'))
+
+        updated = fill_image_fields({
+            'https://example.com/storm': 'storm.jpg',
+            'https://example.com/globe': 'globe.jpg',
+            'https://example.com/hand-made': 'hand-made.jpg',
+        }, str(path), str(tmp_path))
+
+        assert updated == 2
+        expected = list(CSV)
+        expected[1] = expected[1].replace(',,', ',storm.jpg,')
+        expected[2] = expected[2].replace('globe.gif', 'globe.jpg')
+        assert path.read_bytes() == newline.join(expected).encode('utf-8')
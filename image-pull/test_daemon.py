@@ -0,0 +1,47 @@
+"""
+Tests for the capture daemon's request handling, without a browser.
+"""
+
+import asyncio
+
+import daemon
+from daemon import CaptureDaemon
+from store import ScreenshotStore, SlugCollisionError
+
+
+def test_slug_claims_end_with_each_request(tmp_path, monkeypatch):
+    urls = {'storm-maps': 'https://example.com/2026/storm-maps'}
+    claims = []
+
+    async def capture_project(browser, limiter, slug, project, label, output_dir, settings, card_assignments):
+        try:
+            settings.store.claim(slug, project['url'])
+        except SlugCollisionError as e:
+            return {'desktop': e}
+        claims.append(len(settings.store._claims))
+        return {}
+
+    monkeypatch.setattr(daemon, 'load_projects', lambda path: [
+        (slug, {'url': url, 'name': slug}) for slug, url in urls.items()
+    ])
+    monkeypatch.setattr(daemon, 'capture_project', capture_project)
+    server = CaptureDaemon(output_dir=str(tmp_path), intercept=False)
+
+    first = asyncio.run(server.capture(['storm-maps']))
+    # The project's link changed since: a new request may capture it from the new URL
+    urls['storm-maps'] = 'https://example.com/2026/storm-maps/index.html'
+    second = asyncio.run(server.capture(['storm-maps']))
+
+    assert first['ok'] and second['ok']
+    assert claims == [1, 1]
+    assert server.settings.store._claims == {}
+
+
+def test_store_runs_share_the_index(tmp_path):
+    store = ScreenshotStore(str(tmp_path))
+    run = store.for_run()
+    run.claim('storm-maps', 'https://example.com/a')
+    run.record('storm-maps', 'desktop', 'https://example.com/a', 'ab/ab.png', 10)
+    assert store.latest('storm-maps', 'desktop')['blob'] == 'ab/ab.png'
+    # Claims stay with the run
+    store.for_run().claim('storm-maps', 'https://example.com/b')
@@ -0,0 +1,76 @@
+"""
+Tests for finding and keeping HAR archives.
+"""
+
+import os
+
+import pytest
+
+from har import HarMissingError, HarOptions
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+
+def test_paths(tmp_path):
+    options = HarOptions(str(tmp_path))
+    assert options.archive_path('site', 'mobile') == str(tmp_path / 'site' / 'mobile.har.zip')
+    assert options.archive_path('site') == str(tmp_path / 'site' / '_shared.har.zip')
+
+
+def test_record_always_writes_its_own_archive(tmp_path):
+    options = HarOptions(str(tmp_path), mode='record')
+    touch(options.archive_path('site', 'mobile'))
+
+    archive = options.archive('site', 'mobile', shared=True)
+    assert archive.record
+    assert archive.path == options.archive_path('site')
+
+
+def test_replay_prefers_its_own_archive(tmp_path):
+    options = HarOptions(str(tmp_path), mode='replay')
+    touch(options.archive_path('site'))
+    touch(options.archive_path('site', 'mobile'))
+
+    assert options.archive('site', 'mobile').path == options.archive_path('site', 'mobile')
+    assert options.archive('site', 'desktop', shared=True).path == options.archive_path('site')
+
+
+def test_separate_contexts_replay_a_shared_recording(tmp_path):
+    options = HarOptions(str(tmp_path), mode='replay')
+    touch(options.archive_path('site'))
+
+    for name in ('desktop', 'mobile', 'tablet'):
+        archive = options.archive('site', name)
+        assert not archive.record
+        assert archive.path == options.archive_path('site')
+
+
+def test_shared_mode_replays_the_first_profiles_recording(tmp_path):
+    options = HarOptions(str(tmp_path), mode='replay')
+    touch(options.archive_path('site', 'desktop'))
+    assert options.archive('site', 'desktop', shared=True).path == options.archive_path('site', 'desktop')
+
+
+def test_missing_archive(tmp_path):
+    with pytest.raises(HarMissingError, match='record one'):
+        HarOptions(str(tmp_path), mode='replay').archive('site', 'mobile')
+
+    # auto records what it can't replay, in the mode's own archive
+    archive = HarOptions(str(tmp_path), mode='auto').archive('site', 'mobile', shared=True)
+    assert archive.record
+    assert archive.path == HarOptions(str(tmp_path)).archive_path('site')
+
+
+def test_recording_is_only_kept_on_success(tmp_path):
+    options = HarOptions(str(tmp_path), mode='record')
+    archive = options.archive('site', 'mobile')
+    touch(archive.recording_path)
+    archive.finish(ok=False)
+    assert not os.path.exists(archive.recording_path) and not os.path.exists(archive.path)
+
+    touch(archive.recording_path)
+    archive.finish(ok=True)
+    assert os.path.exists(archive.path) and not os.path.exists(archive.recording_path)
@@ -0,0 +1,156 @@
+"""
+Tests for the URL health check, against a local HTTP stub server.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+from aiohttp import web
+
+from health import HealthCache, check_url, check_urls
+
+
+async def serve(requests):
+    """
+    Start the stub server on a free port, counting the requests each path gets.
+    """
+    async def handle(request):
+        requests[request.path] = requests.get(request.path, 0) + 1
+        path = request.path
+        if path == '/ok':
+            return web.Response(text='ok')
+        if path == '/moved':
+            raise web.HTTPMovedPermanently('/moved-again')
+        if path == '/moved-again':
+            raise web.HTTPFound('/ok')
+        if path == '/loop':
+            raise web.HTTPFound('/loop')
+        if path == '/gone':
+            raise web.HTTPNotFound()
+        if path == '/busy':
+            raise web.HTTPServiceUnavailable()
+        if path == '/no-head':
+            if request.method == 'HEAD':
+                raise web.HTTPMethodNotAllowed('HEAD', ['GET'])
+            return web.Response(text='ok')
+        if path == '/slow':
+            await asyncio.sleep(2)
+            return web.Response(text='late')
+        raise web.HTTPNotFound()
+
+    app = web.Application()
+    app.router.add_route('*', '/{name:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def check(paths, timeout=1):
+    """
+    check_url() for each path on the stub server.
+
+    Returns:
+        (dict of path -> result, dict of path -> requests made)
+    """
+    async def main():
+        requests = {}
+        runner, base = await serve(requests)
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+                results = {path: await check_url(session, base + path) for path in paths}
+        finally:
+            await runner.cleanup()
+        return results, requests
+
+    return asyncio.run(main())
+
+
+def test_states():
+    results, _ = check(['/ok', '/gone', '/busy', '/slow'])
+    assert results['/ok']['state'] == 'ok'
+    assert results['/ok']['method'] == 'HEAD'
+    assert results['/gone']['state'] == 'dead'
+    assert results['/gone']['code'] == 404
+    assert results['/busy']['state'] == 'error'
+    assert results['/slow']['state'] == 'error'
+    assert results['/slow']['error'] == 'No answer within 1s'
+
+
+def test_redirects_are_recorded():
+    results, _ = check(['/moved', '/loop'])
+    moved = results['/moved']
+    assert moved['state'] == 'redirected'
+    assert [hop['code'] for hop in moved['redirects']] == [301, 302]
+    assert moved['final_url'].endswith('/ok')
+    assert results['/loop']['state'] == 'error'
+    assert results['/loop']['error'] == 'More than 10 redirects'
+
+
+def test_get_is_tried_when_head_is_refused():
+    results, requests = check(['/no-head'])
+    assert results['/no-head']['state'] == 'ok'
+    assert results['/no-head']['method'] == 'GET'
+    assert requests['/no-head'] == 2
+
+
+def test_unresolvable_host_is_an_error_not_dead():
+    async def main():
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+            return await check_url(session, 'http://no-such-host.invalid/')
+
+    entry = asyncio.run(main())
+    # An offline machine can't resolve anything either, so this must not drop the project
+    assert entry['state'] == 'error'
+
+
+def test_check_urls_reuses_fresh_results(tmp_path):
+    cache = HealthCache(str(tmp_path / 'health.json'))
+
+    async def main(paths, ttl_hours):
+        requests = {}
+        runner, base = await serve(requests)
+        # The port differs per server, so cached results are stored under a stable URL
+        cache.entries = {url.replace('BASE', base): entry for url, entry in cache.entries.items()}
+        try:
+            results, checked = await check_urls([base + path for path in paths], cache, ttl_hours, timeout=1)
+        finally:
+            await runner.cleanup()
+        cache.entries = {url.replace(base, 'BASE'): entry for url, entry in cache.entries.items()}
+        return {url.replace(base, ''): entry['state'] for url, entry in results.items()}, checked, requests
+
+    states, checked, _ = asyncio.run(main(['/ok', '/gone', '/busy', '/ok'], 12))
+    assert states == {'/ok': 'ok', '/gone': 'dead', '/busy': 'error'}
+    assert checked == 3
+    # Errors aren't cached, so only they are checked again
+    assert set(cache.entries) == {'BASE/ok', 'BASE/gone'}
+    states, checked, requests = asyncio.run(main(['/ok', '/gone', '/busy'], 12))
+    assert checked == 1
+    assert set(requests) == {'/busy'}
+
+    # Once older than the TTL, a result is checked again
+    old = (datetime.now(timezone.utc) - timedelta(hours=13)).isoformat(timespec='seconds')
+    cache.entries['BASE/ok']['checked_at'] = old
+    _, checked, requests = asyncio.run(main(['/ok', '/gone'], 12))
+    assert checked == 1
+    assert set(requests) == {'/ok'}
+
+    # A TTL of 0 checks everything
+    _, checked, _ = asyncio.run(main(['/ok', '/gone'], 0))
+    assert checked == 2
+
+
+def test_cache_survives_a_save(tmp_path):
+    path = str(tmp_path / 'health.json')
+    cache = HealthCache(path)
+    entry = {'state': 'dead', 'code': 404, 'checked_at': datetime.now(timezone.utc).isoformat()}
+    cache.record('https://a.example/', entry)
+    cache.record('https://b.example/', dict(entry, state='error'))
+    cache.save()
+
+    reloaded = HealthCache(path)
+    assert reloaded.fresh('https://a.example/') == entry
+    assert reloaded.fresh('https://b.example/') is None
@@ -0,0 +1,130 @@
+"""
+Tests for interactive page capture, with a stand-in page and settler.
+"""
+
+import asyncio
+import io
+import os
+from contextlib import contextmanager
+
+import pytest
+from PIL import Image
+
+from encode import OutputOptions
+from interactive import (
+    SCROLL_TO_JS, WAIT_FRAMES_JS, InteractiveOptions, capture_sequence, is_interactive, sequence_paths,
+    write_sequence,
+)
+
+
+def png(colour, size=(60, 40)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, colour).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class FakePage:
+    """
+    Page 3000px tall in a 1000px viewport, whose screenshots change colour as it scrolls or animates.
+    """
+
+    def __init__(self):
+        self.y = 0
+        self.frame = 0
+        self.scripts = []
+
+    async def evaluate(self, script, arg=None):
+        self.scripts.append((script, arg))
+        if script == SCROLL_TO_JS:
+            self.y = round(arg * 2000)
+            return self.y
+        if script == WAIT_FRAMES_JS:
+            self.frame += arg
+        return None
+
+    async def screenshot(self, type='png'):
+        return png((self.y // 10, self.frame, 0))
+
+
+class FakeSettler:
+    def __init__(self):
+        self.waits = []
+
+    async def wait(self, timeout=None, log=print):
+        self.waits.append(timeout)
+
+
+class FakeTimer:
+    @contextmanager
+    def phase(self, name):
+        yield
+
+
+def capture(options):
+    page, settler = FakePage(), FakeSettler()
+    images = asyncio.run(capture_sequence(page, settler, options, lambda line: None, FakeTimer()))
+    return [Image.open(io.BytesIO(data)).getpixel((0, 0)) for data in images], page, settler
+
+
+def test_is_interactive():
+    assert is_interactive('https://example.com/interactive/2024/map/')
+    assert not is_interactive('https://example.com/articles/map/')
+    assert not is_interactive(None)
+
+
+def test_invalid_options():
+    for kwargs in [{'mode': 'video'}, {'sequence': 'gif'}, {'positions': []}, {'positions': [0, 1.5]},
+                   {'frames': 0}]:
+        with pytest.raises(ValueError):
+            InteractiveOptions(**kwargs)
+
+
+def test_options_describe_and_frame_duration():
+    scroll = InteractiveOptions(positions=[0, 0.5, 1])
+    assert scroll.describe() == 'scroll positions 0, 0.5, 1'
+    assert scroll.frame_duration == 1000
+
+    frames = InteractiveOptions(mode='frames', frames=4, frame_step=30)
+    assert frames.describe() == '4 frames, every 30 animation frames'
+    assert frames.frame_duration == 500
+
+
+def test_scroll_sequence_settles_at_every_position():
+    pixels, page, settler = capture(InteractiveOptions(positions=[0, 0.5, 1]))
+    assert pixels == [(0, 0, 0), (100, 0, 0), (200, 0, 0)]
+    assert len(settler.waits) == 3
+
+
+def test_frame_sequence_waits_between_captures():
+    pixels, page, settler = capture(InteractiveOptions(mode='frames', frames=3, frame_step=15))
+    assert pixels == [(0, 0, 0), (0, 15, 0), (0, 30, 0)]
+    assert page.scripts[0] == ('window.scrollTo(0, 0)', None)
+    assert not settler.waits
+
+
+def test_images_replace_an_animation(tmp_path):
+    base = str(tmp_path / 'piece')
+    folder, animation = sequence_paths(base)
+    open(animation, 'wb').close()
+
+    path, size = write_sequence([png('red'), png('blue')], base, 'images', OutputOptions(format='webp'))
+    assert path == folder
+    assert sorted(os.listdir(folder)) == ['01.webp', '02.webp']
+    assert size == sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder))
+    assert not os.path.exists(animation)
+
+
+def test_animation_is_downscaled_and_replaces_images(tmp_path):
+    base = str(tmp_path / 'piece')
+    folder, animation = sequence_paths(base)
+    os.makedirs(folder)
+
+    path, _ = write_sequence(
+        [png('red'), png('blue'), png('green')], base, 'webp', OutputOptions(max_scale=1),
+        device_scale_factor=2, duration=250,
+    )
+    assert path == animation
+    assert not os.path.exists(folder)
+    with Image.open(animation) as image:
+        assert image.n_frames == 3
+        assert image.size == (30, 20)
@@ -0,0 +1,191 @@
+"""
+Tests for the request interceptor, against a local HTTP fixture server.
+
+No browser is needed: Playwright's Route and Request are replaced by small
+stand-ins whose fetch() goes to the fixture server.
+"""
+
+import asyncio
+import os
+
+import aiohttp
+from aiohttp import web
+
+from intercept import AssetCache, InterceptStats, Interceptor
+
+
+ASSET = b'x' * 1000
+
+# Pages ask for assets from this origin; the stand-in routes send them to the fixture server's port
+ORIGIN = 'http://fixture.test'
+
+
+class FakeResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+
+class FakeRoute:
+    """
+    Route stand-in that fetches from the fixture server and remembers how the request ended.
+    """
+
+    def __init__(self, session, base, url):
+        self.session = session
+        self.url = url.replace(ORIGIN, base)
+        self.outcome = None
+
+    async def fetch(self):
+        async with self.session.get(self.url) as response:
+            # Playwright hands over header names in lower case
+            headers = {name.lower(): value for name, value in response.headers.items()}
+            return FakeResponse(response.status, headers, await response.read())
+
+    async def fulfill(self, status=None, headers=None, body=None, response=None):
+        self.outcome = ('fulfilled', body)
+
+    async def fallback(self):
+        self.outcome = ('fallback', None)
+
+    async def abort(self, reason):
+        self.outcome = ('aborted', reason)
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type='script', method='GET'):
+        self.url = url
+        self.resource_type = resource_type
+        self.method = method
+
+
+async def serve(requests):
+    """
+    Start the fixture server on a free port, counting the requests each path gets.
+    """
+    async def asset(request):
+        requests[request.path] = requests.get(request.path, 0) + 1
+        headers = {'Cache-Control': 'no-store'} if request.path.startswith('/private') else {}
+        return web.Response(body=ASSET, headers=headers, content_type='application/javascript')
+
+    app = web.Application()
+    app.router.add_get('/{name:.*}', asset)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def run(interceptor, requests, paths, **request_args):
+    """
+    Send one request per path through the interceptor.
+
+    Returns:
+        (InterceptStats, list of route outcomes)
+    """
+    async def main():
+        runner, base = await serve(requests)
+        stats = InterceptStats()
+        outcomes = []
+        try:
+            async with aiohttp.ClientSession() as session:
+                for path in paths:
+                    url = path if path.startswith('http') else ORIGIN + path
+                    route = FakeRoute(session, base, url)
+                    await interceptor._handle(route, FakeRequest(url, **request_args), stats)
+                    outcomes.append(route.outcome)
+        finally:
+            await runner.cleanup()
+        return stats, outcomes
+
+    return asyncio.run(main())
+
+
+def test_blocklisted_requests_are_aborted():
+    requests = {}
+    interceptor = Interceptor(blocklist={'doubleclick.net'})
+    stats, outcomes = run(interceptor, requests, [
+        'https://ad.doubleclick.net/tag.js',
+        'https://doubleclick.net/pixel.gif',
+        '/app.js',
+    ])
+
+    assert stats.blocked == 2
+    assert outcomes == [('aborted', 'blockedbyclient')] * 2 + [('fallback', None)]
+
+
+def test_assets_are_served_from_the_cache(tmp_path):
+    requests = {}
+    interceptor = Interceptor(AssetCache(str(tmp_path)))
+    stats, outcomes = run(interceptor, requests, ['/app.js', '/app.js', '/style.css', '/app.js'])
+
+    assert requests == {'/app.js': 1, '/style.css': 1}
+    assert (stats.cache_hits, stats.cache_misses) == (2, 2)
+    assert stats.bytes_saved == 2 * len(ASSET)
+    assert all(outcome == ('fulfilled', ASSET) for outcome in outcomes)
+
+    # A later run reads the same directory
+    stats, _ = run(Interceptor(AssetCache(str(tmp_path))), requests, ['/app.js'])
+    assert stats.cache_hits == 1
+    assert requests['/app.js'] == 1
+
+
+def test_uncacheable_requests_go_to_the_network(tmp_path):
+    requests = {}
+    interceptor = Interceptor(AssetCache(str(tmp_path)))
+    stats, _ = run(interceptor, requests, ['/private.js', '/private.js'])
+    assert requests == {'/private.js': 2}
+    assert stats.cache_hits == 0
+
+    stats, outcomes = run(interceptor, requests, ['/page'], resource_type='document')
+    assert outcomes == [('fallback', None)]
+    assert '/page' not in requests
+
+
+def test_least_recently_used_assets_are_evicted_by_size(tmp_path):
+    requests = {}
+    # Room for ten assets; the eleventh pushes the cache over and evicts down to 90%
+    cache = AssetCache(str(tmp_path), max_bytes=10 * len(ASSET) + 500)
+    interceptor = Interceptor(cache)
+    run(interceptor, requests, [f"/{i}.js" for i in range(10)])
+    # Use /0.js again so /1.js and /2.js are the least recently used
+    run(interceptor, requests, ['/0.js'])
+    run(interceptor, requests, ['/10.js'])
+
+    assert cache.size == 9 * len(ASSET)
+    assert len(os.listdir(tmp_path)) == 2 * 9
+    stats, _ = run(interceptor, requests, ['/0.js', '/10.js', '/1.js', '/2.js'])
+    assert stats.cache_hits == 2
+    assert requests['/1.js'] == requests['/2.js'] == 2
+
+
+def test_oversized_assets_are_not_cached(tmp_path):
+    # Nothing bigger than a tenth of the cap is kept
+    cache = AssetCache(str(tmp_path), max_bytes=5 * len(ASSET))
+    cache.put('https://example.com/big.js', 200, {}, ASSET)
+    assert cache.get('https://example.com/big.js') is None
+    assert cache.size == 0
+
+
+def test_shards_sharing_a_directory_share_the_cap(tmp_path):
+    # Two processes' caches over one directory, each allowed ten assets
+    first = AssetCache(str(tmp_path), max_bytes=10 * len(ASSET) + 500)
+    second = AssetCache(str(tmp_path), max_bytes=10 * len(ASSET) + 500)
+    for i in range(7):
+        first.put(f"https://example.com/first-{i}.js", 200, {}, ASSET)
+    for i in range(7):
+        second.put(f"https://example.com/second-{i}.js", 200, {}, ASSET)
+
+    on_disk = sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path) if name.endswith('.body'))
+    assert on_disk <= second.max_bytes
+    # The first process's entries were the least recently used
+    assert second.get('https://example.com/first-0.js') is None
+    assert second.get('https://example.com/second-6.js') is not None
+    # Evicted under the first process too, which notices when it reads the entry
+    assert first.get('https://example.com/first-0.js') is None
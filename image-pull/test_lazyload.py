@@ -0,0 +1,112 @@
+"""
+Tests for the lazy-load pass loop, with a stand-in page and settler.
+"""
+
+import asyncio
+from contextlib import contextmanager
+
+import lazyload
+from lazyload import PENDING_JS, SCROLL_PASS_JS, another_pass_needed, trigger_lazy_load
+
+
+def test_stop_rule():
+    assert not another_pass_needed(0, pending=5, height_before=1000, height_after=3000)
+    assert not another_pass_needed(4, pending=0, height_before=3000, height_after=3000)
+    assert another_pass_needed(4, pending=2, height_before=3000, height_after=3000)
+    assert another_pass_needed(4, pending=0, height_before=3000, height_after=4000)
+
+
+class FakeSettler:
+    timeout = 15
+
+    def __init__(self, clock=None):
+        self.request_count = 0
+        self.clock = clock
+
+    async def wait(self, log=print, deadline=None):
+        if self.clock is not None:
+            # Every settle wait runs until its deadline
+            self.clock.now = min(self.clock.now + self.timeout, deadline)
+        return {'elapsed': 0, 'signal': 'network', 'timed_out': False}
+
+
+class FakePage:
+    """
+    Page whose passes each start a scripted number of requests and grow it by a scripted height.
+    """
+
+    def __init__(self, settler, passes):
+        self.settler = settler
+        self.passes = list(passes)
+        self.height = 2000
+        self.starts = []
+
+    async def evaluate(self, script, arg=None):
+        if script == SCROLL_PASS_JS:
+            self.starts.append(arg['start'])
+            requests, growth, pending = self.passes.pop(0) if self.passes else (0, 0, 0)
+            self.settler.request_count += requests
+            height = self.height
+            self.height += growth
+            self.pending = pending
+            return {'steps': 3, 'height': height}
+        if script == PENDING_JS:
+            return {'height': self.height, 'pending': self.pending}
+        if script == 'window.innerHeight':
+            return 800
+        return None
+
+
+class FakeTimer:
+    @contextmanager
+    def phase(self, name):
+        yield
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def run(passes, max_passes=4, deadline=None, clock=None):
+    settler = FakeSettler(clock)
+    page = FakePage(settler, passes)
+    count = asyncio.run(trigger_lazy_load(page, settler, lambda line: None, FakeTimer(), max_passes, deadline))
+    return count, page.starts
+
+
+def test_static_page_takes_one_pass():
+    assert run([(0, 0, 0)]) == (1, [0])
+
+
+def test_growing_page_is_followed_from_where_it_grew():
+    # Grows by 1000px twice, then a pass loads nothing new
+    count, starts = run([(12, 1000, 0), (6, 1000, 0), (0, 0, 0)])
+    assert count == 3
+    assert starts == [0, 2000 - 800, 3000 - 800]
+
+
+def test_pass_without_new_requests_ends_even_with_targets_pending():
+    assert run([(5, 0, 3), (0, 0, 3)])[0] == 2
+
+
+def test_endless_page_stops_at_the_pass_limit():
+    assert run([(10, 1000, 1)] * 10, max_passes=4)[0] == 4
+
+
+def test_passes_stop_at_the_deadline(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(lazyload, 'time', clock)
+    # Room for two passes with their 15s settle waits, not a third
+    count, starts = run([(10, 1000, 1)] * 10, deadline=clock.now + 40, clock=clock)
+    assert count == 2
+    assert len(starts) == 2
+
+
+def test_no_pass_without_time_for_its_settle_wait(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(lazyload, 'time', clock)
+    assert run([(10, 1000, 1)], deadline=clock.now + 10, clock=clock) == (0, [])
@@ -0,0 +1,97 @@
+"""
+Tests for the capture manifest that lets unchanged pages be skipped.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+from PIL import Image
+
+from manifest import Manifest, dhash, fetch_validators, hash_distance, perceptual_hash
+
+
+URL = 'https://edition.cnn.com/2026/03/weather/storm-maps'
+VALIDATORS = {'etag': '"abc"', 'last_modified': 'Tue, 05 Aug 2025 09:00:00 GMT'}
+
+
+def recorded(tmp_path, **changes):
+    """
+    A saved and reloaded manifest with one desktop capture, and the capture's file.
+    """
+    screenshot = tmp_path / 'storm-maps.png'
+    screenshot.write_bytes(b'png')
+    manifest = Manifest(str(tmp_path / 'manifest.json'))
+    manifest.record('storm-maps', 'desktop', URL, VALIDATORS, '00ff00ff00ff00ff')
+    manifest.entries['storm-maps']['desktop'].update(changes)
+    manifest.save()
+    return Manifest(str(tmp_path / 'manifest.json')), str(screenshot)
+
+
+def test_unchanged_capture_is_fresh(tmp_path):
+    manifest, screenshot = recorded(tmp_path)
+    assert manifest.is_fresh('storm-maps', 'desktop', URL, screenshot, VALIDATORS)
+    # A server that sends no validators this time can't say the page changed
+    assert manifest.is_fresh('storm-maps', 'desktop', URL, screenshot, {'etag': None, 'last_modified': None})
+
+
+def test_stale_captures(tmp_path):
+    manifest, screenshot = recorded(tmp_path)
+    assert not manifest.is_fresh('storm-maps', 'mobile', URL, screenshot, VALIDATORS)
+    assert not manifest.is_fresh('storm-maps', 'desktop', URL + '/index.html', screenshot, VALIDATORS)
+    assert not manifest.is_fresh('storm-maps', 'desktop', URL, screenshot, dict(VALIDATORS, etag='"def"'))
+    assert not manifest.is_fresh('storm-maps', 'desktop', URL, str(tmp_path / 'gone.png'), VALIDATORS)
+
+
+def test_max_age(tmp_path):
+    old = (datetime.now(timezone.utc) - timedelta(days=10)).isoformat(timespec='seconds')
+    manifest, screenshot = recorded(tmp_path, captured_at=old)
+    assert manifest.is_fresh('storm-maps', 'desktop', URL, screenshot, VALIDATORS, max_age_days=30)
+    assert not manifest.is_fresh('storm-maps', 'desktop', URL, screenshot, VALIDATORS, max_age_days=7)
+    assert manifest.is_fresh('storm-maps', 'desktop', URL, screenshot, VALIDATORS, max_age_days=None)
+
+
+def test_record_reports_a_look_alike_capture(tmp_path):
+    manifest, _ = recorded(tmp_path)
+    assert manifest.record('storm-maps', 'desktop', URL, VALIDATORS, '00ff00ff00ff00ff')
+    assert not manifest.record('storm-maps', 'desktop', URL, VALIDATORS, 'ffffffffffffffff')
+    assert not manifest.record('storm-maps', 'mobile', URL, VALIDATORS, '00ff00ff00ff00ff')
+
+
+def page_image(zoom=1):
+    # Detailed everywhere, unlike flat colour blocks whose neighbouring pixels tie
+    extent = (-2 / zoom, -1.5 / zoom, 1 / zoom, 1.5 / zoom)
+    return Image.effect_mandelbrot((400, 1200), extent, 100).convert('RGB')
+
+
+def test_perceptual_hash_ignores_re_encoding(tmp_path):
+    image = page_image()
+    image.save(tmp_path / 'capture.png')
+    image.save(tmp_path / 'capture.jpg', quality=60)
+    assert hash_distance(perceptual_hash(tmp_path / 'capture.png'), perceptual_hash(tmp_path / 'capture.jpg')) <= 2
+    assert hash_distance(dhash(image), dhash(page_image(zoom=3))) > 8
+
+
+def test_validators_come_from_a_head_request():
+    async def main():
+        async def page(request):
+            assert request.method == 'HEAD'
+            return web.Response(headers={'ETag': '"abc"', 'Last-Modified': VALIDATORS['last_modified']})
+
+        app = web.Application()
+        app.router.add_route('HEAD', '/', page)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            found = await asyncio.to_thread(fetch_validators, f"http://127.0.0.1:{port}/")
+            missing = await asyncio.to_thread(fetch_validators, f"http://127.0.0.1:{port}/gone", 2)
+        finally:
+            await runner.cleanup()
+        return found, missing
+
+    found, missing = asyncio.run(main())
+    assert found == VALIDATORS
+    assert missing == {'etag': None, 'last_modified': None}
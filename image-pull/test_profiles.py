@@ -0,0 +1,108 @@
+"""
+Tests for loading, checking and selecting capture profiles.
+"""
+
+import pytest
+
+from encode import OutputOptions
+from profiles import ProfileError, load_profiles, parse_profile, select_profiles
+from tiled import TilingOptions
+
+
+def write(tmp_path, text):
+    path = tmp_path / 'profiles.toml'
+    path.write_text(text)
+    return str(path)
+
+
+def test_shipped_profiles():
+    profiles = load_profiles()
+    assert [profile.name for profile in select_profiles(profiles)] == ['desktop', 'mobile']
+    assert profiles['desktop'].card
+    assert profiles['mobile'].device_scale_factor == 3
+    assert profiles['social'].describe() == '1200x630 @2x, top 630px'
+
+
+def test_selection_keeps_file_order():
+    profiles = load_profiles()
+    selected = select_profiles(profiles, ['social', 'mobile'])
+    assert [profile.name for profile in selected] == ['mobile', 'social']
+
+    with pytest.raises(ProfileError, match='Unknown profiles: watch'):
+        select_profiles(profiles, ['watch'])
+
+
+@pytest.mark.parametrize('table, message', [
+    ({}, 'has no viewport'),
+    ({'viewport': {'width': 0, 'height': 800}}, 'positive width and height'),
+    ({'viewport': {'width': 800, 'height': 800}, 'zoom': 2}, "unknown key 'zoom'"),
+    ({'viewport': {'width': 800, 'height': 800}, 'is_mobile': 1}, 'is_mobile has the wrong type'),
+    ({'viewport': {'width': 800, 'height': 800}, 'max_height': True}, 'max_height has the wrong type'),
+    ({'viewport': {'width': 800, 'height': 800}, 'wait_until': 'idle'}, 'wait_until must be one of'),
+    ({'viewport': {'width': 800, 'height': 800}, 'format': 'gif'}, 'format must be one of'),
+    ({'viewport': {'width': 800, 'height': 800}, 'quality': 101}, 'quality must be between'),
+    ({'viewport': {'width': 800, 'height': 800}, 'settle_timeout': 0}, 'settle_timeout must be positive'),
+    ({'viewport': {'width': 800, 'height': 800}, 'lazy_passes': -1}, 'must not be negative'),
+])
+def test_invalid_profiles(table, message):
+    with pytest.raises(ProfileError, match=message):
+        parse_profile('test', table)
+
+
+def test_invalid_name():
+    with pytest.raises(ProfileError, match='must be lowercase'):
+        parse_profile('Desktop', {'viewport': {'width': 800, 'height': 800}})
+
+
+def test_file_errors(tmp_path):
+    with pytest.raises(ProfileError, match='not found'):
+        load_profiles(str(tmp_path / 'missing.toml'))
+    with pytest.raises(ProfileError, match="Can't parse"):
+        load_profiles(write(tmp_path, '[desktop\n'))
+    with pytest.raises(ProfileError, match='defines no profiles'):
+        load_profiles(write(tmp_path, ''))
+
+    two_cards = '''
+        [a]
+        viewport = { width = 800, height = 600 }
+        card = true
+        [b]
+        viewport = { width = 400, height = 600 }
+        card = true
+    '''
+    with pytest.raises(ProfileError, match='Only one profile can make card images'):
+        load_profiles(write(tmp_path, two_cards))
+
+    no_default = '''
+        [a]
+        viewport = { width = 800, height = 600 }
+        default = false
+    '''
+    with pytest.raises(ProfileError, match='No profile is marked default'):
+        select_profiles(load_profiles(write(tmp_path, no_default)))
+
+
+def test_output_overrides():
+    run = OutputOptions(format='webp', quality=70, max_scale=2)
+    plain = parse_profile('plain', {'viewport': {'width': 800, 'height': 600}})
+    assert plain.output_options(run) is run
+
+    jpeg = parse_profile('jpeg', {'viewport': {'width': 800, 'height': 600}, 'format': 'jpeg'})
+    options = jpeg.output_options(run)
+    # A format of its own brings that format's default quality, not the run's
+    assert (options.format, options.quality, options.max_scale) == ('jpeg', 85, 2)
+
+    sharper = parse_profile('sharper', {'viewport': {'width': 800, 'height': 600}, 'quality': 95})
+    assert sharper.output_options(run).format == 'webp'
+    assert sharper.output_options(run).quality == 95
+
+
+def test_context_and_tiling_options():
+    profile = load_profiles()['social']
+    assert profile.context_options == {'viewport': {'width': 1200, 'height': 630}, 'device_scale_factor': 2}
+    tiling = profile.tiling_options(TilingOptions(strip_height=1000))
+    assert (tiling.max_height, tiling.policy, tiling.strip_height) == (630, 'truncate', 1000)
+
+    desktop = load_profiles()['desktop']
+    default = TilingOptions()
+    assert desktop.tiling_options(default) is default
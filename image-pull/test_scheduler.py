@@ -0,0 +1,104 @@
+"""
+Tests for the capture scheduler: retries, backoff, budgets and the failed-jobs file.
+"""
+
+import asyncio
+import time
+
+from scheduler import (
+    CaptureJob, Scheduler, TransientError, backoff_delay, is_transient, load_failed,
+    soft_deadline, within_budget, write_failed,
+)
+
+
+def test_transient_errors():
+    assert is_transient(TransientError("HTTP 503"))
+    assert is_transient(TimeoutError())
+    assert is_transient(ConnectionResetError())
+    assert not is_transient(ValueError("bad selector"))
+
+
+def test_backoff_doubles_up_to_the_limit():
+    for attempt, delay in [(1, 5), (2, 10), (3, 20), (6, 60)]:
+        for _ in range(20):
+            assert delay <= backoff_delay(attempt, base=5, limit=60) <= delay * 1.5
+
+
+def job(slug, viewports=('desktop', 'mobile')):
+    return CaptureJob(slug, {'url': f'https://example.com/{slug}'}, viewports, '[1/1]')
+
+
+def run_jobs(outcomes, jobs, retries=2):
+    """
+    Run jobs through a Scheduler whose capture() fails each (slug, attempt) as scripted.
+    """
+    calls = []
+
+    async def capture(job):
+        calls.append((job.slug, job.attempts, list(job.viewports)))
+        return outcomes.get((job.slug, job.attempts), {})
+
+    scheduler = Scheduler(capture, concurrency=2, retries=retries, backoff_base=0.001)
+    failed = asyncio.run(scheduler.run(jobs))
+    return failed, calls
+
+
+def test_only_failed_viewports_are_retried():
+    failed, calls = run_jobs({('a', 1): {'mobile': TransientError("HTTP 503")}}, [job('a')])
+    assert failed == []
+    assert calls == [('a', 1, ['desktop', 'mobile']), ('a', 2, ['mobile'])]
+
+
+def test_transient_failures_give_up_after_the_retries():
+    outcomes = {('a', n): {'desktop': TimeoutError("slow")} for n in (1, 2, 3)}
+    failed, calls = run_jobs(outcomes, [job('a', ['desktop'])], retries=2)
+    assert len(calls) == 3
+    assert [(f.slug, f.viewports, f.attempts) for f in failed] == [('a', ['desktop'], 3)]
+    assert failed[0].errors == {'desktop': 'slow'}
+
+
+def test_permanent_failures_are_not_retried():
+    outcomes = {('a', 1): {'desktop': ValueError("broken"), 'mobile': TransientError("HTTP 502")}}
+    failed, calls = run_jobs(outcomes, [job('a')])
+    assert calls == [('a', 1, ['desktop', 'mobile']), ('a', 2, ['mobile'])]
+    assert [(f.slug, f.viewports) for f in failed] == [('a', ['desktop'])]
+
+
+def test_failed_jobs_file_round_trip(tmp_path):
+    path = tmp_path / 'failed.json'
+    first, second = job('a', ['mobile']), job('a', ['tablet'])
+    write_failed(path, [first, second])
+    assert load_failed(path) == {'a': ['mobile', 'tablet']}
+
+    write_failed(path, [])
+    assert not path.exists()
+
+
+def test_budget_cancels_the_capture():
+    async def hang():
+        await asyncio.sleep(10)
+
+    try:
+        asyncio.run(within_budget(hang(), 0.05))
+    except TimeoutError as e:
+        assert '0.05s budget' in str(e)
+    else:
+        raise AssertionError("capture wasn't abandoned")
+
+
+def test_soft_deadline_leaves_the_reserve():
+    async def capture():
+        return soft_deadline()
+
+    async def main():
+        started = time.monotonic()
+        deadline = await within_budget(capture(), 90, reserve=20)
+        return deadline - started, soft_deadline()
+
+    offset, after = asyncio.run(main())
+    assert 69 < offset < 70.1
+    assert after is None
+
+    # Small budgets keep at least half their time for waiting
+    assert 4 < asyncio.run(within_budget(capture(), 10, reserve=20)) - time.monotonic() < 5.1
+    assert asyncio.run(within_budget(capture(), None)) is None
@@ -3,13 +3,12 @@
 Test script - new approach with smooth scrolling to trigger lazy loading
 """
 
-import json
 import os
-import re
-from urllib.parse import urlparse
 from playwright.sync_api import sync_playwright
 import time
 
+from dataset import load_projects
+
 
 def remove_cookie_banners(page):
     """Remove cookie banners"""
@@ -56,25 +55,9 @@ def remove_cookie_banners(page):
         pass
 
 
-def extract_slug_from_url(url):
-    parsed = urlparse(url)
-    path = parsed.path.strip('/')
-    parts = path.split('/')
-    parts = [p for p in parts if p not in ['index.html', 'index.htm', '']]
-    if parts:
-        slug = parts[-1]
-        slug = re.sub(r'\.(html|htm|php)$', '', slug)
-        return slug
-    return parsed.netloc.replace('.', '-')
-
-
 # Load first project
-with open('projects.json', 'r') as f:
-    projects = json.load(f)
-
-project = projects[0]
+slug, project = load_projects()[0]
 url = project['url']
-slug = extract_slug_from_url(url)
 
 print(f"Testing with: {project['name']}")
 print(f"URL: {url}\n")
@@ -0,0 +1,110 @@
+"""
+Tests for page-settle detection, with a stand-in page instead of a browser.
+"""
+
+import asyncio
+import time
+
+from settle import DECODE_IMAGES_JS, PAGE_STATE_JS, PageSettler
+
+
+class FakePage:
+    """
+    Page stand-in whose height and last DOM change follow a script of the wait's elapsed time.
+    """
+
+    def __init__(self, height=lambda elapsed: 1000, since_mutation=lambda elapsed: 10_000, images_time_out=False):
+        self.height = height
+        self.since_mutation = since_mutation
+        self.images_time_out = images_time_out
+        self.handlers = {}
+        self.frames = []
+        self.started = time.monotonic()
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def add_init_script(self, script):
+        pass
+
+    async def evaluate(self, script, arg=None):
+        elapsed = time.monotonic() - self.started
+        if script == PAGE_STATE_JS:
+            return {'sinceMutation': self.since_mutation(elapsed), 'height': self.height(elapsed)}
+        if script == DECODE_IMAGES_JS:
+            return {'images': 3, 'timedOut': self.images_time_out}
+        raise AssertionError(f"Unexpected script: {script}")
+
+
+def settle(page, timeout=3, during=None):
+    """
+    Install a settler on the page and wait, running `during(settler)` alongside the wait.
+    """
+    async def main():
+        settler = PageSettler(page, quiet=0.2, long_request=1, timeout=timeout)
+        await settler.install()
+        page.started = time.monotonic()
+        tasks = [settler.wait(log=lambda line: None)]
+        if during is not None:
+            tasks.append(during(settler))
+        result, *_ = await asyncio.gather(*tasks)
+        return result
+
+    return asyncio.run(main())
+
+
+def test_static_page_settles_after_one_quiet_window():
+    result = settle(FakePage())
+    assert not result['timed_out']
+    assert result['elapsed'] < 1
+
+
+def test_growing_page_holds_the_wait_on_layout():
+    # Grows every poll for the first second, then stays put
+    result = settle(FakePage(height=lambda elapsed: 1000 + int(min(elapsed, 1) * 10) * 100))
+    assert not result['timed_out']
+    assert result['signal'] == 'layout'
+    assert result['elapsed'] >= 1
+
+
+def test_dom_changes_hold_the_wait():
+    result = settle(FakePage(since_mutation=lambda elapsed: 0 if elapsed < 0.8 else 10_000))
+    assert result['signal'] == 'dom'
+    assert result['elapsed'] >= 0.8
+
+
+def test_requests_in_flight_hold_the_wait_until_they_finish():
+    request = object()
+
+    async def load(settler):
+        page = settler.page
+        page.handlers['request'](request)
+        await asyncio.sleep(0.6)
+        page.handlers['requestfinished'](request)
+
+    result = settle(FakePage(), during=load)
+    assert result['signal'] == 'network'
+    assert result['elapsed'] >= 0.6
+
+
+def test_long_requests_are_ignored():
+    async def beacon(settler):
+        # Never finishes, like long polling
+        settler.page.handlers['request'](object())
+
+    result = settle(FakePage(), during=beacon)
+    assert not result['timed_out']
+    # Counted as background traffic once older than long_request (1s)
+    assert result['elapsed'] < 2
+
+
+def test_deadline_reports_what_is_still_waiting():
+    result = settle(FakePage(height=lambda elapsed: int(elapsed * 1000)), timeout=0.5)
+    assert result['timed_out']
+    assert result['signal'] == 'layout'
+
+
+def test_media_that_never_decodes_times_out():
+    result = settle(FakePage(images_time_out=True))
+    assert result['timed_out']
+    assert result['signal'] == 'media'
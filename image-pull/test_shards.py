@@ -0,0 +1,54 @@
+"""
+Tests for merging shard files into the run-wide ones.
+"""
+
+import json
+
+from shards import merge_shards, shard_path
+
+
+def write_json(path, data):
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+
+def health_entry(state, checked_at):
+    return {'state': state, 'code': 200, 'checked_at': checked_at}
+
+
+def test_health_merge_applies_shard_removals(tmp_path):
+    before = {
+        'https://a.example/': health_entry('ok', '2026-10-17T08:00:00+00:00'),
+        'https://b.example/': health_entry('ok', '2026-10-17T08:00:00+00:00'),
+        'https://c.example/': health_entry('ok', '2026-10-17T08:00:00+00:00'),
+    }
+    write_json(tmp_path / 'health.json', before)
+    # Shard 1 checked a (error, so dropped) and d; shard 2 checked b (error) and c again
+    write_json(tmp_path / shard_path('health.json', (1, 2)), {
+        'https://b.example/': before['https://b.example/'],
+        'https://c.example/': before['https://c.example/'],
+        'https://d.example/': health_entry('dead', '2026-10-18T09:00:00+00:00'),
+    })
+    write_json(tmp_path / shard_path('health.json', (2, 2)), {
+        'https://a.example/': before['https://a.example/'],
+        'https://c.example/': health_entry('redirected', '2026-10-18T09:00:00+00:00'),
+        'https://d.example/': health_entry('dead', '2026-10-18T09:00:00+00:00'),
+    })
+
+    _, _, _, found = merge_shards(str(tmp_path), 2, 'manifest.json', None, None, 'failed.json', 'health.json')
+
+    assert found == 2
+    merged = json.loads((tmp_path / 'health.json').read_text(encoding='utf-8'))
+    assert {url: entry['state'] for url, entry in merged.items()} == {
+        'https://c.example/': 'redirected',
+        'https://d.example/': 'dead',
+    }
+    assert not (tmp_path / shard_path('health.json', (1, 2))).exists()
+
+
+def test_health_merge_saves_an_emptied_cache(tmp_path):
+    write_json(tmp_path / 'health.json', {'https://a.example/': health_entry('ok', '2026-10-17T08:00:00+00:00')})
+    write_json(tmp_path / shard_path('health.json', (1, 1)), {})
+
+    merge_shards(str(tmp_path), 1, 'manifest.json', None, None, 'failed.json', 'health.json')
+
+    assert json.loads((tmp_path / 'health.json').read_text(encoding='utf-8')) == {}
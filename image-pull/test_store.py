@@ -0,0 +1,51 @@
+"""
+Tests for unlinking stored screenshots before they are overwritten in place.
+"""
+
+import os
+
+from encode import EXTENSIONS
+from store import ScreenshotStore, detach_all
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_every_linked_format_is_unlinked(tmp_path):
+    base = str(tmp_path / 'mobile' / 'site')
+    store = ScreenshotStore(str(tmp_path))
+    blobs = {}
+    for extension in ('.png', '.webp', '.avif', '.jpg'):
+        path = write(base + extension, extension.encode())
+        blob, _, _ = store.put(path)
+        blobs[extension] = store.blob_path(blob)
+
+    detach_all(base, EXTENSIONS.values())
+
+    for extension, blob_path in blobs.items():
+        assert not os.path.exists(base + extension)
+        # The stored capture itself is untouched
+        with open(blob_path, 'rb') as f:
+            assert f.read() == extension.encode()
+
+
+def test_symbolic_links_are_unlinked(tmp_path):
+    base = str(tmp_path / 'mobile' / 'site')
+    store = ScreenshotStore(str(tmp_path), links='symbolic')
+    path = write(base + '.webp', b'webp')
+    store.put(path)
+    assert os.path.islink(path)
+
+    detach_all(base, EXTENSIONS.values())
+    assert not os.path.lexists(path)
+
+
+def test_plain_files_are_kept(tmp_path):
+    base = str(tmp_path / 'mobile' / 'site')
+    path = write(base + '.png', b'png')
+    detach_all(base, EXTENSIONS.values())
+    assert os.path.exists(path)
@@ -0,0 +1,135 @@
+"""
+Tests for tall-page capture: when to tile, and the strips streamed into one PNG.
+"""
+
+import asyncio
+import io
+
+from PIL import Image
+
+from encode import OutputOptions
+import tiled
+from tiled import PAGE_SIZE_JS, StreamingPNGWriter, TilingOptions, capture_full_page
+
+
+class FakePage:
+    def __init__(self, width, height, scale):
+        self.size = {'width': width, 'height': height, 'scale': scale}
+
+    async def evaluate(self, script, arg=None):
+        assert script == PAGE_SIZE_JS
+        return self.size
+
+
+def fake_grabber(page, calls):
+    """
+    Grabber drawing each clip as a PNG at the device scale, with a colour per 1000 CSS px of page.
+    """
+    async def grab(clip, image_type='png', quality=None):
+        calls.append((clip, image_type))
+        size = page.size
+        region = clip or {'x': 0, 'y': 0, 'width': size['width'], 'height': size['height']}
+        scale = size['scale']
+        image = Image.new('RGB', (round(region['width'] * scale), round(region['height'] * scale)))
+        for band in range(region['y'] // 1000, (region['y'] + region['height']) // 1000 + 1):
+            top = max(round((band * 1000 - region['y']) * scale), 0)
+            image.paste((band * 40 % 256, 0, 0), (0, top, image.width, image.height))
+        buffer = io.BytesIO()
+        image.save(buffer, image_type.upper())
+        return buffer.getvalue()
+    return grab
+
+
+def capture(tmp_path, height, scale=3, tiling=None, **kwargs):
+    calls, lines = [], []
+    path = str(tmp_path / 'page.png')
+    page = FakePage(390, height, scale)
+    head = asyncio.run(capture_full_page(page, fake_grabber(page, calls), path, tiling, lines.append, **kwargs))
+    return path, head, calls, lines
+
+
+def test_short_page_is_one_screenshot(tmp_path):
+    path, head, calls, _ = capture(tmp_path, 3000)
+    assert calls == [(None, 'png')]
+    with Image.open(path) as image:
+        assert image.size == (1170, 9000)
+
+
+def test_past_the_texture_limit_is_tiled(tmp_path):
+    # 6000 CSS px at 3x is 18000 device px
+    path, head, calls, _ = capture(tmp_path, 6000)
+    assert [clip['y'] for clip, _ in calls] == [0, 2048, 4096]
+    with Image.open(path) as image:
+        assert image.format == 'PNG'
+        assert image.size == (1170, 18000)
+        assert image.getpixel((0, 17999)) == (200, 0, 0)
+    with Image.open(io.BytesIO(head)) as image:
+        assert image.size == (1170, 2048 * 3)
+
+
+def test_tall_page_policies(tmp_path):
+    tiling = TilingOptions(max_height=4000, policy='truncate')
+    path, _, calls, lines = capture(tmp_path, 5000, scale=1, tiling=tiling)
+    assert calls == [({'x': 0, 'y': 0, 'width': 390, 'height': 4000}, 'png')]
+    assert 'truncating' in lines[0]
+
+    tiling = TilingOptions(max_height=4000, policy='tile', strip_height=1000)
+    path, _, calls, _ = capture(tmp_path, 5000, scale=1, tiling=tiling)
+    assert len(calls) == 5
+    with Image.open(path) as image:
+        assert image.size == (390, 5000)
+
+
+def test_tiled_capture_honours_the_output_options(tmp_path):
+    output = OutputOptions(format='webp', max_scale=2, optimize=True)
+    save_calls = []
+
+    async def save(data):
+        save_calls.append(data)
+
+    path, head, calls, lines = capture(tmp_path, 6000, save=save, output=output)
+    assert not save_calls
+    assert any('saved as PNG, not webp' in line for line in lines)
+    with Image.open(path) as image:
+        assert image.format == 'PNG'
+        assert image.size == (780, 12000)
+        # Strip boundaries land where they should: 5000 CSS px at 2x
+        assert image.getpixel((0, 9995)) == (160, 0, 0)
+        assert image.getpixel((0, 10005)) == (200, 0, 0)
+
+
+def test_whole_factor_downscale_and_compression(tmp_path, monkeypatch):
+    levels = []
+
+    class Writer(tiled.StreamingPNGWriter):
+        def __init__(self, path, width, height, compress_level=6):
+            levels.append(compress_level)
+            super().__init__(path, width, height, compress_level)
+
+    monkeypatch.setattr(tiled, 'StreamingPNGWriter', Writer)
+    path, _, _, _ = capture(tmp_path, 6000, output=OutputOptions(max_scale=1, optimize=True))
+    with Image.open(path) as image:
+        assert image.size == (390, 6000)
+        assert image.getpixel((0, 5999)) == (200, 0, 0)
+    capture(tmp_path, 6000, output=OutputOptions())
+    assert levels == [9, 6]
+
+
+def test_streaming_writer_checks_the_row_count(tmp_path):
+    path = str(tmp_path / 'rows.png')
+    writer = StreamingPNGWriter(path, 10, 30)
+    writer.write_rows(Image.new('RGB', (10, 20), 'blue'))
+    writer.write_rows(Image.new('RGB', (10, 20), 'red'))
+    writer.close()
+    with Image.open(path) as image:
+        assert image.size == (10, 30)
+        assert image.getpixel((0, 29)) == (255, 0, 0)
+
+    writer = StreamingPNGWriter(path, 10, 30)
+    writer.write_rows(Image.new('RGB', (10, 20), 'blue'))
+    try:
+        writer.close()
+    except ValueError as e:
+        assert 'expected 30 rows, got 20' in str(e)
+    else:
+        raise AssertionError("short PNG was accepted")
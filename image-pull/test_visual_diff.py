@@ -0,0 +1,124 @@
+"""
+Tests for comparing a new capture with the stored screenshot.
+"""
+
+import json
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from visual_diff import DiffReport, changed_regions, compare_images, describe_review, review_capture, staging_path
+
+
+def page(path, size=(1024, 2048), box=None):
+    """
+    Write a page-like image: a gradient, with an optional black box drawn over it.
+    """
+    image = Image.effect_mandelbrot(size, (-2, -1.5, 1, 1.5), 40).convert('RGB')
+    if box:
+        ImageDraw.Draw(image).rectangle(box, fill='black')
+    image.save(path)
+    return str(path)
+
+
+def test_staging_path():
+    assert staging_path('out/site-desktop.png') == 'out/site-desktop.new.png'
+
+
+def test_identical_images_have_no_regions(tmp_path):
+    result = compare_images(page(tmp_path / 'old.png'), page(tmp_path / 'new.png'))
+    assert result['score'] == 0
+    assert result['regions'] == []
+    assert result['phash_distance'] == 0
+
+
+def test_changed_region_in_full_size_pixels(tmp_path):
+    old = page(tmp_path / 'old.png')
+    new = page(tmp_path / 'new.png', box=(256, 1024, 511, 1279))
+    result = compare_images(old, new)
+    assert 0 < result['score'] < 0.1
+    [(x, y, width, height)] = result['regions']
+    # Within a cell (8 reduced pixels = 32 full-size pixels) of the box
+    assert abs(x - 256) <= 32 and abs(y - 1024) <= 32
+    assert abs(width - 256) <= 64 and abs(height - 256) <= 64
+
+
+def test_different_width_changes_everything(tmp_path):
+    result = compare_images(page(tmp_path / 'old.png'), page(tmp_path / 'new.png', size=(800, 2048)))
+    assert result['score'] == 1.0
+    assert result['regions'] == [[0, 0, 800, 2048]]
+
+
+def test_extra_height_counts_as_changed(tmp_path):
+    old = page(tmp_path / 'old.png')
+    # Same page with 1024px of white added at the bottom
+    taller = Image.new('RGB', (1024, 3072), 'white')
+    with Image.open(old) as image:
+        taller.paste(image)
+    new = str(tmp_path / 'new.png')
+    taller.save(new)
+
+    result = compare_images(old, new)
+    assert result['score'] == round(1 / 3, 5)
+    assert result['regions'] == [[0, 2048, 1024, 1024]]
+
+
+def test_bands_split_on_gaps():
+    cells = np.zeros((10, 4), dtype=bool)
+    cells[1:3, 0] = True
+    cells[6, 1:4] = True
+    assert changed_regions(cells, 10, (40, 100)) == [[10, 60, 30, 10], [0, 10, 10, 20]]
+
+
+def test_unchanged_capture_keeps_the_old_file(tmp_path):
+    path = page(tmp_path / 'site.png')
+    before = os.stat(path).st_mtime_ns
+    new = page(staging_path(path))
+    result = review_capture(path, new, path)
+    assert result['status'] == 'unchanged'
+    assert not os.path.exists(new)
+    assert os.stat(path).st_mtime_ns == before
+    assert describe_review(result).startswith('unchanged')
+
+
+def test_changed_capture_replaces_the_old_file(tmp_path):
+    path = page(tmp_path / 'site.png')
+    new = page(staging_path(path), box=(0, 0, 511, 511))
+    result = review_capture(path, new, path)
+    assert result['status'] == 'changed'
+    assert not os.path.exists(new)
+    with Image.open(path) as image:
+        assert image.getpixel((10, 10)) == (0, 0, 0)
+
+
+def test_new_format_replaces_the_old_file_even_when_unchanged(tmp_path):
+    old = page(tmp_path / 'site.png')
+    path = str(tmp_path / 'site.webp')
+    new = page(staging_path(path))
+    result = review_capture(old, new, path)
+    assert result['status'] == 'changed'
+    assert os.path.exists(path) and not os.path.exists(old)
+
+
+def test_first_capture_is_new(tmp_path):
+    path = str(tmp_path / 'site.png')
+    result = review_capture(None, page(staging_path(path)), path)
+    assert result['status'] == 'new'
+    assert os.path.exists(path)
+
+
+def test_report_lines_and_summary(tmp_path):
+    report_path = tmp_path / 'diff-report.jsonl'
+    report = DiffReport(str(report_path))
+    report.write('a', 'desktop', {'status': 'new', 'phash': '0'})
+    regions = [[0, i * 10, 10, 10] for i in range(25)]
+    report.write('a', 'mobile', {'status': 'changed', 'score': 0.2, 'phash_distance': 3, 'regions': regions})
+
+    lines = [json.loads(line) for line in report_path.read_text().splitlines()]
+    assert lines[0] == {'slug': 'a', 'viewport': 'desktop', 'status': 'new'}
+    assert len(lines[1]['regions']) == 20 and lines[1]['more_regions'] == 5
+
+    merged = DiffReport()
+    merged.load(str(report_path))
+    assert merged.summary() == '1 changed, 0 unchanged, 1 new'
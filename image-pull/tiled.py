@@ -0,0 +1,249 @@
+"""
+Memory-bounded full-page capture for very tall pages.
+
+A normal full-page screenshot renders the whole page into one bitmap, which
+for a long explainer at 3x is 1170 x tens of thousands of pixels held in
+Chromium and again in Python, and past Chromium's texture size limit it can
+fail outright. Tiled capture screenshots the page in horizontal strips and
+streams each strip's rows straight into the output PNG, so only one strip is
+ever in memory whatever the page height. Strips are downscaled to the output
+options' max_scale on the way, and `optimize` raises the PNG compression
+level. The output stays PNG whatever the output format: WebP can't store an
+image that tall, and converting the file afterwards would mean decoding the
+whole page again.
+
+Tall pages are handled according to a TilingOptions policy:
+- pages taller than max_height are either cut off at max_height
+  ('truncate') or captured in full with tiles ('tile')
+- pages whose device-pixel height exceeds TEXTURE_LIMIT are always tiled
+- always=True tiles every page
+"""
+
+import io
+import struct
+import zlib
+
+from PIL import Image
+
+from timings import timed
+
+
+# Chromium can't render a single bitmap taller than this many device pixels
+TEXTURE_LIMIT = 16384
+
+# Height of each strip in CSS pixels
+STRIP_HEIGHT = 2048
+
+TALL_PAGE_POLICIES = ('tile', 'truncate')
+
+PAGE_SIZE_JS = '''
+    () => ({
+        width: Math.max(
+            document.documentElement?.scrollWidth || 0,
+            document.body?.scrollWidth || 0,
+            window.innerWidth
+        ),
+        height: Math.max(
+            document.body?.scrollHeight || 0,
+            document.documentElement?.scrollHeight || 0
+        ),
+        scale: window.devicePixelRatio || 1
+    })
+'''
+
+
+class TilingOptions:
+    """
+    How full-page screenshots deal with tall pages.
+
+    Args:
+        max_height: Pages taller than this many CSS pixels are handled by `policy` (None = no limit)
+        policy: 'tile' to capture tall pages in full with strips, 'truncate' to cut them at max_height
+        always: Tile every page, not only tall ones
+        strip_height: Strip height in CSS pixels
+    """
+
+    def __init__(self, max_height=None, policy='tile', always=False, strip_height=STRIP_HEIGHT):
+        if policy not in TALL_PAGE_POLICIES:
+            raise ValueError(f"Unknown tall page policy: {policy}")
+        self.max_height = max_height
+        self.policy = policy
+        self.always = always
+        self.strip_height = strip_height
+
+
+def _chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+class StreamingPNGWriter:
+    """
+    Writes an 8-bit RGB PNG one band of rows at a time.
+
+    Rows are deflated as they arrive and flushed out as IDAT chunks, so the
+    full image never has to exist in memory.
+    """
+
+    def __init__(self, path, width, height, compress_level=6):
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._file = open(path, 'wb')
+        self._compressor = zlib.compressobj(compress_level)
+
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        # Width, height, bit depth 8, colour type 2 (RGB), deflate, adaptive filtering, no interlace
+        self._file.write(_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+
+    def write_rows(self, image):
+        """
+        Append the rows of a PIL image (same width as the PNG) to the output.
+        """
+        image = image.convert('RGB')
+        rows = min(image.height, self.height - self.rows_written)
+        raw = image.tobytes()
+        stride = self.width * 3
+
+        # Every PNG row starts with its filter type; 0 = no filter
+        filtered = b''.join(b'\x00' + raw[row * stride:(row + 1) * stride] for row in range(rows))
+        data = self._compressor.compress(filtered)
+        if data:
+            self._file.write(_chunk(b'IDAT', data))
+        self.rows_written += rows
+
+    def abort(self):
+        self._file.close()
+
+    def close(self):
+        if self.rows_written != self.height:
+            self._file.close()
+            raise ValueError(f"PNG expected {self.height} rows, got {self.rows_written}")
+        self._file.write(_chunk(b'IDAT', self._compressor.flush()))
+        self._file.write(_chunk(b'IEND', b''))
+        self._file.close()
+
+
+def resize_strip(strip, size):
+    """
+    Scale a strip down to `size`, with a plain box reduction when the factor is a whole number.
+    """
+    if strip.size == size:
+        return strip
+    factor = strip.width / size[0]
+    if factor == int(factor) and strip.height == size[1] * factor:
+        return strip.reduce(int(factor))
+    return strip.resize(size, Image.LANCZOS)
+
+
+async def write_tiled_png(grab, path, width, height, scale, strip_height=STRIP_HEIGHT, timer=None, downscale=1,
+                          compress_level=6):
+    """
+    Capture the region (0, 0, width, height) strip by strip into one PNG.
+
+    Args:
+        grab: Async function taking a clip dict (x, y, width, height in CSS
+            pixels) and returning PNG bytes of that region of the page
+        path: Output PNG path
+        width: Page width in CSS pixels
+        height: Height to capture in CSS pixels
+        scale: Device pixel ratio of the page
+        strip_height: Strip height in CSS pixels
+        timer: Optional PhaseTimer; strip captures count as 'screenshot', PNG encoding as 'write'
+        downscale: Resize factor for the output, 1 = keep the captured size
+        compress_level: zlib compression level of the PNG, 0-9
+
+    Returns:
+        PNG bytes of the first strip, i.e. the top of the page, at the captured size
+    """
+    writer = None
+    first_strip = None
+    output_scale = scale * downscale
+    pixel_height = round(height * output_scale)
+    try:
+        for top in range(0, height, strip_height):
+            clip = {'x': 0, 'y': top, 'width': width, 'height': min(strip_height, height - top)}
+            with timed(timer, 'screenshot'):
+                data = await grab(clip)
+            if first_strip is None:
+                first_strip = data
+            with timed(timer, 'write'), Image.open(io.BytesIO(data)) as strip:
+                if downscale != 1:
+                    # Strip boundaries are rounded from the page top, so rounding errors don't add up
+                    bottom = top + clip['height']
+                    rows = round(bottom * output_scale) - round(top * output_scale)
+                    strip = resize_strip(strip.convert('RGB'), (round(strip.width * downscale), rows))
+                if writer is None:
+                    writer = StreamingPNGWriter(path, strip.width, pixel_height, compress_level)
+                # Rounding can make strips a pixel off; pad the last strip if it comes up short
+                if top + strip_height >= height and writer.rows_written + strip.height < pixel_height:
+                    padded = Image.new('RGB', (strip.width, pixel_height - writer.rows_written), 'white')
+                    padded.paste(strip.convert('RGB'), (0, 0))
+                    writer.write_rows(padded)
+                else:
+                    writer.write_rows(strip)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    if writer is not None:
+        with timed(timer, 'write'):
+            writer.close()
+    return first_strip
+
+
+async def capture_full_page(page, grab, path, tiling=None, log=print, timer=None, save=None, image_type='png',
+                            quality=None, output=None):
+    """
+    Save a full-page screenshot, tiling or truncating tall pages per the tiling options.
+
+    Args:
+        page: Playwright page, used to measure the document
+        grab: Async function taking a clip dict (plus image type and quality) and
+            returning image bytes of that region, or of the whole page when the clip is None
+        path: Output PNG path
+        tiling: TilingOptions (None = defaults: only tile past the texture limit)
+        log: Function used to print progress lines for this URL
+        timer: Optional PhaseTimer recording 'screenshot' (capture and encode) and 'write'
+        save: Optional async function taking the image bytes, called instead of writing
+            them to `path`; tiled captures are always streamed to `path` as PNG
+        image_type: Image type Chromium encodes single captures as, 'png' or 'jpeg'
+        quality: JPEG quality for image_type 'jpeg'
+        output: OutputOptions the capture is saved with; tiled captures take their
+            max_scale and optimize setting from it (None = PNG as captured)
+
+    Returns:
+        Image bytes covering at least the top of the page (the whole screenshot,
+        or its first PNG strip when tiled), for work that needs the image in memory
+    """
+    tiling = tiling or TilingOptions()
+    size = await page.evaluate(PAGE_SIZE_JS)
+    width, height, scale = size['width'], size['height'], size['scale']
+
+    too_tall = tiling.max_height is not None and height > tiling.max_height
+    if too_tall and tiling.policy == 'truncate':
+        log(f"Page is {height}px tall, truncating to {tiling.max_height}px")
+        height = tiling.max_height
+
+    tile = tiling.always or height * scale > TEXTURE_LIMIT or (too_tall and tiling.policy == 'tile')
+    if tile:
+        strips = -(-height // tiling.strip_height)
+        log(f"Capturing {height}px page in {strips} strips")
+        if output is None:
+            return await write_tiled_png(grab, path, width, height, scale, tiling.strip_height, timer)
+        if output.format != 'png':
+            log(f"! Tiled capture is saved as PNG, not {output.format}")
+        return await write_tiled_png(
+            grab, path, width, height, scale, tiling.strip_height, timer,
+            downscale=output.downscale(scale), compress_level=9 if output.optimize else 6,
+        )
+
+    clip = {'x': 0, 'y': 0, 'width': width, 'height': height} if too_tall else None
+    with timed(timer, 'screenshot'):
+        data = await grab(clip, image_type, quality)
+    if save is not None:
+        await save(data)
+        return data
+    with timed(timer, 'write'), open(path, 'wb') as f:
+        f.write(data)
+    return data
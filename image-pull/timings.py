@@ -0,0 +1,242 @@
+"""
+Per-phase timing and network accounting for captures.
+
+Every (URL, viewport) capture gets a PhaseTimer that records how long each
+phase took: navigation, the initial settle, banner removal, each scroll
+pass and the settle wait after it, the final settle, screenshot capture
+and encoding, and the file write. A NetworkMeter listens to the page's
+request events and adds the number of requests and bytes transferred to
+whichever capture is current.
+
+Records go to a JSON Lines file, one line per capture, and TimingLog
+prints a summary at the end of the run: p50/p95 for every phase and the
+slowest URLs.
+"""
+
+import asyncio
+import json
+import math
+import time
+from contextlib import contextmanager, nullcontext
+
+
+# Navigation Timing milestones, in seconds from the start of navigation
+NAVIGATION_TIMING_JS = '''
+    () => {
+        const nav = performance.getEntriesByType('navigation')[0];
+        return nav ? {
+            ttfb: nav.responseStart / 1000,
+            dom_content_loaded: nav.domContentLoadedEventEnd / 1000
+        } : null;
+    }
+'''
+
+# Slowest URLs listed in the summary
+SLOWEST_COUNT = 5
+
+
+class PhaseTimer:
+    """
+    Timings for one URL at one viewport.
+
+    Phases with the same name add up, so e.g. every strip of a tiled
+    capture counts towards 'screenshot'. The total runs from the start of
+    the first phase, so time spent on other viewports beforehand isn't counted.
+    """
+
+    def __init__(self, slug, url, viewport):
+        self.slug = slug
+        self.url = url
+        self.viewport = viewport
+        self.phases = {}
+        self.milestones = {}
+        self.requests = 0
+        self.failed_requests = 0
+        self.bytes = 0
+        self.file = None
+        self.file_bytes = None
+        self.error = None
+        self._start = None
+        self._end = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        if self._start is None:
+            self._start = start
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    async def record_navigation(self, page):
+        """
+        Store the page's TTFB and DOMContentLoaded times from the Navigation Timing API.
+        """
+        try:
+            milestones = await page.evaluate(NAVIGATION_TIMING_JS)
+        except Exception:
+            milestones = None
+        self.milestones.update(milestones or {})
+
+    def finish(self):
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    @property
+    def started(self):
+        return self._start is not None
+
+    def to_dict(self):
+        end = self._end if self._end is not None else time.perf_counter()
+        record = {
+            'slug': self.slug,
+            'url': self.url,
+            'viewport': self.viewport,
+            'total': round(end - self._start, 3) if self.started else 0,
+            'phases': {name: round(seconds, 3) for name, seconds in self.phases.items()},
+            'milestones': {name: round(seconds, 3) for name, seconds in self.milestones.items()},
+            'requests': self.requests,
+            'failed_requests': self.failed_requests,
+            'bytes': self.bytes,
+        }
+        if self.file:
+            record['file'] = self.file
+            record['file_bytes'] = self.file_bytes
+        if self.error:
+            record['error'] = self.error
+        return record
+
+
+def timed(timer, name):
+    """
+    timer.phase(name), or a no-op context when there is no timer.
+    """
+    return timer.phase(name) if timer is not None else nullcontext()
+
+
+class NetworkMeter:
+    """
+    Counts a page's requests and response bytes towards the current PhaseTimer.
+
+    In single-navigation mode one page serves several viewports, so the
+    meter is pointed at each viewport's timer in turn.
+    """
+
+    def __init__(self, page, timer=None):
+        self.timer = timer
+        self._pending = set()
+        page.on('requestfinished', self._on_finished)
+        page.on('requestfailed', self._on_failed)
+
+    def _on_finished(self, request):
+        timer = self.timer
+        if timer is None:
+            return
+        timer.requests += 1
+        # Sizes need a round-trip to the browser, so collect them in the background
+        task = asyncio.ensure_future(self._add_size(request, timer))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _on_failed(self, request):
+        if self.timer is not None:
+            self.timer.requests += 1
+            self.timer.failed_requests += 1
+
+    @staticmethod
+    async def _add_size(request, timer):
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        timer.bytes += max(sizes['responseHeadersSize'], 0) + max(sizes['responseBodySize'], 0)
+
+    async def flush(self):
+        """
+        Wait for outstanding size lookups so the byte counts are complete.
+        """
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a non-empty list.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class TimingLog:
+    """
+    Appends capture timings to a JSON Lines file and summarises them.
+
+    Args:
+        path: JSON Lines output, truncated at the start of the run (None = keep records in memory only)
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.records = []
+        if path:
+            open(path, 'w').close()
+
+    def write(self, timer):
+        timer.finish()
+        self.add(timer.to_dict())
+
+    def add(self, record):
+        self.records.append(record)
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def load(self, path):
+        """
+        Add the records of another timings file, e.g. one written by a shard.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    self.add(json.loads(line))
+
+    def summary(self):
+        """
+        Summary table: p50/p95 per phase and milestone, the slowest URLs, then every file written and its size.
+        """
+        if not self.records:
+            return "No captures timed"
+
+        rows = {}
+        for record in self.records:
+            for section in ('phases', 'milestones'):
+                for name, seconds in record[section].items():
+                    rows.setdefault(name, []).append(seconds)
+        rows['total'] = [record['total'] for record in self.records]
+
+        width = max(len(name) for name in rows)
+        lines = [f"{'phase':<{width}}  {'count':>5}  {'p50':>7}  {'p95':>7}  {'max':>7}"]
+        for name, values in rows.items():
+            lines.append(
+                f"{name:<{width}}  {len(values):>5}  {percentile(values, 0.5):>6.2f}s  "
+                f"{percentile(values, 0.95):>6.2f}s  {max(values):>6.2f}s"
+            )
+
+        requests = sum(record['requests'] for record in self.records)
+        transferred = sum(record['bytes'] for record in self.records)
+        lines.append(f"\n{requests} requests, {transferred / 1e6:.1f} MB transferred")
+
+        per_url = {}
+        for record in self.records:
+            per_url[record['url']] = per_url.get(record['url'], 0) + record['total']
+        slowest = sorted(per_url.items(), key=lambda item: item[1], reverse=True)[:SLOWEST_COUNT]
+        lines.append("\nSlowest URLs:")
+        lines.extend(f"  {seconds:6.1f}s  {url}" for url, seconds in slowest)
+
+        files = [record for record in self.records if record.get('file')]
+        if files:
+            total = sum(record['file_bytes'] for record in files)
+            lines.append(f"\nFiles ({len(files)}, {total / 1e6:.1f} MB):")
+            lines.extend(f"  {record['file_bytes'] / 1e6:7.2f} MB  {record['file']}" for record in files)
+        return '\n'.join(lines)
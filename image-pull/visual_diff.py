@@ -0,0 +1,234 @@
+"""
+Visual diffing of a new capture against the previous screenshot.
+
+A new capture is written next to the stored screenshot first and then
+compared with it. Both images are decoded once, reduced to greyscale at
+about DIFF_WIDTH pixels wide and compared with numpy: a pixel has changed
+when its brightness moved by more than PIXEL_TOLERANCE, which ignores
+anti-aliasing and re-encoding noise. The changed pixels are summed over a
+grid of cells, and runs of changed cells become the changed regions,
+reported in the screenshot's own pixel coordinates.
+
+When less than the threshold fraction of the page changed, the new file is
+dropped and the old one stays untouched, so its modification time (and
+anything synced or uploaded from it) doesn't change. Otherwise the new
+capture replaces it. Every comparison is written as one line to the diff
+report.
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+from PIL import Image
+
+from manifest import dhash, hash_distance, perceptual_hash
+
+
+# Diff report of the last run, inside the output directory
+DIFF_REPORT_NAME = 'diff-report.jsonl'
+
+# Fraction of changed pixels below which the previous screenshot is kept
+DEFAULT_DIFF_THRESHOLD = 0.001
+
+# Images are reduced to about this width before comparing
+DIFF_WIDTH = 256
+
+# Greyscale difference (0-255) a reduced pixel needs to count as changed
+PIXEL_TOLERANCE = 24
+
+# Side of a grid cell in reduced pixels, and the fraction of its pixels that must change
+CELL_SIZE = 8
+CELL_CHANGED = 0.05
+
+# Changed regions kept in the report per capture, largest first
+MAX_REGIONS = 20
+
+
+def staging_path(path):
+    """
+    Where a new capture is written before it is compared with the one at `path`.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.new{ext}"
+
+
+def load_reduced(path):
+    """
+    Decode an image once and return (dHash, reduced greyscale array, full size, reduction factor).
+    """
+    with Image.open(path) as image:
+        size = image.size
+        grey = image.convert('L')
+    phash = dhash(grey)
+    factor = max(1, math.ceil(size[0] / DIFF_WIDTH))
+    reduced = grey.reduce(factor) if factor > 1 else grey
+    return phash, np.asarray(reduced, dtype=np.int16), size, factor
+
+
+def changed_regions(cells, cell_pixels, size):
+    """
+    Group changed grid cells into rectangles.
+
+    Consecutive rows with a changed cell form one band, spanning the columns
+    changed anywhere in the band.
+
+    Args:
+        cells: 2D bool array, True where a grid cell changed
+        cell_pixels: Side of one cell in full-size pixels
+        size: (width, height) of the full-size image
+
+    Returns:
+        List of [x, y, width, height] in full-size pixels, largest first
+    """
+    rows = np.flatnonzero(cells.any(axis=1))
+    if not rows.size:
+        return []
+
+    # Split the changed rows wherever there is a gap between them
+    bands = np.split(rows, np.flatnonzero(np.diff(rows) > 1) + 1)
+    regions = []
+    for band in bands:
+        columns = np.flatnonzero(cells[band[0]:band[-1] + 1].any(axis=0))
+        x = int(columns[0]) * cell_pixels
+        y = int(band[0]) * cell_pixels
+        right = min((int(columns[-1]) + 1) * cell_pixels, size[0])
+        bottom = min((int(band[-1]) + 1) * cell_pixels, size[1])
+        regions.append([x, y, right - x, bottom - y])
+
+    regions.sort(key=lambda region: region[2] * region[3], reverse=True)
+    return regions
+
+
+def compare_images(old_path, new_path):
+    """
+    Compare two screenshots of the same page.
+
+    Returns:
+        dict with the fraction of changed pixels ('score'), the dHash distance,
+        the changed regions, and both dHashes ('phash' and 'old_phash')
+    """
+    old_hash, old, old_size, _ = load_reduced(old_path)
+    new_hash, new, new_size, factor = load_reduced(new_path)
+    result = {
+        'phash': new_hash,
+        'old_phash': old_hash,
+        'phash_distance': hash_distance(old_hash, new_hash),
+    }
+
+    if old.shape[1] != new.shape[1]:
+        # A different width means a different layout; everything counts as changed
+        result.update(score=1.0, regions=[[0, 0, new_size[0], new_size[1]]])
+        return result
+
+    # Rows past the end of the shorter image count as changed
+    height = max(old.shape[0], new.shape[0])
+    overlap = min(old.shape[0], new.shape[0])
+    changed = np.ones((height, new.shape[1]), dtype=bool)
+    changed[:overlap] = np.abs(old[:overlap] - new[:overlap]) > PIXEL_TOLERANCE
+
+    # Fraction of changed pixels per cell, padding the edges up to whole cells
+    pad_rows = -height % CELL_SIZE
+    pad_cols = -changed.shape[1] % CELL_SIZE
+    padded = np.pad(changed, ((0, pad_rows), (0, pad_cols)))
+    grid = padded.reshape(padded.shape[0] // CELL_SIZE, CELL_SIZE, padded.shape[1] // CELL_SIZE, CELL_SIZE)
+    cells = grid.mean(axis=(1, 3)) > CELL_CHANGED
+
+    full_size = (new_size[0], max(old_size[1], new_size[1]))
+    result.update(
+        score=round(float(changed.mean()), 5),
+        regions=changed_regions(cells, CELL_SIZE * factor, full_size),
+    )
+    return result
+
+
+def review_capture(old_path, new_path, path, threshold=DEFAULT_DIFF_THRESHOLD):
+    """
+    Keep the old screenshot or replace it with the new capture, depending on how much changed.
+
+    Args:
+        old_path: Stored screenshot (None if there is none yet)
+        new_path: The new capture, from staging_path()
+        path: Where the screenshot belongs; differs from old_path when the output format changed
+        threshold: Fraction of changed pixels at or above which the new capture replaces the old one
+
+    Returns:
+        Report dict with 'status' ('new', 'changed' or 'unchanged'), the diff
+        details and the dHash of the file now at `path` ('phash')
+    """
+    if old_path is None:
+        os.replace(new_path, path)
+        return {'status': 'new', 'phash': perceptual_hash(path)}
+
+    result = compare_images(old_path, new_path)
+    if result['score'] < threshold and old_path == path:
+        os.remove(new_path)
+        result['status'] = 'unchanged'
+        result['phash'] = result['old_phash']
+    else:
+        os.replace(new_path, path)
+        if old_path != path:
+            os.remove(old_path)
+        result['status'] = 'changed'
+    return result
+
+
+def describe_review(result):
+    """
+    One-line summary of a review_capture() result for the progress log.
+    """
+    if result['status'] == 'new':
+        return "new capture"
+    regions = len(result['regions'])
+    summary = f"{result['score']:.1%} of pixels differ in {regions} region{'s' if regions != 1 else ''}"
+    if result['status'] == 'unchanged':
+        return f"unchanged ({summary}), kept the previous file"
+    return f"changed, {summary}"
+
+
+class DiffReport:
+    """
+    Appends one compact JSON line per reviewed capture and counts the outcomes.
+
+    Args:
+        path: JSON Lines output, truncated at the start of the run (None = keep counts only)
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.counts = {}
+        if path:
+            open(path, 'w').close()
+
+    def write(self, slug, viewport, result):
+        record = {'slug': slug, 'viewport': viewport, 'status': result['status']}
+        if result['status'] != 'new':
+            record.update(
+                score=result['score'],
+                phash_distance=result['phash_distance'],
+                regions=result['regions'][:MAX_REGIONS],
+            )
+            if len(result['regions']) > MAX_REGIONS:
+                record['more_regions'] = len(result['regions']) - MAX_REGIONS
+        self.add(record)
+
+    def add(self, record):
+        self.counts[record['status']] = self.counts.get(record['status'], 0) + 1
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def load(self, path):
+        """
+        Add the lines of another diff report, e.g. one written by a shard.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    self.add(json.loads(line))
+
+    def summary(self):
+        if not self.counts:
+            return "No captures compared"
+        return ', '.join(f"{self.counts.get(status, 0)} {status}" for status in ('changed', 'unchanged', 'new'))